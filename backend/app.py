@@ -8,13 +8,44 @@ from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import oracledb as cx_Oracle
 import json
-import csv
-import io
+import base64
+import re
 import os
 import sqlite3
-import geopandas as gpd
-from flask import send_from_directory
+import functools
+import mimetypes
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import send_from_directory, send_file
+from werkzeug.security import safe_join
 from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import ClosingIterator
+from layer_cache import LayerCache
+from compression import negotiate, fresh_sidecar, build_sidecars, gzip_stream, ENCODINGS
+from static_manifest import StaticManifest
+from scene_packer import is_stale as scene_is_stale, pack_model, packed_path, PACKED_NAME
+from geojson_stream import iter_feature_collection, feature_bytes, dumps, GeometryFragments
+from layer_store import LayerData, LayerStore
+from columns import Columns
+from layer_versions import Snapshot, VersionStore, feature_hash
+from binning import aggregate, to_mercator
+from topology import Topology, DEFAULT_PRECISION, parse_precision, round_fragment
+from scenario import ScenarioModel, MAX_MULTIPLIER
+from classify import classify, parse_classes, METHODS as CLASSIFY_METHODS, DEFAULT_METHOD as CLASSIFY_DEFAULT
+from query_builder import Query, like_contains
+from data_access import QueryStats, fetch, fetch_one, fetch_all
+from exports import (ExportCache, FORMATS as EXPORT_FORMATS, STREAMED_FORMATS, GEO_FORMATS,
+                     STREAM_WRITERS, available as export_available, description_kinds,
+                     write_arrow, write_ogr)
+from spatial_index import parse_bbox
+from postcode_index import PostcodeIndex
+from postcode_artifact import PostcodeArtifact, compile_postcodes, write_artifact, WANT_COLUMNS
+from mvt import (encode_layer, tile_query_bounds, to_tile_coords, clip_to_tile,
+                 tiles_covering, valid_tile)
 
 
 # Postcode data path
@@ -22,6 +53,7 @@ POSTCODE_GPKG_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'Post
 
 app = Flask(__name__)
 CORS(app)
+app.logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
 
 DB_CONFIG = {
     "user": os.environ.get("ORACLE_USER", "s2814398"),
@@ -52,6 +84,12 @@ def _read_oracle_password():
 
 
 _ORACLE_POOL = None
+# statements kept parsed per connection; the filtered endpoints use a few dozen shapes
+ORACLE_STMT_CACHE = int(os.environ.get("ORACLE_STMT_CACHE", "50"))
+# rows per fetch round trip for the layer and export queries
+ORACLE_ARRAYSIZE = int(os.environ.get("ORACLE_ARRAYSIZE", "1000"))
+# executions, rows, round trips, bytes and timing per SQL shape, see /api/admin/queries
+QUERY_STATS = QueryStats()
 
 def _get_pool():
     global _ORACLE_POOL
@@ -70,13 +108,34 @@ def _get_pool():
             min=int(os.environ.get("ORACLE_POOL_MIN", "1")),
             max=int(os.environ.get("ORACLE_POOL_MAX", "4")),
             increment=int(os.environ.get("ORACLE_POOL_INC", "1")),
+            stmtcachesize=ORACLE_STMT_CACHE,
         )
         return _ORACLE_POOL
     except Exception:
         _ORACLE_POOL = None
         return None
 
+# set by /api/bootstrap so every section it renders shares one pooled connection
+_SHARED_DB = threading.local()
+
+
+class _SharedConnection:
+    """Lends one connection to several handlers; their close() leaves it open."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        pass
+
+
 def get_db_connection():
+    shared = getattr(_SHARED_DB, 'conn', None)
+    if shared is not None:
+        return shared
     pool = _get_pool()
     if not pool:
         return None
@@ -100,6 +159,317 @@ GREENSPACE_3D_MODELS = {
     'Saughton Park and Gardens': 'Saughton Park',
     'Spylaw Public Park': 'Spylaw Public Park',
 }
+
+# ============================================================
+# Layer response cache
+# ============================================================
+# Layer data changes a few times a year, so the serialized responses are kept
+# in process and revalidated by the browser with ETag / If-None-Match.
+LAYER_CACHE = LayerCache(
+    ttl=int(os.environ.get("LAYER_CACHE_TTL", "3600")),
+    max_bytes=int(os.environ.get("LAYER_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
+LAYER_CACHE_MAX_AGE = int(os.environ.get("LAYER_CACHE_MAX_AGE", "0"))
+# how long a request waits for an identical in-flight request before fetching itself
+COALESCE_TIMEOUT = float(os.environ.get("LAYER_COALESCE_TIMEOUT", "60"))
+
+
+def _cached_response(entry, cache_status):
+    # precompressed variants are picked, never produced, at request time
+    encoding = negotiate(request.accept_encodings, entry.variants)
+    if encoding:
+        resp = Response(entry.variants[encoding], mimetype=entry.mimetype)
+        resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(f'{entry.etag}-{encoding}')
+    else:
+        resp = Response(entry.body, mimetype=entry.mimetype)
+        resp.set_etag(entry.etag)
+    resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = f'public, max-age={LAYER_CACHE_MAX_AGE}, must-revalidate'
+    resp.headers['X-Cache'] = cache_status
+    return resp.make_conditional(request)
+
+
+def cached_layer(layer, bypass=('bbox',)):
+    """Serve a layer endpoint from LAYER_CACHE, keyed on path + normalised query string.
+
+    Requests carrying any of the `bypass` parameters (viewport queries) are
+    answered directly so they do not churn the cache. Concurrent misses on the
+    same key are coalesced: one request runs the view while the others wait for
+    its body to land in the cache.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if any(request.args.get(p) for p in bypass):
+                return view(*args, **kwargs)
+            key = LayerCache.make_key(request.path, request.args)
+            entry = LAYER_CACHE.get(key)
+            if entry is not None:
+                return _cached_response(entry, 'HIT')
+
+            in_flight, owner = LAYER_CACHE.claim(key)
+            if not owner:
+                in_flight.wait(COALESCE_TIMEOUT)
+                entry = LAYER_CACHE.get(key)
+                if entry is not None:
+                    return _cached_response(entry, 'COALESCED')
+                # the other request failed or its body was too big to cache; fetch our own
+                return _render_cached(key, layer, view, args, kwargs)
+            return _render_cached(key, layer, view, args, kwargs, claim=in_flight)
+        return wrapper
+    return decorator
+
+
+def _render_cached(key, layer, view, args, kwargs, claim=None):
+    """Run a cached_layer view and store its body; `claim` is the single-flight claim on
+    key when this request holds it."""
+    handed_off = False
+    try:
+        resp = app.make_response(view(*args, **kwargs))
+        if resp.status_code != 200 or resp.get_etag()[0]:
+            # errors, and views that already validate their own body, are passed through
+            return resp
+        if resp.is_streamed:
+            # cached once the last chunk has been produced; the ETag follows on the next hit
+            chunks = resp.response
+            callbacks = [chunks.close] if hasattr(chunks, 'close') else []
+            done = None
+            if claim is not None:
+                # waiters are woken as soon as the tee has stored the body (or given up
+                # on it), and at the latest when the client goes away mid-stream
+                done = lambda: LAYER_CACHE.release(key, claim)
+                callbacks.append(done)
+                handed_off = True
+            resp.response = ClosingIterator(
+                LAYER_CACHE.tee(key, layer, chunks, resp.mimetype, done), callbacks)
+            resp.headers['Cache-Control'] = f'public, max-age={LAYER_CACHE_MAX_AGE}, must-revalidate'
+            resp.headers['X-Cache'] = 'MISS'
+            return resp
+        entry = LAYER_CACHE.put(key, layer, resp.get_data(), resp.mimetype)
+        return _cached_response(entry, 'MISS')
+    finally:
+        if claim is not None and not handed_off:
+            LAYER_CACHE.release(key, claim)
+
+
+def _close_quietly(*handles):
+    for h in handles:
+        try:
+            if h is not None:
+                h.close()
+        except Exception:
+            pass
+
+
+# geom_json text is validated once and then spliced into responses as-is
+GEOMETRY_FRAGMENTS = GeometryFragments()
+
+
+def _read_lob(value):
+    text = value.read() if hasattr(value, 'read') else value
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('utf-8', errors='ignore')
+    return text if isinstance(text, str) else str(text)
+
+
+def geometry_fragment(geom_json):
+    """Validated geometry JSON bytes for a geom_json column value, or None."""
+    if not geom_json:
+        return None
+    return GEOMETRY_FRAGMENTS.get(_read_lob(geom_json))
+
+
+def stream_feature_collection(conn, rows, features, metadata=None):
+    """Stream a FeatureCollection straight off an executed query (data_access.Rows).
+
+    The cursor and connection are released when the response is closed, so the
+    pool slot is held only while the client is reading.
+    """
+    return Response(
+        ClosingIterator(iter_feature_collection(features, metadata),
+                        lambda: _close_quietly(rows, conn)),
+        mimetype='application/json')
+
+
+# parameters that are answered from the in-memory layers instead of Oracle
+MEMORY_LAYER_PARAMS = ('bbox', 'zoom', 'tolerance', 'precision', 'classify', 'sort', 'max_features')
+LAYER_FORMATS = ('geojson', 'topojson')
+
+
+def wants_memory_layer(filters=(), layer_name=None):
+    """True unless this is the plain full-layer request and `layer_name` is not loaded
+    yet (that one is streamed from Oracle, see oracle_layer_response); `filters` are
+    the endpoint's own filter parameters."""
+    return (any(request.args.get(p) for p in MEMORY_LAYER_PARAMS + tuple(filters))
+            or (request.args.get('format') or 'geojson').lower() != 'geojson'
+            or (layer_name is not None and LAYER_STORE.is_loaded(layer_name)))
+
+
+def layer_metadata(layer, rows, returned, extra_metadata=None, snapshot=None):
+    """The metadata every layer response carries, whichever way it was served."""
+    metadata = {
+        'total_count': len(returned),
+        'matched_count': len(rows),
+        'truncated': len(returned) < len(rows),
+        'version': (snapshot or layer_snapshot(layer)).version
+    }
+    if extra_metadata:
+        metadata.update(extra_metadata(layer, rows))
+    return metadata
+
+
+def memory_layer_response(layer_name, select, extra_metadata=None):
+    """Answer a layer request from its in-memory copy.
+
+    Handles bbox= (via the spatial index), zoom= / tolerance= (via the
+    precomputed levels of detail), sort= / order= and max_features= (top N),
+    precision= (decimal places kept in the coordinates), classify= (legend
+    breaks, see /api/classify) and format=topojson. `select(layer)` returns
+    the boolean row mask of the endpoint's usual filters, and
+    `extra_metadata(layer, rows)` adds layer-specific fields computed over
+    all matches.
+    """
+    bbox = None
+    if request.args.get('bbox'):
+        try:
+            bbox = parse_bbox(request.args['bbox'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid bbox: {e}'}), 400
+    fmt = (request.args.get('format') or 'geojson').lower()
+    if fmt not in LAYER_FORMATS:
+        return jsonify({'error': f"Invalid format: use one of {', '.join(LAYER_FORMATS)}"}), 400
+    precision = None
+    if request.args.get('precision'):
+        try:
+            precision = parse_precision(request.args['precision'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid precision: {e}'}), 400
+    classification = None
+    if request.args.get('classify'):
+        try:
+            classification = _classify_args(layer_name, request.args, request.args['classify'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    zoom = request.args.get('zoom', None, type=float)
+    tolerance = request.args.get('tolerance', None, type=float)
+    max_features = request.args.get('max_features', None, type=int)
+    sort = request.args.get('sort') or None
+    descending = (request.args.get('order') or 'asc').lower() == 'desc'
+
+    try:
+        layer = LAYER_STORE.get(layer_name)
+        level = None
+        if zoom is not None:
+            level = layer.lods.for_zoom(zoom)
+        elif tolerance is not None:
+            level = layer.lods.for_tolerance(tolerance)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if sort and len(layer) and sort not in layer.properties[0]:
+        return jsonify({'error': f'Invalid sort: {sort} is not a property of {layer_name}'}), 400
+
+    rows = layer_rows(layer, select, bbox)
+    if sort:
+        rows = layer.columns.order(sort, rows, descending)
+    rows = rows.tolist()
+    returned = rows[:max_features] if max_features is not None and max_features >= 0 else rows
+    metadata = layer_metadata(layer, rows, returned, extra_metadata)
+    if bbox:
+        metadata['bbox'] = list(bbox)
+    if sort:
+        metadata['sort'] = {'field': sort, 'order': 'desc' if descending else 'asc'}
+    if zoom is not None or tolerance is not None:
+        metadata['lod'] = {'zoom': level.zoom, 'tolerance': level.tolerance} if level else 'full'
+    if classification:
+        metadata['classification'] = layer_classes(layer, *classification)
+
+    geometries = level.geometries if level else layer.geometries
+    level_key = level.zoom if level else None
+    if fmt == 'topojson':
+        # arcs are worked out once per layer, level and precision; requests only pick rows
+        digits = DEFAULT_PRECISION if precision is None else precision
+        topology = layer.variant(('topology', level_key, digits), lambda: Topology(geometries, digits))
+        metadata['precision'] = digits
+        body = topology.encode(layer_name, returned, [layer.properties[i] for i in returned], metadata)
+        return Response(body, mimetype='application/json')
+    if precision is not None:
+        geometries = layer.variant(('rounded', level_key, precision),
+                                   lambda: [round_fragment(g, precision) for g in geometries])
+        metadata['precision'] = precision
+    features = (feature_bytes(layer.properties[i], geometries[i]) for i in returned)
+    return Response(iter_feature_collection(features, metadata), mimetype='application/json')
+
+
+# numeric properties the extra metadata of a layer streamed from Oracle is computed from
+STREAMED_METADATA_COLUMNS = {'flood_damage': ('protection_value_pound',)}
+
+
+class StreamedLayer:
+    """What extra_metadata(layer, rows) gets for a layer streamed from Oracle: only its
+    STREAMED_METADATA_COLUMNS are kept, as columns (see columns.py)."""
+
+    def __init__(self, name, values):
+        self.name = name
+        self.columns = Columns([], values)
+
+
+def oracle_layer_response(layer_name, extra_metadata=None):
+    """The plain full-layer request while the layer is not loaded: streamed straight off
+    the Oracle cursor with flat memory. Only the feature id and row hash (and the few
+    STREAMED_METADATA_COLUMNS) of each row are kept, so the metadata written after the
+    features carries the same version as memory_layer_response; the rows themselves are
+    not, and the in-memory layer is loaded separately (warm-up or the first filtered
+    request) through LAYER_STORE."""
+    sql, to_properties, attributes = DB_LAYERS[layer_name]
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        rows = fetch(conn, Query(layer_name, sql), QUERY_STATS, ORACLE_ARRAYSIZE)
+    except cx_Oracle.Error as e:
+        _close_quietly(conn)
+        return jsonify({'error': str(e)}), 500
+
+    id_field = LAYER_ID_FIELDS[layer_name]
+    ids, hashes = [], []
+    kept = {name: [] for name in STREAMED_METADATA_COLUMNS.get(layer_name, ())}
+
+    def features():
+        for properties, geometry, _ in read_layer_rows(rows, to_properties, attributes):
+            data = feature_bytes(properties, geometry)
+            ids.append(properties.get(id_field))
+            hashes.append(feature_hash(data))
+            for name, values in kept.items():
+                values.append(properties.get(name))
+            yield data
+
+    def metadata():
+        snapshot = Snapshot(ids, hashes)
+        _record_snapshot(layer_name, snapshot)
+        everything = list(range(len(ids)))
+        return layer_metadata(StreamedLayer(layer_name, kept), everything, everything,
+                              extra_metadata, snapshot)
+    return stream_feature_collection(conn, rows, features(), metadata)
+
+
+def layer_rows(layer, select=None, bbox=None):
+    """Row numbers (int array) passing the `select` mask, within bbox when given."""
+    mask = select(layer) if select else None
+    if bbox:
+        rows = np.fromiter(layer.query(bbox), dtype=np.int64)
+        return rows[mask[rows]] if mask is not None else rows
+    return np.flatnonzero(mask) if mask is not None else np.arange(len(layer))
+
+
+def _admin_allowed():
+    """/api/admin/* needs the X-Admin-Token header to match ADMIN_TOKEN; with no token
+    configured it is closed, unless ADMIN_OPEN=1 is set (local development only)."""
+    token = os.environ.get("ADMIN_TOKEN")
+    if not token:
+        return os.environ.get("ADMIN_OPEN") == "1"
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
 def get_3d_model_path(greenspace_name):
     if not greenspace_name:
         return None
@@ -113,398 +483,514 @@ def get_3d_model_path(greenspace_name):
 # ============================================================
 # API - study area
 # ============================================================
+STUDY_AREA_SQL = """
+    SELECT area_id, area_name, pva_reference, geom_json
+    FROM STUDY_AREA
+    WHERE geom_json IS NOT NULL
+"""
+
+
+def _study_area_properties(row):
+    area_id, area_name, pva_ref = row
+    return {
+        "area_id": area_id,
+        "area_name": area_name,
+        "pva_reference": pva_ref,
+    }
+
+
 @app.route('/api/study_area', methods=['GET'])
+@cached_layer('study_area')
 def get_study_area():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT area_id, area_name, pva_reference, geom_json
-            FROM STUDY_AREA
-            WHERE geom_json IS NOT NULL
-        """)
+    if request.args.get('since'):
+        return layer_changes_response('study_area')
+    if wants_memory_layer((), 'study_area'):
+        return memory_layer_response('study_area', None)
+    return oracle_layer_response('study_area')
+# ============================================================
+# API - SIMD
+# ============================================================
+SIMD_ZONE_SQL = """
+    SELECT simd_zone_id, datazone_code, datazone_name,
+           simd_decile, NVL(risk_index, 0), simd_rank, geom_json
+    FROM SIMD_ZONE
+    WHERE geom_json IS NOT NULL
+"""
+SIMD_NOTE = 'Using SIMD_DECILE for classification (1=most deprived, 10=least deprived)'
+SIMD_RISK_DECILES = {'high': (1, 3), 'medium': (4, 7), 'low': (8, 10)}
 
-        rows = cursor.fetchall()
-        print("study_area rows fetched:", len(rows))
 
-        features = []
-        fail = 0
+def _simd_properties(row):
+    zone_id, dz_code, dz_name, simd_dec, risk_idx, simd_rank = row
+    return {
+        'simd_zone_id': zone_id,
+        'datazone_code': dz_code,
+        'datazone_name': dz_name,
+        'simd_decile': simd_dec,
+        'risk_index': risk_idx,
+        'simd_rank': simd_rank
+    }
 
-        for (area_id, area_name, pva_ref, geom_json) in rows:
-            if geom_json is None:
-                continue
-            geom_str = geom_json.read() if hasattr(geom_json, "read") else geom_json
-            if isinstance(geom_str, (bytes, bytearray)):
-                geom_str = geom_str.decode("utf-8", errors="ignore")
-            if not isinstance(geom_str, str):
-                geom_str = str(geom_str)
 
-            geom_str = geom_str.strip()
-            try:
-                obj = json.loads(geom_str)
-            except Exception as e:
-                fail += 1
-                if fail <= 5: 
-                    print("study_area json.loads failed:", e)
-                    print("sample:", geom_str[:120])
-                continue
-            if isinstance(obj, list):
-                geometry = {"type": "Polygon", "coordinates": [obj]}
-            elif isinstance(obj, dict) and ("type" in obj and "coordinates" in obj):
-                geometry = obj
+SIMD_FILTER_PARAMS = ('risk_level', 'min', 'max')
 
-            elif isinstance(obj, dict) and obj.get("type") == "Feature":
-                geometry = obj.get("geometry")
-            else:
-                fail += 1
-                if fail <= 5:
-                    print("study_area unknown geom_json format, keys:", list(obj.keys())[:10] if isinstance(obj, dict) else type(obj))
-                continue
 
-            if not geometry:
-                continue
+def _simd_filter(args):
+    """risk_level= / min= / max= as a row mask over the in-memory layer."""
+    decile_range = SIMD_RISK_DECILES.get(args.get('risk_level'))
+    min_val = args.get('min', None, type=float)
+    max_val = args.get('max', None, type=float)
 
-            features.append({
-                "type": "Feature",
-                "properties": {
-                    "area_id": int(area_id) if area_id is not None else None,
-                    "area_name": area_name,
-                    "pva_reference": pva_ref,
-                },
-                "geometry": geometry
-            })
+    def select(layer):
+        mask = layer.columns.between('simd_decile', min_val, max_val)
+        if decile_range:
+            mask &= layer.columns.between('simd_decile', *decile_range)
+        return mask
+    return select
 
-        print("study_area features built:", len(features), "failed:", fail)
 
-        return jsonify({"type": "FeatureCollection", "features": features})
+def _simd_metadata(args):
+    risk_level = args.get('risk_level', None)
+    return lambda layer, rows: {'filter': risk_level, 'note': SIMD_NOTE}
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
-    finally:
-        try:
-            if cursor:
-                cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
-# ============================================================
-# API - SIMD
-# ============================================================
 @app.route('/api/simd_zones', methods=['GET'])
+@cached_layer('simd_zones')
 def get_simd_zones():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        cursor = conn.cursor()
-        
-        risk_level = request.args.get('risk_level', None)
-        min_val = request.args.get('min', None, type=float)
-        max_val = request.args.get('max', None, type=float)
-        
-        sql = """
-            SELECT simd_zone_id, datazone_code, datazone_name, 
-                   simd_decile, risk_index, simd_rank, geom_json
-            FROM SIMD_ZONE
-            WHERE geom_json IS NOT NULL
-        """
-        
-        if risk_level:
-            if risk_level == 'high':
-                sql += " AND simd_decile BETWEEN 1 AND 3"
-            elif risk_level == 'medium':
-                sql += " AND simd_decile BETWEEN 4 AND 7"
-            elif risk_level == 'low':
-                sql += " AND simd_decile BETWEEN 8 AND 10"
-        
-        if min_val is not None:
-            sql += f" AND simd_decile >= {min_val}"
-        if max_val is not None:
-            sql += f" AND simd_decile <= {max_val}"
-        
-        cursor.execute(sql)
-        
-        features = []
-        for row in cursor:
-            zone_id, dz_code, dz_name, simd_dec, risk_idx, simd_rank, geom_json = row
-            if geom_json:
-                geom_str = geom_json.read() if hasattr(geom_json, 'read') else str(geom_json)
-                try:
-                    geometry = json.loads(geom_str)
-                    features.append({
-                        'type': 'Feature',
-                        'properties': {
-                            'simd_zone_id': zone_id,
-                            'datazone_code': dz_code,
-                            'datazone_name': dz_name,
-                            'simd_decile': int(simd_dec) if simd_dec else None,
-                            'risk_index': float(risk_idx) if risk_idx else 0,
-                            'simd_rank': int(simd_rank) if simd_rank else None
-                        },
-                        'geometry': geometry
-                    })
-                except: pass
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': features,
-            'metadata': {
-                'total_count': len(features),
-                'filter': risk_level,
-                'note': 'Using SIMD_DECILE for classification (1=most deprived, 10=least deprived)'
-            }
-        })
-    except cx_Oracle.Error as e:
-        return jsonify({'error': str(e)}), 500
+    if request.args.get('since'):
+        return layer_changes_response('simd_zones', SIMD_FILTER_PARAMS)
+    if wants_memory_layer(SIMD_FILTER_PARAMS, 'simd_zones'):
+        return memory_layer_response('simd_zones', _simd_filter(request.args), _simd_metadata(request.args))
+    return oracle_layer_response('simd_zones', _simd_metadata(request.args))
 
 # ============================================================
 # API - Green space
 # ============================================================
-@app.route('/api/greenspaces', methods=['GET'])
-def get_greenspaces():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        cursor = conn.cursor()
-        gs_type = request.args.get('type', None)
-        min_storage = request.args.get('min_storage', None, type=float)
-        max_storage = request.args.get('max_storage', None, type=float)
-        
-        sql = """
-            SELECT greenspace_id, name, function_type, 
-                   storage_volume_m3, is_key_greenspace, geom_json
-            FROM GREENSPACE WHERE geom_json IS NOT NULL
-        """
-        
+GREENSPACE_SQL = """
+    SELECT greenspace_id, name, function_type,
+           NVL(storage_volume_m3, 0), is_key_greenspace,
+           NVL2(storage_volume_m3, 1, 0), geom_json
+    FROM GREENSPACE WHERE geom_json IS NOT NULL
+"""
+# selected after the properties: has_storage is 0 where storage_volume_m3 is NULL (shown as 0)
+GREENSPACE_ATTRIBUTES = ('has_storage',)
+
+
+def _greenspace_properties(row):
+    gs_id, name, func_type, storage, is_key = row
+    model_path = get_3d_model_path(name) if is_key else None
+    return {
+        'greenspace_id': gs_id,
+        'name': name,
+        'function_type': func_type,
+        'storage_volume_m3': storage,
+        'is_key_greenspace': bool(is_key),
+        'has_3d_model': model_path is not None,
+        'model_path': model_path
+    }
+
+
+GREENSPACE_FILTER_PARAMS = ('type', 'min_storage', 'max_storage')
+
+
+def _greenspace_filter(args):
+    """type= / min_storage= / max_storage= as a row mask over the in-memory layer."""
+    gs_type = args.get('type', None)
+    min_storage = args.get('min_storage', None, type=float)
+    max_storage = args.get('max_storage', None, type=float)
+
+    def select(layer):
+        mask = layer.columns.between('storage_volume_m3', min_storage, max_storage)
+        if min_storage is not None or max_storage is not None:
+            # a missing storage volume is no volume at all, not 0
+            mask &= layer.columns.numeric('has_storage') == 1
         if gs_type == 'key':
-            sql += " AND is_key_greenspace = 1"
+            mask &= layer.columns.numeric('is_key_greenspace') == 1
         elif gs_type == 'other':
-            sql += " AND (is_key_greenspace = 0 OR is_key_greenspace IS NULL)"
-        
-        if min_storage is not None:
-            sql += f" AND storage_volume_m3 >= {min_storage}"
-        if max_storage is not None:
-            sql += f" AND storage_volume_m3 <= {max_storage}"
-        
-        cursor.execute(sql)
-        
-        features = []
-        for row in cursor:
-            gs_id, name, func_type, storage, is_key, geom_json = row
-            if geom_json:
-                geom_str = geom_json.read() if hasattr(geom_json, 'read') else str(geom_json)
-                try:
-                    geometry = json.loads(geom_str)
-                    model_path = get_3d_model_path(name) if is_key else None
-                    features.append({
-                        'type': 'Feature',
-                        'properties': {
-                            'greenspace_id': gs_id,
-                            'name': name,
-                            'function_type': func_type,
-                            'storage_volume_m3': float(storage) if storage else 0,
-                            'is_key_greenspace': bool(is_key),
-                            'has_3d_model': model_path is not None,
-                            'model_path': model_path
-                        },
-                        'geometry': geometry
-                    })
-                except: pass
-        
-        cursor.close()
-        conn.close()
-        return jsonify({'type': 'FeatureCollection', 'features': features})
-    except cx_Oracle.Error as e:
-        return jsonify({'error': str(e)}), 500
+            mask &= layer.columns.numeric('is_key_greenspace') != 1
+        return mask
+    return select
+
+
+@app.route('/api/greenspaces', methods=['GET'])
+@cached_layer('greenspaces')
+def get_greenspaces():
+    if request.args.get('since'):
+        return layer_changes_response('greenspaces', GREENSPACE_FILTER_PARAMS)
+    if wants_memory_layer(GREENSPACE_FILTER_PARAMS, 'greenspaces'):
+        return memory_layer_response('greenspaces', _greenspace_filter(request.args))
+    return oracle_layer_response('greenspaces')
 
 # ============================================================
 # API - flood area
 # ============================================================
+FLOOD_ZONE_SQL = """
+    SELECT zone_id, probability, depth_band, scenario, geom_json
+    FROM FLOOD_ZONE WHERE geom_json IS NOT NULL
+"""
+# depth= -> pattern searched for in depth_band
+FLOOD_DEPTH_BANDS = {
+    'shallow': re.compile(r'< 0\.3'),
+    'medium': re.compile(r'0\.3.*1\.0'),
+    'deep': re.compile(r'> 1\.0'),
+}
+
+
+def _flood_zone_properties(row):
+    zone_id, prob, depth_band, scenario = row
+    return {
+        'zone_id': zone_id,
+        'probability': prob,
+        'depth_band': depth_band,
+        'scenario': scenario
+    }
+
+
+def _flood_zone_filter(args):
+    """depth= as a row mask over the in-memory layer."""
+    band = FLOOD_DEPTH_BANDS.get(args.get('depth'))
+    if band is None:
+        return lambda layer: layer.columns.all()
+    return lambda layer: layer.columns.where('depth_band', lambda v: bool(v and band.search(v)))
+
+
+def _flood_zone_metadata(args):
+    depth = args.get('depth', None)
+    return lambda layer, rows: {'filter': depth}
+
+
 @app.route('/api/flood_zones', methods=['GET'])
+@cached_layer('flood_zones')
 def get_flood_zones():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        cursor = conn.cursor()
-        depth = request.args.get('depth', None)
-        
-        sql = """
-            SELECT zone_id, probability, depth_band, scenario, geom_json
-            FROM FLOOD_ZONE WHERE geom_json IS NOT NULL
-        """
-        
-        if depth == 'shallow':
-            sql += " AND depth_band LIKE '%< 0.3%'"
-        elif depth == 'medium':
-            sql += " AND depth_band LIKE '%0.3%1.0%'"
-        elif depth == 'deep':
-            sql += " AND depth_band LIKE '%> 1.0%'"
-        
-        cursor.execute(sql)
-        
-        features = []
-        for row in cursor:
-            zone_id, prob, depth_band, scenario, geom_json = row
-            if geom_json:
-                geom_str = geom_json.read() if hasattr(geom_json, 'read') else str(geom_json)
-                try:
-                    geometry = json.loads(geom_str)
-                    features.append({
-                        'type': 'Feature',
-                        'properties': {
-                            'zone_id': zone_id,
-                            'probability': prob,
-                            'depth_band': depth_band,
-                            'scenario': scenario
-                        },
-                        'geometry': geometry
-                    })
-                except: pass
-        
-        cursor.close()
-        conn.close()
-        return jsonify({'type': 'FeatureCollection', 'features': features})
-    except cx_Oracle.Error as e:
-        return jsonify({'error': str(e)}), 500
+    if request.args.get('since'):
+        return layer_changes_response('flood_zones', ('depth',))
+    if wants_memory_layer(('depth',), 'flood_zones'):
+        return memory_layer_response('flood_zones', _flood_zone_filter(request.args),
+                                     _flood_zone_metadata(request.args))
+    return oracle_layer_response('flood_zones', _flood_zone_metadata(request.args))
 
 # ============================================================
 # API - building damage
 # ============================================================
-@app.route('/api/flood_damage', methods=['GET'])
-def get_flood_damage():
+FLOOD_DAMAGE_SQL = """
+    SELECT damage_id, building_id, building_category,
+           NVL(flood_depth_m, 0), NVL(damage_2024_pound, 0),
+           NVL(damage_protected_pound, 0), NVL(protection_value_pound, 0), geom_json
+    FROM FLOOD_DAMAGE WHERE geom_json IS NOT NULL
+"""
+
+
+def _flood_damage_properties(row):
+    damage_id, building_id, category, depth, damage_2024, damage_protected, protection_value = row
+    return {
+        'damage_id': damage_id,
+        'building_id': building_id,
+        'building_category': category,
+        'flood_depth_m': depth,
+        'damage_2024_pound': damage_2024,
+        'damage_protected_pound': damage_protected,
+        'protection_value_pound': protection_value
+    }
+
+
+def _flood_damage_filter(args):
+    """type= / min_value= / max_value= as a row mask over the in-memory layer
+    (_flood_damage_where is the SQL form used by the keyset pages)."""
+    building_type = (args.get('type') or '').lower()
+    min_value = args.get('min_value', None, type=float)
+    max_value = args.get('max_value', None, type=float)
+
+    def select(layer):
+        mask = layer.columns.between('protection_value_pound', min_value, max_value)
+        if building_type:
+            mask &= layer.columns.where('building_category',
+                                        lambda v: building_type in (v or '').lower())
+        return mask
+    return select
+
+
+def _protection_range(layer, rows):
+    values = layer.columns.numeric('protection_value_pound')[rows]
+    positive = values[values > 0]
+    return {
+        'max_protection_value': max(float(values.max()), 0) if len(values) else 0,
+        'min_protection_value': float(positive.min()) if len(positive) else 0
+    }
+
+
+# mode=cluster / mode=hexbin: buildings summarised per screen cell below this zoom
+DAMAGE_AGGREGATE_MODES = ('cluster', 'hexbin')
+DAMAGE_AGGREGATE_MAX_ZOOM = int(os.environ.get("DAMAGE_AGGREGATE_MAX_ZOOM", "16"))
+DAMAGE_SUMS = ('damage_2024_pound', 'damage_protected_pound', 'protection_value_pound')
+DAMAGE_FILTER_PARAMS = ('type', 'min_value', 'max_value')
+
+
+def _damage_cells(layer, mode, zoom, rows=None):
+    """Cluster / hexbin cells for the given rows (all buildings when None)."""
+    lon, lat = layer.centroids
+    if rows is None:
+        rows = np.arange(len(layer))
+    rows = rows[np.isfinite(lon[rows])]
+    x, y = to_mercator(lon[rows], lat[rows])
+    sums = {name: layer.column(name)[rows] for name in DAMAGE_SUMS}
+    maxima = {'max_flood_depth_m': layer.column('flood_depth_m')[rows]}
+    return aggregate(mode, zoom, x, y, sums, maxima), len(rows)
+
+
+def aggregated_damage_response(mode):
+    """Buildings as cluster points or hexagons at zoom=, with counts, summed damage and
+    protection and the deepest flooding per cell. From DAMAGE_AGGREGATE_MAX_ZOOM up the
+    individual buildings are returned instead."""
+    if mode not in DAMAGE_AGGREGATE_MODES:
+        return jsonify({'error': f"Invalid mode: use one of {', '.join(DAMAGE_AGGREGATE_MODES)}"}), 400
+    zoom = request.args.get('zoom', None, type=float)
+    if zoom is None or not 0 <= zoom <= 24:
+        return jsonify({'error': f'mode={mode} needs zoom= between 0 and 24'}), 400
+    if zoom >= DAMAGE_AGGREGATE_MAX_ZOOM:
+        return memory_layer_response('flood_damage', _flood_damage_filter(request.args), _protection_range)
+
+    bbox = None
+    if request.args.get('bbox'):
+        try:
+            bbox = parse_bbox(request.args['bbox'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid bbox: {e}'}), 400
+    try:
+        layer = LAYER_STORE.get('flood_damage')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    level = int(zoom)
+    if bbox or any(request.args.get(p) for p in DAMAGE_FILTER_PARAMS):
+        rows = layer_rows(layer, _flood_damage_filter(request.args), bbox)
+        (properties, geometries), count = _damage_cells(layer, mode, level, rows)
+    else:
+        # the unfiltered cells of each zoom level are kept with the layer
+        (properties, geometries), count = layer.variant(
+            (mode, level), lambda: _damage_cells(layer, mode, level))
+
+    metadata = {
+        'mode': mode,
+        'zoom': level,
+        'cell_count': len(properties),
+        'total_count': count,
+        'max_zoom': DAMAGE_AGGREGATE_MAX_ZOOM,
+        'max_protection_value': max([p['protection_value_pound'] for p in properties] + [0]),
+        'max_count': max([p['count'] for p in properties] + [0]),
+    }
+    if bbox:
+        metadata['bbox'] = list(bbox)
+    features = (feature_bytes(p, g) for p, g in zip(properties, geometries))
+    return Response(iter_feature_collection(features, metadata), mimetype='application/json')
+
+
+def _flood_damage_where(query, args):
+    """The type= / min_value= / max_value= filters as SQL clauses on a FLOOD_DAMAGE query."""
+    building_type = args.get('type', None)
+    min_value = args.get('min_value', None, type=float)
+    max_value = args.get('max_value', None, type=float)
+    if building_type:
+        query.where('type', "LOWER(building_category) LIKE :building_type ESCAPE '\\'",
+                    building_type=like_contains(building_type.lower()))
+    if min_value is not None:
+        query.where('min', "protection_value_pound >= :min_value", min_value=min_value)
+    if max_value is not None:
+        query.where('max', "protection_value_pound <= :max_value", max_value=max_value)
+    return query
+
+
+# limit= / cursor= / fields=: pages of buildings read from Oracle in keyset order,
+# selecting only the requested columns
+DAMAGE_FIELDS = {
+    'damage_id': 'damage_id',
+    'building_id': 'building_id',
+    'building_category': 'building_category',
+    'flood_depth_m': 'NVL(flood_depth_m, 0)',
+    'damage_2024_pound': 'NVL(damage_2024_pound, 0)',
+    'damage_protected_pound': 'NVL(damage_protected_pound, 0)',
+    'protection_value_pound': 'NVL(protection_value_pound, 0)',
+    'geometry': 'geom_json',
+}
+DAMAGE_PAGE_PARAMS = ('limit', 'cursor', 'fields')
+DAMAGE_PAGE_SORTS = ('damage_id', 'protection_value_pound')
+DAMAGE_PAGE_SIZE = 1000
+DAMAGE_PAGE_MAX = int(os.environ.get("DAMAGE_PAGE_MAX", "10000"))
+PAGED_DAMAGE_SQL = "SELECT {columns} FROM FLOOD_DAMAGE WHERE geom_json IS NOT NULL"
+
+
+def encode_cursor(sort, order, key):
+    """Opaque cursor naming the last row of a page (its sort value and damage_id)."""
+    raw = dumps([sort, order] + list(key))
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(text, sort, order):
+    """The row key in a cursor; raises ValueError if it is malformed or from another ordering."""
+    try:
+        raw = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+        c_sort, c_order, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if c_sort != sort or c_order != order or len(key) != (1 if sort == 'damage_id' else 2):
+        raise ValueError('Cursor was issued for a different sort= / order=')
+    return key
+
+
+def paged_damage_response():
+    """Buildings from Oracle with fields= (any of DAMAGE_FIELDS, 'geometry' included)
+    and limit= / cursor= keyset paging ordered on sort=damage_id (default, ascending)
+    or sort=protection_value_pound (default descending). The type / min_value /
+    max_value filters apply; metadata.next_cursor fetches the next page."""
+    memory_only = [p for p in MEMORY_LAYER_PARAMS if p != 'sort' and request.args.get(p)]
+    if (request.args.get('format') or 'geojson').lower() != 'geojson':
+        memory_only.append('format')
+    if memory_only:
+        return jsonify({'error': f"{', '.join(memory_only)} cannot be combined with limit=, cursor= or fields="}), 400
+
+    fields = [f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()]
+    unknown = [f for f in fields if f not in DAMAGE_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Invalid fields: {', '.join(unknown)}; use {', '.join(DAMAGE_FIELDS)}"}), 400
+    fields = fields or list(DAMAGE_FIELDS)
+    sort = request.args.get('sort') or 'damage_id'
+    if sort not in DAMAGE_PAGE_SORTS:
+        return jsonify({'error': f"Invalid sort: use one of {', '.join(DAMAGE_PAGE_SORTS)}"}), 400
+    order = (request.args.get('order') or ('asc' if sort == 'damage_id' else 'desc')).lower()
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid order: use asc or desc'}), 400
+    limit = None
+    if request.args.get('limit'):
+        limit = request.args.get('limit', None, type=int)
+        if limit is None or not 1 <= limit <= DAMAGE_PAGE_MAX:
+            return jsonify({'error': f'limit must be between 1 and {DAMAGE_PAGE_MAX}'}), 400
+    elif request.args.get('cursor'):
+        limit = DAMAGE_PAGE_SIZE
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'], sort, order)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    # the row key comes first, whether or not it was asked for
+    keys = ['damage_id'] if sort == 'damage_id' else [sort, 'damage_id']
+    selected = keys + [f for f in fields if f not in keys]
+    query = Query('flood_damage_page', PAGED_DAMAGE_SQL.format(
+        columns=', '.join(DAMAGE_FIELDS[f] for f in selected)))
+    _flood_damage_where(query, request.args)
+    direction = order.upper()
+    cmp = '<' if order == 'desc' else '>'
+    if sort == 'damage_id':
+        if after is not None:
+            query.where('after', f"damage_id {cmp} :after_id", after_id=after[0])
+        query.order_by(f'damage_id {direction}')
+    else:
+        value = DAMAGE_FIELDS[sort]
+        if after is not None:
+            query.where('after', f"({value} {cmp} :after_value OR ({value} = :after_value AND damage_id {cmp} :after_id))",
+                        after_value=after[0], after_id=after[1])
+        query.order_by(f'{value} {direction}, damage_id {direction}')
+    if limit is not None:
+        # one row past the page tells whether there is a next one
+        query.fetch_first(limit + 1)
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        building_type = request.args.get('type', None)
-        min_value = request.args.get('min_value', None, type=float)
-        max_value = request.args.get('max_value', None, type=float)
-        
-        sql = """
-            SELECT damage_id, building_id, building_category,
-                   flood_depth_m, damage_2024_pound, 
-                   damage_protected_pound, protection_value_pound, geom_json
-            FROM FLOOD_DAMAGE WHERE geom_json IS NOT NULL
-        """
-        
-        if building_type:
-            sql += f" AND LOWER(building_category) LIKE LOWER('%{building_type}%')"
-        if min_value is not None:
-            sql += f" AND protection_value_pound >= {min_value}"
-        if max_value is not None:
-            sql += f" AND protection_value_pound <= {max_value}"
-        
-        cursor.execute(sql)
-        
-        features = []
-        max_protection = 0
-        min_protection = float('inf')
-        
-        for row in cursor:
-            (damage_id, building_id, category, depth, 
-             damage_2024, damage_protected, protection_value, geom_json) = row
-            if geom_json:
-                geom_str = geom_json.read() if hasattr(geom_json, 'read') else str(geom_json)
-                try:
-                    geometry = json.loads(geom_str)
-                    pv = float(protection_value) if protection_value else 0
-                    if pv > max_protection: max_protection = pv
-                    if pv < min_protection and pv > 0: min_protection = pv
-                    
-                    features.append({
-                        'type': 'Feature',
-                        'properties': {
-                            'damage_id': damage_id,
-                            'building_id': building_id,
-                            'building_category': category,
-                            'flood_depth_m': float(depth) if depth else 0,
-                            'damage_2024_pound': float(damage_2024) if damage_2024 else 0,
-                            'damage_protected_pound': float(damage_protected) if damage_protected else 0,
-                            'protection_value_pound': pv
-                        },
-                        'geometry': geometry
-                    })
-                except: pass
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': features,
-            'metadata': {
-                'max_protection_value': max_protection,
-                'min_protection_value': min_protection if min_protection != float('inf') else 0,
-                'total_count': len(features)
-            }
-        })
+        rows = fetch(conn, query, QUERY_STATS, ORACLE_ARRAYSIZE)
     except cx_Oracle.Error as e:
+        _close_quietly(conn)
         return jsonify({'error': str(e)}), 500
 
+    properties = [f for f in fields if f != 'geometry']
+    stats = {'seen': 0, 'count': 0, 'last': None, 'more': False}
+
+    def features():
+        for row in rows:
+            if limit is not None and stats['seen'] >= limit:
+                stats['more'] = True
+                break
+            stats['seen'] += 1
+            values = dict(zip(selected, row))
+            stats['last'] = [values[k] for k in keys]
+            geometry = b'null'
+            if 'geometry' in values:
+                geometry = geometry_fragment(values['geometry'])
+                if geometry is None:
+                    continue
+            stats['count'] += 1
+            yield feature_bytes({f: values[f] for f in properties}, geometry)
+
+    def metadata():
+        return {
+            'total_count': stats['count'],
+            'fields': fields,
+            'sort': sort,
+            'order': order,
+            'limit': limit,
+            'next_cursor': encode_cursor(sort, order, stats['last']) if stats['more'] else None
+        }
+    return stream_feature_collection(conn, rows, features(), metadata)
+
+
+@app.route('/api/flood_damage', methods=['GET'])
+@cached_layer('flood_damage')
+def get_flood_damage():
+    if request.args.get('since'):
+        return layer_changes_response('flood_damage', DAMAGE_FILTER_PARAMS + DAMAGE_PAGE_PARAMS + ('mode',))
+    if request.args.get('mode'):
+        return aggregated_damage_response(request.args['mode'])
+    if any(request.args.get(p) for p in DAMAGE_PAGE_PARAMS):
+        return paged_damage_response()
+    if wants_memory_layer(DAMAGE_FILTER_PARAMS, 'flood_damage'):
+        return memory_layer_response('flood_damage', _flood_damage_filter(request.args), _protection_range)
+    return oracle_layer_response('flood_damage', _protection_range)
+
 # ============================================================
 # API - summary
 # ============================================================
 @app.route('/api/summary', methods=['GET'])
+@cached_layer('summary')
 def get_summary():
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor()
         summary = {}
         
-        cursor.execute("""
-            SELECT COUNT(*), SUM(damage_2024_pound), 
-                   SUM(damage_protected_pound), SUM(protection_value_pound)
+        row = fetch_one(conn, Query('summary_damage', """
+            SELECT COUNT(*), NVL(SUM(damage_2024_pound), 0),
+                   NVL(SUM(damage_protected_pound), 0), NVL(SUM(protection_value_pound), 0)
             FROM FLOOD_DAMAGE
-        """)
-        row = cursor.fetchone()
+        """), QUERY_STATS)
         if row:
             summary['affected_buildings'] = row[0]
-            summary['total_damage_2024'] = float(row[1]) if row[1] else 0
-            summary['total_damage_protected'] = float(row[2]) if row[2] else 0
-            summary['total_protection_value'] = float(row[3]) if row[3] else 0
+            summary['total_damage_2024'] = row[1]
+            summary['total_damage_protected'] = row[2]
+            summary['total_protection_value'] = row[3]
         
-            cursor.execute("""
-                 SELECT SUM(storage_volume_m3), COUNT(*) 
-                FROM GREENSPACE 
-                 WHERE LOWER(name) IN (
-                    'spylaw public park',
-                    'colinton and craiglockhart dells',
-                    'hailes quarry park',
-                    'saughton allotments',
-                    'saughton sports complex',
-                    'saughton rose gardens',
-                    'saughton park and gardens',
-                    'murray field',
-                    'roseburn public park'
-                 )
-        """)
-        row = cursor.fetchone()
-        summary['total_storage_m3'] = float(row[0]) if row[0] else 0
+        row = fetch_one(conn, Query('summary_storage', """
+            SELECT NVL(SUM(storage_volume_m3), 0), COUNT(*)
+            FROM GREENSPACE
+            WHERE LOWER(name) IN (
+                'spylaw public park',
+                'colinton and craiglockhart dells',
+                'hailes quarry park',
+                'saughton allotments',
+                'saughton sports complex',
+                'saughton rose gardens',
+                'saughton park and gardens',
+                'murray field',
+                'roseburn public park'
+            )
+        """), QUERY_STATS)
+        summary['total_storage_m3'] = row[0]
         summary['greenspace_count'] = row[1]
         
-        cursor.execute("SELECT COUNT(*) FROM SIMD_ZONE")
-        summary['simd_zone_count'] = cursor.fetchone()[0]
+        row = fetch_one(conn, Query('summary_simd', "SELECT COUNT(*) FROM SIMD_ZONE"), QUERY_STATS)
+        summary['simd_zone_count'] = row[0]
         
         if summary.get('total_damage_2024', 0) > 0:
             summary['protection_percentage'] = round(
@@ -513,161 +999,468 @@ def get_summary():
         else:
             summary['protection_percentage'] = 73.0
         
-        cursor.close()
-        conn.close()
         return jsonify(summary)
     except cx_Oracle.Error as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        _close_quietly(conn)
 
 # ============================================================
 # API - Statistics by type
 # ============================================================
 @app.route('/api/damage_by_category', methods=['GET'])
+@cached_layer('summary')
 def get_damage_by_category():
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT building_category, COUNT(*), 
-                   SUM(damage_2024_pound), SUM(protection_value_pound)
+        rows = fetch_all(conn, Query('damage_by_category', """
+            SELECT building_category, COUNT(*),
+                   NVL(SUM(damage_2024_pound), 0), NVL(SUM(protection_value_pound), 0)
             FROM FLOOD_DAMAGE
             GROUP BY building_category
             ORDER BY SUM(protection_value_pound) DESC
-        """)
+        """), QUERY_STATS)
         
         result = []
-        for row in cursor:
+        for category, count, total_damage, total_protection in rows:
             result.append({
-                'category': row[0],
-                'count': row[1],
-                'total_damage': float(row[2]) if row[2] else 0,
-                'total_protection': float(row[3]) if row[3] else 0
+                'category': category,
+                'count': count,
+                'total_damage': total_damage,
+                'total_protection': total_protection
             })
         
-        cursor.close()
-        conn.close()
         return jsonify(result)
     except cx_Oracle.Error as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        _close_quietly(conn)
+
+# ============================================================
+# API - Damage by zone
+# ============================================================
+# by= -> (polygon layer, zone properties carried into the result)
+AGGREGATE_ZONES = {
+    'simd_zone': ('simd_zones', ('simd_zone_id', 'datazone_code', 'datazone_name',
+                                 'simd_decile', 'risk_index', 'simd_rank')),
+    'postcode': ('postcodes', ('Postcode', 'District', 'Sector')),
+    'flood_zone': ('flood_zones', ('zone_id', 'probability', 'depth_band', 'scenario')),
+    'study_area': ('study_area', ('area_id', 'area_name', 'pva_reference')),
+}
+
+
+def _zone_totals(damage, zones):
+    """Buildings (by centroid) joined to the zone polygons, with counts and sums per zone.
+    Overlapping zones (flood zones of several scenarios) each count the building."""
+    lon, lat = damage.centroids
+    points, rows = zones.locator.pairs(lon, lat)
+    n = len(zones)
+    totals = {'building_count': np.bincount(rows, minlength=n)}
+    for name in DAMAGE_SUMS:
+        totals[name] = np.bincount(rows, weights=np.nan_to_num(damage.column(name)[points]), minlength=n)
+    depth = np.zeros(n)
+    np.maximum.at(depth, rows, np.nan_to_num(damage.column('flood_depth_m')[points]))
+    totals['max_flood_depth_m'] = depth
+    outside = np.ones(len(damage), dtype=bool)
+    outside[points] = False
+    return totals, int(np.count_nonzero(outside))
+
+
+@app.route('/api/aggregate', methods=['GET'])
+@cached_layer('summary')
+def get_aggregate():
+    by = request.args.get('by', 'simd_zone')
+    if by not in AGGREGATE_ZONES:
+        return jsonify({'error': f"Invalid by: use one of {', '.join(AGGREGATE_ZONES)}"}), 400
+    fmt = (request.args.get('format') or 'json').lower()
+    if fmt not in ('json', 'geojson'):
+        return jsonify({'error': 'Invalid format: use json or geojson'}), 400
+    zone_layer, zone_fields = AGGREGATE_ZONES[by]
+    try:
+        damage = LAYER_STORE.get('flood_damage')
+        zones = LAYER_STORE.get(zone_layer)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    # kept with the building layer for as long as both loaded copies are current
+    totals, outside = damage.variant(('zones', by, zones.loaded_at), lambda: _zone_totals(damage, zones))
+
+    results = []
+    for i, props in enumerate(zones.properties):
+        result = {f: props.get(f) for f in zone_fields}
+        result['building_count'] = int(totals['building_count'][i])
+        for name in DAMAGE_SUMS:
+            result[name] = round(float(totals[name][i]), 2)
+        result['max_flood_depth_m'] = round(float(totals['max_flood_depth_m'][i]), 3)
+        results.append(result)
+    metadata = {
+        'by': by,
+        'zone_count': len(results),
+        'building_count': len(damage),
+        'unassigned_count': outside,
+    }
+    if fmt == 'geojson':
+        features = (feature_bytes(p, g) for p, g in zip(results, zones.geometries))
+        return Response(iter_feature_collection(features, metadata), mimetype='application/json')
+    results.sort(key=lambda r: r['protection_value_pound'], reverse=True)
+    return jsonify({'metadata': metadata, 'zones': results})
+
+# ============================================================
+# API - What-if scenarios
+# ============================================================
+def _build_scenario_model(damage, green):
+    """(key greenspace rows, ScenarioModel); each building is credited to its nearest key greenspace."""
+    key_rows = [i for i, p in enumerate(green.properties) if p['is_key_greenspace']]
+    lon, lat = damage.centroids
+    nearest = np.full(len(damage), -1, dtype=np.int64)
+    located = np.flatnonzero(np.isfinite(lon))
+    if key_rows and len(located):
+        distances = green.locator.distances_m(key_rows, lon[located], lat[located])
+        nearest[located] = np.where(np.isfinite(distances.min(axis=1)), distances.argmin(axis=1), -1)
+    model = ScenarioModel([p['building_category'] for p in damage.properties],
+                          damage.column('flood_depth_m'), damage.column('damage_2024_pound'),
+                          damage.column('damage_protected_pound'), nearest, len(key_rows))
+    return key_rows, model
+
+
+def _scenario_storage(args, payload):
+    """{greenspace id or name: multiplier} from a JSON body or storage=key:multiplier,..."""
+    if isinstance(payload, dict):
+        storage = payload.get('storage', payload)
+        if not isinstance(storage, dict):
+            raise ValueError('storage must be an object of greenspace: multiplier')
+        return storage
+    storage = {}
+    for part in (args.get('storage') or '').split(','):
+        if not part.strip():
+            continue
+        key, sep, value = part.rpartition(':')
+        if not sep or not key.strip():
+            raise ValueError('storage must be greenspace:multiplier pairs separated by commas')
+        storage[key.strip()] = value
+    return storage
+
+
+def _scenario_multipliers(green, key_rows, storage):
+    """{key greenspace index: multiplier}; keys are greenspace_id or name (as in GREENSPACE_3D_MODELS)."""
+    lookup = {}
+    for i, row in enumerate(key_rows):
+        props = green.properties[row]
+        lookup[str(props['greenspace_id'])] = i
+        lookup[(props['name'] or '').lower()] = i
+        model_path = get_3d_model_path(props['name'])
+        for name, folder in GREENSPACE_3D_MODELS.items():
+            if model_path == f"3d_models/{folder}/index.html":
+                lookup.setdefault(name.lower(), i)
+
+    multipliers = {}
+    for key, value in storage.items():
+        i = lookup.get(str(key).strip().lower())
+        if i is None:
+            raise ValueError(f'Unknown key greenspace: {key}')
+        try:
+            m = float(value)
+        except (TypeError, ValueError):
+            m = -1.0
+        if not 0 <= m <= MAX_MULTIPLIER:
+            raise ValueError(f'Storage multiplier for {key} must be between 0 and {MAX_MULTIPLIER:g}')
+        multipliers[i] = m
+    return multipliers
+
+
+@app.route('/api/scenario', methods=['GET', 'POST'])
+def run_scenario():
+    payload = request.get_json(silent=True) if request.method == 'POST' else None
+    try:
+        storage = _scenario_storage(request.args, payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        damage = LAYER_STORE.get('flood_damage')
+        green = LAYER_STORE.get('greenspaces')
+        # curve parameters are fitted once per loaded copy of both layers
+        key_rows, model = damage.variant(('scenario', green.loaded_at),
+                                         lambda: _build_scenario_model(damage, green))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    try:
+        multipliers = _scenario_multipliers(green, key_rows, storage)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    result = model.run(multipliers)
+    baseline = model.run({})
+    total_damage = result['total_damage_2024']
+    greenspaces = []
+    storage_total = 0.0
+    for i, row in enumerate(key_rows):
+        props = green.properties[row]
+        m = result['multipliers'].get(i, 1.0)
+        count, protection = result['greenspaces'][i]
+        storage_total += (props['storage_volume_m3'] or 0) * m
+        greenspaces.append({
+            'greenspace_id': props['greenspace_id'],
+            'name': props['name'],
+            'multiplier': m,
+            'storage_volume_m3': round((props['storage_volume_m3'] or 0) * m, 2),
+            'building_count': count,
+            'protection_value_pound': round(protection, 2)
+        })
+    summary = {
+        'affected_buildings': len(damage),
+        'total_damage_2024': round(total_damage, 2),
+        'total_damage_protected': round(result['total_damage_protected'], 2),
+        'total_protection_value': round(result['total_protection_value'], 2),
+        'protection_percentage': round(result['total_protection_value'] / total_damage * 100, 1)
+                                 if total_damage > 0 else 0.0,
+        'total_storage_m3': round(storage_total, 2),
+        'baseline_protection_value': round(baseline['total_protection_value'], 2),
+        'protection_change': round(result['total_protection_value'] - baseline['total_protection_value'], 2)
+    }
+    by_category = [{
+        'category': category,
+        'count': count,
+        'total_damage': round(total, 2),
+        'total_protection': round(protection, 2)
+    } for category, count, total, protection in result['categories']]
+    by_category.sort(key=lambda c: c['total_protection'], reverse=True)
+    return jsonify({'scenario': result['scenario'], 'summary': summary,
+                    'by_category': by_category, 'greenspaces': greenspaces})
 
 # ============================================================
 # API - Green space ranking
 # ============================================================
 @app.route('/api/greenspace_ranking', methods=['GET'])
+@cached_layer('greenspaces')
 def get_greenspace_ranking():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
+    limit = request.args.get('limit', 10, type=int)
     try:
-        cursor = conn.cursor()
-        limit = request.args.get('limit', 10, type=int)
-        
-        cursor.execute(f"""
-            SELECT greenspace_id, name, function_type, storage_volume_m3, is_key_greenspace
-            FROM GREENSPACE
-            WHERE storage_volume_m3 IS NOT NULL
-            ORDER BY storage_volume_m3 DESC
-            FETCH FIRST {limit} ROWS ONLY
-        """)
-        
-        result = []
-        for row in cursor:
-            gs_id, name, func_type, storage, is_key = row
-            model_path = get_3d_model_path(name) if is_key else None
-            result.append({
-                'greenspace_id': gs_id,
-                'name': name,
-                'function_type': func_type,
-                'storage_volume_m3': float(storage) if storage else 0,
-                'is_key_greenspace': bool(is_key),
-                'has_3d_model': model_path is not None
-            })
-        
-        cursor.close()
-        conn.close()
-        return jsonify(result)
-    except cx_Oracle.Error as e:
+        layer = LAYER_STORE.get('greenspaces')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    # largest storage first, over the greenspaces with a storage volume (and a geometry);
+    # the greenspace filters (type=, min_storage=, max_storage=) apply too
+    rows = layer_rows(layer, _greenspace_filter(request.args))
+    rows = rows[layer.columns.numeric('has_storage')[rows] == 1]
+    rows = layer.columns.order('storage_volume_m3', rows, descending=True)[:max(limit, 0)]
+
+    result = []
+    for i in rows.tolist():
+        props = layer.properties[i]
+        result.append({
+            'greenspace_id': props['greenspace_id'],
+            'name': props['name'],
+            'function_type': props['function_type'],
+            'storage_volume_m3': float(props['storage_volume_m3'] or 0),
+            'is_key_greenspace': props['is_key_greenspace'],
+            'has_3d_model': props['has_3d_model']
+        })
+
+    return jsonify(result)
+
+# ============================================================
+# API - Classification
+# ============================================================
+# numeric properties that legends can be classified on, first = default
+CLASSIFY_FIELDS = {
+    'flood_damage': ('protection_value_pound', 'damage_2024_pound', 'damage_protected_pound', 'flood_depth_m'),
+    'greenspaces': ('storage_volume_m3',),
+    'simd_zones': ('simd_decile', 'risk_index', 'simd_rank'),
+    'postcodes': ('protection_value', 'total_damage', 'affected_count'),
+}
+
+
+def _classify_args(layer_name, args, method):
+    """(field, method, k) from field= / k= and the given method; raises ValueError."""
+    fields = CLASSIFY_FIELDS.get(layer_name)
+    if not fields:
+        raise ValueError(f"Layer cannot be classified: use one of {', '.join(CLASSIFY_FIELDS)}")
+    field = args.get('field') or fields[0]
+    if field not in fields:
+        raise ValueError(f"Invalid field: use one of {', '.join(fields)}")
+    method = (method or CLASSIFY_DEFAULT).lower()
+    if method not in CLASSIFY_METHODS:
+        raise ValueError(f"Invalid method: use one of {', '.join(CLASSIFY_METHODS)}")
+    return field, method, parse_classes(args.get('k'))
+
+
+def layer_classes(layer, field, method, k):
+    """Class breaks over the whole layer, worked out once per loaded copy of it."""
+    result = layer.variant(('classes', field, method, k),
+                           lambda: classify(layer.column(field), method, k))
+    return dict(result, field=field)
+
+
+@app.route('/api/classify', methods=['GET'])
+def get_classes():
+    layer_name = request.args.get('layer', 'flood_damage')
+    try:
+        field, method, k = _classify_args(layer_name, request.args, request.args.get('method'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        layer = LAYER_STORE.get(layer_name)
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
+    result = layer_classes(layer, field, method, k)
+    result['layer'] = layer_name
+    return jsonify(result)
 
 # ============================================================
 # API - data export
 # ============================================================
+# Finished exports are kept on disk (shared by the workers) per data version
+EXPORT_CACHE = ExportCache(os.environ.get(
+    "EXPORT_CACHE_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'exports')))
+
+# data_type -> (tables, SELECT with a {columns} slot, columns, download name, has geometry);
+# the columns are also the fields= a table export can be narrowed to
+EXPORTS = {
+    'flood_damage': (('FLOOD_DAMAGE',), "SELECT {columns} FROM FLOOD_DAMAGE", ['damage_id', 'building_id', 'building_category', 'flood_depth_m',
+          'damage_2024_pound', 'damage_protected_pound', 'protection_value_pound'],
+        'flood_damage_data', True),
+    'greenspaces': (('GREENSPACE',), "SELECT {columns} FROM GREENSPACE", ['greenspace_id', 'name', 'function_type', 'storage_volume_m3', 'is_key_greenspace'],
+        'greenspace_data', True),
+    'simd_zones': (('SIMD_ZONE',), "SELECT {columns} FROM SIMD_ZONE", ['simd_zone_id', 'datazone_code', 'datazone_name', 'simd_decile', 'simd_rank', 'risk_index'],
+        'simd_zone_data', True),
+    'summary': (('FLOOD_DAMAGE', 'GREENSPACE'), """
+        SELECT 'Total Buildings' as metric, COUNT(*) as value FROM FLOOD_DAMAGE
+        UNION ALL
+        SELECT 'Total Damage (2024)', SUM(damage_2024_pound) FROM FLOOD_DAMAGE
+        UNION ALL
+        SELECT 'Total Protection Value', SUM(protection_value_pound) FROM FLOOD_DAMAGE
+        UNION ALL
+        SELECT 'Total Greenspaces', COUNT(*) FROM GREENSPACE
+        UNION ALL
+        SELECT 'Total Storage (m3)', SUM(storage_volume_m3) FROM GREENSPACE
+    """, ['metric', 'value'], 'summary_statistics', False),
+    # read from the compiled postcode artifact rather than Oracle
+    'postcodes': (None, None, list(WANT_COLUMNS), 'postcode_data', True),
+}
+
+
+def table_version(conn, tables):
+    """Data version of Oracle tables: a hash of each one's row count and highest ORA_ROWSCN,
+    which moves on every committed insert, update or delete."""
+    parts = []
+    for table in tables:
+        row = fetch_one(conn, Query(f'version_{table.lower()}',
+                                    f"SELECT COUNT(*), MAX(ORA_ROWSCN) FROM {table}"), QUERY_STATS)
+        parts.append(f'{table}:{row[0]}:{row[1]}')
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _postcode_export_rows(columns, with_geometry):
+    artifact = _ensure_postcode_cache()
+    for i, props in enumerate(artifact.properties_list()):
+        row = tuple(props.get(c) for c in columns)
+        yield (row + (artifact.geometry_bytes(i),)) if with_geometry else row
+
+
+def _send_export(path, fmt, filename, cache_status, temporary=False):
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    resp = send_file(path, mimetype=mimetype, as_attachment=fmt != 'json',
+                     download_name=filename + ext, conditional=True, etag=True)
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Cache'] = cache_status
+    if temporary:
+        # exported without a data version: sent once, not kept
+        resp.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+    return resp
+
+
 @app.route('/api/export/<data_type>', methods=['GET'])
 def export_data(data_type):
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
+    """Table export as csv (default), ndjson, json, parquet, arrow, or with geometry as fgb / gpkg.
+
+    fields= picks (and orders) the exported columns. Rows are written as they
+    are fetched, so memory stays flat whatever the table size; the finished
+    file is kept until the tables' data version moves.
+    """
+    spec = EXPORTS.get(data_type)
+    if spec is None:
+        return jsonify({'error': 'Invalid data type'}), 400
+    tables, sql, columns, filename, has_geometry = spec
+
+    fmt = (request.args.get('format') or 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format: use one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if not export_available(fmt):
+        return jsonify({'error': f'{fmt} export needs pyarrow, which is not installed '
+                                 '(see requirements-optional.txt)'}), 501
+    with_geometry = fmt in GEO_FORMATS
+    if with_geometry and not has_geometry:
+        return jsonify({'error': f'{data_type} has no geometry; use csv, ndjson, json, parquet or arrow'}), 400
+    cache_name = data_type
+    if request.args.get('fields'):
+        if sql is not None and '{columns}' not in sql:
+            return jsonify({'error': f'{data_type} export has fixed columns'}), 400
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in columns]
+        if unknown or not fields:
+            return jsonify({'error': f"Invalid fields: use some of {', '.join(columns)}"}), 400
+        if fields != columns:
+            # each projection is its own file, versioned like the full export
+            cache_name = f"{data_type}.{hashlib.sha1(','.join(fields).encode('utf-8')).hexdigest()[:8]}"
+        columns = fields
+
+    conn = rows = None
     try:
-        cursor = conn.cursor()
-        format_type = request.args.get('format', 'csv')
-        
-        if data_type == 'flood_damage':
-            cursor.execute("""
-                SELECT damage_id, building_id, building_category, flood_depth_m,
-                       damage_2024_pound, damage_protected_pound, protection_value_pound
-                FROM FLOOD_DAMAGE
-            """)
-            columns = ['damage_id', 'building_id', 'building_category', 'flood_depth_m',
-                      'damage_2024_pound', 'damage_protected_pound', 'protection_value_pound']
-            filename = 'flood_damage_data'
-            
-        elif data_type == 'greenspaces':
-            cursor.execute("""
-                SELECT greenspace_id, name, function_type, storage_volume_m3, is_key_greenspace
-                FROM GREENSPACE
-            """)
-            columns = ['greenspace_id', 'name', 'function_type', 'storage_volume_m3', 'is_key_greenspace']
-            filename = 'greenspace_data'
-            
-        elif data_type == 'simd_zones':
-            cursor.execute("""
-                SELECT simd_zone_id, datazone_code, datazone_name, simd_decile, simd_rank, risk_index
-                FROM SIMD_ZONE
-            """)
-            columns = ['simd_zone_id', 'datazone_code', 'datazone_name', 'simd_decile', 'simd_rank', 'risk_index']
-            filename = 'simd_zone_data'
-            
-        elif data_type == 'summary':
-            cursor.execute("""
-                SELECT 'Total Buildings' as metric, COUNT(*) as value FROM FLOOD_DAMAGE
-                UNION ALL
-                SELECT 'Total Damage (2024)', SUM(damage_2024_pound) FROM FLOOD_DAMAGE
-                UNION ALL
-                SELECT 'Total Protection Value', SUM(protection_value_pound) FROM FLOOD_DAMAGE
-                UNION ALL
-                SELECT 'Total Greenspaces', COUNT(*) FROM GREENSPACE
-                UNION ALL
-                SELECT 'Total Storage (m3)', SUM(storage_volume_m3) FROM GREENSPACE
-            """)
-            columns = ['metric', 'value']
-            filename = 'summary_statistics'
+        if tables is None:
+            version = hashlib.sha1(_ensure_postcode_cache().etag('all').encode('utf-8')).hexdigest()[:16]
         else:
-            return jsonify({'error': 'Invalid data type'}), 400
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if format_type == 'json':
-            data = [dict(zip(columns, row)) for row in rows]
-            return jsonify(data)
-        else:  # CSV
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(columns)
-            writer.writerows(rows)
-            
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
-            )
+            conn = get_db_connection()
+            if not conn:
+                return jsonify({'error': 'Database connection failed'}), 500
+            try:
+                version = table_version(conn, tables)
+            except cx_Oracle.Error as e:
+                # still exported, just not kept
+                app.logger.warning("export version check failed for %s: %s", data_type, e)
+                version = None
+
+        cached = EXPORT_CACHE.get(cache_name, version, fmt)
+        if cached:
+            _close_quietly(conn)
+            return _send_export(cached, fmt, filename, 'HIT')
+
+        known = None
+        if tables is None:
+            records = _postcode_export_rows(columns, with_geometry)
+        else:
+            query = Query(f'export_{data_type}', sql.format(
+                columns=', '.join(columns + (['geom_json'] if with_geometry else []))))
+            rows = fetch(conn, query, QUERY_STATS, ORACLE_ARRAYSIZE)
+            known = description_kinds(rows.cursor.description)
+            if with_geometry:
+                records = (row[:-1] + (geometry_fragment(row[-1]),) for row in rows)
+            else:
+                records = rows
+
+        if fmt in STREAMED_FORMATS:
+            mimetype, ext = EXPORT_FORMATS[fmt]
+            body = EXPORT_CACHE.tee(STREAM_WRITERS[fmt](records, columns), cache_name, version, fmt)
+            headers = {} if fmt == 'json' else {
+                'Content-Disposition': f'attachment; filename={filename}{ext}'}
+            resp = Response(ClosingIterator(body, lambda: _close_quietly(rows, conn)),
+                            mimetype=mimetype, headers=headers)
+            resp.headers['X-Cache'] = 'MISS'
+            return resp
+
+        if with_geometry:
+            path = EXPORT_CACHE.build(cache_name, version, fmt, lambda tmp: write_ogr(
+                records, columns, tmp, fmt, layer=data_type, known=known))
+        else:
+            path = EXPORT_CACHE.build(cache_name, version, fmt, lambda tmp: write_arrow(
+                records, columns, tmp, fmt, known=known))
+        _close_quietly(rows, conn)
+        return _send_export(path, fmt, filename, 'MISS', temporary=version is None)
     except cx_Oracle.Error as e:
+        _close_quietly(rows, conn)
         return jsonify({'error': str(e)}), 500
 
 # ============================================================
@@ -675,65 +1468,97 @@ def export_data(data_type):
 # ============================================================
 POSTCODE_GPKG_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'Postcode.gpkg')
 POSTCODE_LAYER = "postcode"
+# compiled with `python postcode_artifact.py`; rebuilt here from the GeoPackage if missing or stale
+POSTCODE_ARTIFACT_PATH = os.environ.get(
+    "POSTCODE_ARTIFACT", os.path.join(os.path.dirname(__file__), '..', 'data', 'Postcode.artifact'))
 
-_POSTCODE_CACHE = None  #
+_POSTCODE_ARTIFACT = None
+_POSTCODE_INDEX = None
+_POSTCODE_LOCK = threading.Lock()
 
 def _ensure_postcode_cache():
-    global _POSTCODE_CACHE
+    """Open (mmap) the compiled postcode artifact and build the postcode index."""
+    global _POSTCODE_ARTIFACT, _POSTCODE_INDEX
 
-    if _POSTCODE_CACHE is not None:
-        return
+    if _POSTCODE_ARTIFACT is not None:
+        return _POSTCODE_ARTIFACT
 
-    if not os.path.exists(POSTCODE_GPKG_PATH):
-        raise FileNotFoundError(f'Postcode file not found: {POSTCODE_GPKG_PATH}')
+    with _POSTCODE_LOCK:
+        if _POSTCODE_ARTIFACT is not None:
+            return _POSTCODE_ARTIFACT
 
-    gdf = gpd.read_file(POSTCODE_GPKG_PATH, layer=POSTCODE_LAYER)
+        artifact = None
+        if os.path.exists(POSTCODE_ARTIFACT_PATH):
+            try:
+                artifact = PostcodeArtifact.open(POSTCODE_ARTIFACT_PATH)
+                if artifact.is_stale(POSTCODE_GPKG_PATH):
+                    artifact = None
+            except ValueError:
+                # written by an older format version
+                artifact = None
+
+        if artifact is None:
+            if not os.path.exists(POSTCODE_GPKG_PATH):
+                raise FileNotFoundError(f'Postcode file not found: {POSTCODE_GPKG_PATH}')
+            # fallback: compile in-process (imports GeoPandas) and keep the result for other workers
+            data = compile_postcodes(POSTCODE_GPKG_PATH, POSTCODE_LAYER)
+            try:
+                write_artifact(data, POSTCODE_ARTIFACT_PATH)
+                artifact = PostcodeArtifact.open(POSTCODE_ARTIFACT_PATH)
+            except OSError:
+                artifact = PostcodeArtifact(data)
+
+        _POSTCODE_INDEX = PostcodeIndex(artifact.properties_list())
+        _POSTCODE_ARTIFACT = artifact
+        return artifact
 
-    if gdf.crs is None:
-        gdf = gdf.set_crs(epsg=27700)
-    gdf = gdf.to_crs(epsg=4326)
 
-    want_cols = [
-        'Postcode', 'District', 'Sector', 'Council', 'OA22',
-        'affected_count', 'total_damage', 'protection_value'
-    ]
-    keep_cols = [c for c in want_cols if c in gdf.columns]
-    gdf = gdf[keep_cols + ['geometry']]
+def _postcode_filter(args):
+    filter_val = (args.get('filter') or '').strip().lower()
+    affected = lambda layer: np.nan_to_num(layer.columns.numeric('affected_count'))
+    if filter_val == 'affected':
+        return lambda layer: affected(layer) > 0
+    if filter_val == 'unaffected':
+        return lambda layer: affected(layer) == 0
+    return lambda layer: layer.columns.all()
 
-    _POSTCODE_CACHE = json.loads(gdf.to_json())
+
+def _load_postcode_layer():
+    artifact = _ensure_postcode_cache()
+    rows = range(artifact.count)
+    return LayerData('postcodes', artifact.properties_list(),
+                     [artifact.geometry_bytes(i) for i in rows],
+                     [artifact.envelope(i) for i in rows])
 
 
 @app.route('/api/postcodes', methods=['GET'])
+@cached_layer('postcodes')
 def get_postcodes():
     try:
-        _ensure_postcode_cache()
-
-        filter_val = (request.args.get('filter') or '').strip().lower()
-        if not filter_val:
-            return jsonify(_POSTCODE_CACHE)
+        if request.args.get('since'):
+            return layer_changes_response('postcodes', ('filter',))
+        if wants_memory_layer():
+            return memory_layer_response('postcodes', _postcode_filter(request.args))
 
-        # filter
-        features = _POSTCODE_CACHE.get('features', [])
+        artifact = _ensure_postcode_cache()
 
-        def get_acount(f):
-            p = (f.get('properties') or {})
-            v = p.get('affected_count', 0)
-            try:
-                return float(v)
-            except Exception:
-                return 0.0
-
-        if filter_val == 'affected':
-            filtered = [f for f in features if get_acount(f) > 0]
-        elif filter_val == 'unaffected':
-            filtered = [f for f in features if get_acount(f) == 0]
-        else:
-            filtered = features
-
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': filtered
-        })
+        # the filtered subsets are precompiled, so every variant is served straight from the mmap
+        filter_val = (request.args.get('filter') or '').strip().lower()
+        section = filter_val if filter_val in ('affected', 'unaffected') else 'all'
+
+        variants = artifact.variants(section)
+        encoding = negotiate(request.accept_encodings, variants)
+        if encoding:
+            section = variants[encoding]
+
+        resp = Response(artifact.iter_section(section), mimetype='application/json')
+        resp.content_length = len(artifact.section(section))
+        resp.set_etag(artifact.etag(section))
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        resp.vary.add('Accept-Encoding')
+        resp.headers['Cache-Control'] = f'public, max-age={LAYER_CACHE_MAX_AGE}, must-revalidate'
+        return resp.make_conditional(request)
 
     except Exception as e:
         return jsonify({'type': 'FeatureCollection', 'features': [], 'error': str(e)}), 500
@@ -746,35 +1571,24 @@ def search_postcode():
         return jsonify({'error': 'Please provide a postcode', 'found': False}), 400
 
     try:
-        _ensure_postcode_cache()
+        artifact = _ensure_postcode_cache()
 
-        features = _POSTCODE_CACHE.get('features', [])
-        key1 = postcode
-        key2 = postcode.replace(' ', '')
+        row = _POSTCODE_INDEX.lookup(postcode)
 
-        hit = None
-        for f in features:
-            props = (f.get('properties') or {})
-            pc = (props.get('Postcode') or props.get('postcode') or '')
-            pc_u = str(pc).upper()
-            if pc_u == key1 or pc_u.replace(' ', '') == key2 or pc_u.startswith(key2):
-                hit = f
-                break
-
-        if not hit:
+        if row is None:
             return jsonify({
                 'found': False,
                 'postcode': postcode,
                 'message': 'Postcode not found in study area'
             })
 
-        props = hit.get('properties') or {}
+        props = artifact.properties_list()[row]
         return jsonify({
             'found': True,
             'postcode': props.get('Postcode') or props.get('postcode') or postcode,
             'district': props.get('District'),
             'sector': props.get('Sector'),
-            'geometry': hit.get('geometry'),
+            'geometry': json.loads(artifact.geometry_bytes(row)),
             'affected_buildings': props.get('affected_count', 0),
             'total_damage': props.get('total_damage', 0),
             'protection_value': props.get('protection_value', 0),
@@ -784,16 +1598,688 @@ def search_postcode():
     except Exception as e:
         return jsonify({'error': str(e), 'found': False}), 500
 
+@app.route('/api/postcode/suggest', methods=['GET'])
+def suggest_postcode():
+    query = (request.args.get('q') or '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    weighted = request.args.get('weighted', '').lower() in ('1', 'true', 'yes')
+    if not query:
+        return jsonify({'query': query, 'suggestions': []})
+
+    try:
+        artifact = _ensure_postcode_cache()
+        suggestions = []
+        for row in _POSTCODE_INDEX.suggest(query, limit, weighted):
+            props = artifact.properties_list()[row]
+            suggestions.append({
+                'postcode': props.get('Postcode') or props.get('postcode'),
+                'district': props.get('District'),
+                'sector': props.get('Sector'),
+                'affected_count': props.get('affected_count', 0)
+            })
+        return jsonify({'query': query, 'suggestions': suggestions})
+    except Exception as e:
+        return jsonify({'error': str(e), 'suggestions': []}), 500
+
+# ============================================================
+# In-memory layers
+# ============================================================
+def read_layer_rows(rows, to_properties, attributes=()):
+    """(properties, geometry fragment, attribute values) of each row with a usable geom_json,
+    which must be the last selected column, after the `attributes` columns."""
+    for row in rows:
+        geometry = geometry_fragment(row[-1])
+        if geometry is None:
+            continue
+        end = len(row) - 1 - len(attributes)
+        yield to_properties(row[:end]), geometry, row[end:-1]
+
+
+def layer_data(name, read, attributes=()):
+    """LayerData from read_layer_rows items; the attributes are kept for filters and sorts."""
+    values = {a: [item[2][i] for item in read] for i, a in enumerate(attributes)}
+    return LayerData(name, [item[0] for item in read], [item[1] for item in read], attributes=values)
+
+
+def _load_db_layer(name):
+    """Read a whole layer table once (see DB_LAYERS)."""
+    sql, to_properties, attributes = DB_LAYERS[name]
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    rows = None
+    try:
+        rows = fetch(conn, Query(f'layer_{name}', sql), QUERY_STATS, ORACLE_ARRAYSIZE)
+        layer = layer_data(name, list(read_layer_rows(rows, to_properties, attributes)), attributes)
+        app.logger.info("%s layer loaded: %d features", name, len(layer))
+        return layer
+    finally:
+        _close_quietly(rows, conn)
+
+
+# ============================================================
+# Layer versions
+# ============================================================
+# feature id of each in-memory layer, for ?since= change feeds
+LAYER_ID_FIELDS = {
+    'study_area': 'area_id',
+    'flood_damage': 'damage_id',
+    'flood_zones': 'zone_id',
+    'simd_zones': 'simd_zone_id',
+    'greenspaces': 'greenspace_id',
+    'postcodes': 'Postcode',
+}
+VERSION_STORE = VersionStore(os.environ.get(
+    "LAYER_VERSION_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'versions')))
+
+
+def layer_snapshot(layer):
+    """Row hashes and data version of a loaded layer (see layer_versions.py)."""
+    return layer.variant('snapshot', lambda: Snapshot.of(layer, LAYER_ID_FIELDS[layer.name]))
+
+
+def _record_version(layer):
+    _record_snapshot(layer.name, layer_snapshot(layer))
+
+
+def _record_snapshot(name, snapshot):
+    # every loaded or streamed version is kept, so later requests can diff against it
+    try:
+        VERSION_STORE.save(name, snapshot)
+    except OSError as e:
+        app.logger.warning("could not keep version of %s: %s", name, e)
+
+
+def layer_changes_response(layer_name, filters=()):
+    """?since=<version>: the features added or changed since that version (and the ids
+    removed), or the whole layer with delta=false when that version is not known."""
+    combined = [p for p in MEMORY_LAYER_PARAMS + tuple(filters) if request.args.get(p)]
+    if combined:
+        return jsonify({'error': f"since= cannot be combined with {', '.join(combined)}"}), 400
+    since = request.args['since']
+    try:
+        layer = LAYER_STORE.get(layer_name)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    snapshot = layer_snapshot(layer)
+    id_field = LAYER_ID_FIELDS[layer_name]
+    metadata = {'version': snapshot.version, 'since': since, 'id_field': id_field}
+
+    old = {} if since == snapshot.version else VERSION_STORE.load(layer_name, since)
+    if old is None:
+        rows = range(len(layer))
+        metadata.update(delta=False, total_count=len(layer))
+    elif since == snapshot.version:
+        rows = []
+        metadata.update(delta=True, added=[], changed=[], removed=[], total_count=0)
+    else:
+        added, changed, removed = snapshot.changes(old)
+        rows = added + changed
+        metadata.update(delta=True, total_count=len(rows),
+                        added=[snapshot.ids[i] for i in added],
+                        changed=[snapshot.ids[i] for i in changed],
+                        removed=removed)
+    features = (feature_bytes(layer.properties[i], layer.geometries[i]) for i in rows)
+    return Response(iter_feature_collection(features, metadata), mimetype='application/json')
+
+
+@app.route('/api/versions', methods=['GET'])
+def get_versions():
+    """{layer: {'version': ...}} per layer; a layer that cannot be loaded gets a null
+    version and its error, so clients can still resume the others."""
+    versions = {}
+    for name in LAYER_ID_FIELDS:
+        try:
+            versions[name] = {'version': layer_snapshot(LAYER_STORE.get(name)).version}
+        except Exception as e:
+            versions[name] = {'version': None, 'error': str(e)}
+    if all(v['version'] is None for v in versions.values()):
+        return jsonify(versions), 500
+    return jsonify(versions)
+
+
+# Oracle layers: SELECT (geom_json last), row -> properties, attribute columns before geom_json
+DB_LAYERS = {
+    'study_area': (STUDY_AREA_SQL, _study_area_properties, ()),
+    'flood_damage': (FLOOD_DAMAGE_SQL, _flood_damage_properties, ()),
+    'flood_zones': (FLOOD_ZONE_SQL, _flood_zone_properties, ()),
+    'simd_zones': (SIMD_ZONE_SQL, _simd_properties, ()),
+    'greenspaces': (GREENSPACE_SQL, _greenspace_properties, GREENSPACE_ATTRIBUTES),
+}
+
+LAYER_STORE = LayerStore({
+    'study_area': lambda: _load_db_layer('study_area'),
+    'flood_damage': lambda: _load_db_layer('flood_damage'),
+    'flood_zones': lambda: _load_db_layer('flood_zones'),
+    'simd_zones': lambda: _load_db_layer('simd_zones'),
+    'greenspaces': lambda: _load_db_layer('greenspaces'),
+    'postcodes': _load_postcode_layer,
+}, ttl=LAYER_CACHE.ttl, on_load=_record_version)
+
+# ============================================================
+# Warm-up
+# ============================================================
+# the unfiltered layer requests map.html makes on load (postcodes are served from the artifact)
+WARM_PATHS = {
+    'study_area': '/api/study_area',
+    'simd_zones': '/api/simd_zones',
+    'greenspaces': '/api/greenspaces',
+    'flood_zones': '/api/flood_zones',
+    'flood_damage': '/api/flood_damage',
+}
+WARM_ON_START = os.environ.get("WARM_ON_START", "1") == "1"
+
+WARM_STATUS = {name: {'state': 'cold'} for name in LAYER_STORE.loaders}
+_WARM_LOCK = threading.Lock()
+_WARM_RUNNING = threading.Event()
+
+
+def _warm_workers():
+    """One worker per pooled connection, so warm-up never queues on the pool."""
+    pool = _get_pool()
+    size = getattr(pool, 'max', None) or int(os.environ.get("ORACLE_POOL_MAX", "4"))
+    return max(1, int(size))
+
+
+def _warm_layer(name):
+    status = {'state': 'warming', 'started_at': time.time()}
+    WARM_STATUS[name] = status
+    start = time.perf_counter()
+    try:
+        layer = LAYER_STORE.get(name)
+        # the R-tree is built on first use; build it now rather than on the first bbox request
+        layer.index
+        path = WARM_PATHS.get(name)
+        if path:
+            _warm_response(name, path)
+        WARM_STATUS[name] = {'state': 'warm', 'seconds': round(time.perf_counter() - start, 2),
+                             'finished_at': time.time()}
+    except Exception as e:
+        WARM_STATUS[name] = {'state': 'error', 'error': str(e),
+                             'seconds': round(time.perf_counter() - start, 2)}
+
+
+def _warm_response(name, path):
+    """Put the default response of `path` in LAYER_CACHE, rendered from the layer that was
+    just loaded (the endpoint's view without cached_layer, which answers from memory once
+    the layer is loaded), unless it is cached or being built already."""
+    key = LayerCache.make_key(path, {})
+    if LAYER_CACHE.peek(key):
+        return
+    claim, owner = LAYER_CACHE.claim(key)
+    if not owner:
+        return
+    try:
+        with app.test_request_context(path):
+            view = app.view_functions[request.endpoint].__wrapped__
+            resp = app.make_response(view())
+            try:
+                if resp.status_code != 200:
+                    raise RuntimeError(f'{path} returned {resp.status_code}')
+                LAYER_CACHE.put(key, name, resp.get_data(), resp.mimetype)
+            finally:
+                resp.close()
+    finally:
+        LAYER_CACHE.release(key, claim)
+
+
+def warm_layers(names=None):
+    """Load the in-memory layers and default responses concurrently. Returns False if already running."""
+    with _WARM_LOCK:
+        if _WARM_RUNNING.is_set():
+            return False
+        _WARM_RUNNING.set()
+    try:
+        names = [n for n in (names or LAYER_STORE.loaders) if n in LAYER_STORE.loaders]
+        with ThreadPoolExecutor(max_workers=_warm_workers(), thread_name_prefix='warm') as pool:
+            list(pool.map(_warm_layer, names))
+        app.logger.info("warm-up finished: %s", {n: WARM_STATUS[n]['state'] for n in names})
+        return True
+    finally:
+        _WARM_RUNNING.clear()
+
+
+def start_warm_up(names=None):
+    threading.Thread(target=warm_layers, args=(names,), name='warm-up', daemon=True).start()
+
+
+def warm_on_start():
+    """Called once a worker is up (gunicorn.conf.py, or below when run directly), never
+    on import, so tools and tests that import app do not touch Oracle."""
+    if WARM_ON_START:
+        start_warm_up()
+
+
+def warm_status():
+    layers = {}
+    for name in LAYER_STORE.loaders:
+        info = dict(WARM_STATUS.get(name) or {'state': 'cold'})
+        info['loaded'] = LAYER_STORE.is_loaded(name)
+        if name in WARM_PATHS:
+            info['response_cached'] = LAYER_CACHE.peek(WARM_PATHS[name])
+        layers[name] = info
+    return {
+        'running': _WARM_RUNNING.is_set(),
+        'warm': all(l['loaded'] for l in layers.values()),
+        'layers': layers,
+    }
+
+# ============================================================
+# API - bootstrap
+# ============================================================
+# section name -> endpoint; all of them are returned unless layers= picks some
+BOOTSTRAP_SECTIONS = {
+    'study_area': '/api/study_area',
+    'simd_zones': '/api/simd_zones',
+    'greenspaces': '/api/greenspaces',
+    'flood_zones': '/api/flood_zones',
+    'flood_damage': '/api/flood_damage',
+    'summary': '/api/summary',
+    'damage_by_category': '/api/damage_by_category',
+    'greenspace_ranking': '/api/greenspace_ranking',
+}
+# selectable, but large and already served straight from the artifact
+BOOTSTRAP_OPTIONAL = {'postcodes': '/api/postcodes'}
+
+
+def _bootstrap_section(path):
+    """(etag, body) of an endpoint's default response, from LAYER_CACHE or rendered in-process."""
+    entry = LAYER_CACHE.get(LayerCache.make_key(path, {}))
+    if entry is not None:
+        return entry.etag, entry.body
+    with app.test_request_context(path):
+        resp = app.full_dispatch_request()
+        try:
+            if resp.status_code != 200:
+                raise RuntimeError(f'{path} returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}')
+            etag = resp.get_etag()[0]
+            body = resp.get_data()
+        finally:
+            resp.close()
+    return etag or hashlib.sha1(body).hexdigest(), body
+
+
+def _bootstrap_chunks(key, names, sections):
+    """The bootstrap document, one section at a time: sections already in LAYER_CACHE
+    first, then the others as each is rendered over one shared pooled connection.
+    A section that fails is left out and named under "errors"; the whole document
+    is cached once every section is in, unless it outgrows the cache budget."""
+    cached = [n for n in names if LAYER_CACHE.peek(LayerCache.make_key(sections[n], {}))]
+    order = cached + [n for n in names if n not in cached]
+    body = [b'{"layers":{']
+    etags = {}
+    errors = {}
+    conn = None
+    try:
+        yield body[0]
+        for name in order:
+            path = sections[name]
+            try:
+                if conn is None and name not in cached and name not in BOOTSTRAP_OPTIONAL:
+                    conn = get_db_connection()
+                    if not conn:
+                        raise RuntimeError('Database connection failed')
+                _SHARED_DB.conn = _SharedConnection(conn) if conn else None
+                etags[name], section = _bootstrap_section(path)
+            except Exception as e:
+                errors[name] = str(e)
+                continue
+            finally:
+                _SHARED_DB.conn = None
+            chunk = (b',' if len(etags) > 1 else b'') + dumps(name) + b':' + section
+            if body is not None:
+                body.append(chunk)
+                if sum(len(b) for b in body) > LAYER_CACHE.max_bytes:
+                    body = None
+            yield chunk
+    finally:
+        _close_quietly(conn)
+    tail = b'}' + (b',"errors":' + dumps(errors) if errors else b'') + b'}'
+    yield tail
+    if body is not None and not errors:
+        body.append(tail)
+        etag = hashlib.sha1('|'.join(f'{n}:{etags[n]}' for n in names).encode('utf-8')).hexdigest()
+        LAYER_CACHE.put(key, 'bootstrap', b''.join(body), etag=etag)
+
+
+@app.route('/api/bootstrap', methods=['GET'])
+def bootstrap():
+    """Every initial map payload in one response: {"layers": {name: body}}.
+
+    A cached document is served like a layer (precompressed, with an ETag built
+    from the sections' ETags). Otherwise the sections are streamed as they are
+    ready, gzipped on the fly when the client accepts it, so the map can draw
+    the first layers before the last one has been rendered.
+    """
+    sections = dict(BOOTSTRAP_SECTIONS, **BOOTSTRAP_OPTIONAL)
+    names = [n.strip() for n in request.args.get('layers', '').split(',') if n.strip()]
+    names = names or list(BOOTSTRAP_SECTIONS)
+    unknown = [n for n in names if n not in sections]
+    if unknown:
+        return jsonify({'error': f'Unknown layers: {", ".join(unknown)}',
+                        'available': list(sections)}), 400
+
+    key = LayerCache.make_key(request.path, {'layers': ','.join(names)})
+    entry = LAYER_CACHE.get(key)
+    if entry is not None:
+        return _cached_response(entry, 'HIT')
+
+    chunks = _bootstrap_chunks(key, names, sections)
+    resp = Response(mimetype='application/json')
+    if request.accept_encodings['gzip']:
+        chunks = gzip_stream(chunks)
+        resp.headers['Content-Encoding'] = 'gzip'
+    resp.response = chunks
+    resp.vary.add('Accept-Encoding')
+    resp.headers['Cache-Control'] = f'public, max-age={LAYER_CACHE_MAX_AGE}, must-revalidate'
+    resp.headers['X-Cache'] = 'MISS'
+    return resp
+
+# ============================================================
+# API - vector tiles
+# ============================================================
+# layer -> (feature id property, filter factory)
+TILE_LAYERS = {
+    'flood_damage': ('damage_id', _flood_damage_filter),
+    'flood_zones': ('zone_id', _flood_zone_filter),
+    'simd_zones': ('simd_zone_id', _simd_filter),
+    'greenspaces': ('greenspace_id', _greenspace_filter),
+    'postcodes': (None, _postcode_filter),
+}
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+TILE_CACHE = LayerCache(
+    ttl=LAYER_CACHE.ttl,
+    max_bytes=int(os.environ.get("TILE_CACHE_MAX_MB", "64")) * 1024 * 1024,
+)
+
+
+def render_tile(layer_name, z, x, y, select=None):
+    """Encode one MVT tile from the in-memory layer, using the LOD that suits z."""
+    layer = LAYER_STORE.get(layer_name)
+    rows = layer_rows(layer, select, tile_query_bounds(z, x, y)).tolist()
+    if not rows:
+        return b''
+
+    lods = layer.lods
+    level = lods.for_zoom(z)
+    shapes = level.shapes if level else lods.shapes
+    clipped = clip_to_tile(to_tile_coords([shapes[i] for i in rows], z, x, y))
+
+    id_field = TILE_LAYERS[layer_name][0]
+    features = []
+    for i, geom in zip(rows, clipped):
+        props = layer.properties[i]
+        features.append((props.get(id_field) if id_field else None, props, geom))
+    return encode_layer(layer_name, features)
+
+
+@app.route('/api/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_tile(layer, z, x, y):
+    if layer not in TILE_LAYERS or not valid_tile(z, x, y):
+        return jsonify({'error': 'Tile not found'}), 404
+
+    key = LayerCache.make_key(request.path, request.args)
+    entry = TILE_CACHE.get(key)
+    if entry is not None:
+        return _cached_response(entry, 'HIT')
+    try:
+        select = TILE_LAYERS[layer][1](request.args) if request.args else None
+        body = render_tile(layer, z, x, y, select)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    entry = TILE_CACHE.put(key, layer, body, MVT_MIMETYPE)
+    return _cached_response(entry, 'MISS')
+
+
+def seed_tiles(layers, min_zoom, max_zoom):
+    """Render unfiltered tiles over the study area into TILE_CACHE. Returns the number rendered."""
+    bounds = LAYER_STORE.get('study_area').index.bounds
+    if bounds is None:
+        return 0
+    rendered = 0
+    for name in layers:
+        for z in range(min_zoom, max_zoom + 1):
+            for x, y in tiles_covering(bounds, z):
+                key = f'/api/tiles/{name}/{z}/{x}/{y}.mvt'
+                if TILE_CACHE.get(key) is None:
+                    TILE_CACHE.put(key, name, render_tile(name, z, x, y), MVT_MIMETYPE)
+                    rendered += 1
+    return rendered
+
+# ============================================================
+# API - locate (reverse geocoding)
+# ============================================================
+MAX_LOCATE_POINTS = 5000
+
+
+def _parse_points(payload):
+    """[[lon, lat], ...] or [{'lat': .., 'lon': ..}, ...], optionally under 'points'."""
+    if isinstance(payload, dict):
+        payload = payload.get('points')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a list of points')
+    if len(payload) > MAX_LOCATE_POINTS:
+        raise ValueError(f'At most {MAX_LOCATE_POINTS} points per request')
+
+    xs, ys = [], []
+    for p in payload:
+        if isinstance(p, dict):
+            lon, lat = p.get('lon', p.get('lng')), p.get('lat')
+        elif isinstance(p, (list, tuple)) and len(p) >= 2:
+            lon, lat = p[0], p[1]
+        else:
+            raise ValueError('Each point must be [lon, lat] or {"lat": .., "lon": ..}')
+        lon, lat = float(lon), float(lat)
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError('Coordinates out of range')
+        xs.append(lon)
+        ys.append(lat)
+    return xs, ys
+
+
+def _pick(props, keys):
+    return {k: props.get(k) for k in keys}
+
+
+def locate_points(xs, ys, include_geometry=False):
+    """Postcode, SIMD zone, flood zones, study area and nearest key greenspace for each point."""
+    postcodes = LAYER_STORE.get('postcodes')
+    simd = LAYER_STORE.get('simd_zones')
+    flood = LAYER_STORE.get('flood_zones')
+    study = LAYER_STORE.get('study_area')
+    green = LAYER_STORE.get('greenspaces')
+
+    pc_hits = postcodes.locator.containing(xs, ys)
+    simd_hits = simd.locator.containing(xs, ys)
+    flood_hits = flood.locator.containing(xs, ys)
+    study_hits = study.locator.containing(xs, ys)
+
+    key_rows = [i for i, p in enumerate(green.properties) if p['is_key_greenspace']]
+    distances = green.locator.distances_m(key_rows, xs, ys) if key_rows else None
+
+    results = []
+    for p in range(len(xs)):
+        result = {'lon': xs[p], 'lat': ys[p]}
+
+        postcode = None
+        if pc_hits[p]:
+            row = pc_hits[p][0]
+            postcode = _pick(postcodes.properties[row],
+                             ['Postcode', 'District', 'Sector', 'affected_count', 'total_damage', 'protection_value'])
+            if include_geometry:
+                postcode['geometry'] = json.loads(postcodes.geometries[row])
+        result['postcode'] = postcode
+
+        result['simd_zone'] = _pick(simd.properties[simd_hits[p][0]], [
+            'simd_zone_id', 'datazone_code', 'datazone_name', 'simd_decile', 'simd_rank', 'risk_index'
+        ]) if simd_hits[p] else None
+        result['flood_zones'] = [flood.properties[row] for row in flood_hits[p]]
+        result['study_area'] = study.properties[study_hits[p][0]] if study_hits[p] else None
+
+        nearest = None
+        if distances is not None:
+            j = int(distances[p].argmin())
+            if distances[p, j] != float('inf'):
+                nearest = _pick(green.properties[key_rows[j]], [
+                    'greenspace_id', 'name', 'function_type', 'storage_volume_m3', 'has_3d_model', 'model_path'
+                ])
+                nearest['distance_m'] = round(float(distances[p, j]), 1)
+        result['nearest_key_greenspace'] = nearest
+        results.append(result)
+    return results
+
+
+@app.route('/api/locate', methods=['GET', 'POST'])
+def locate():
+    try:
+        if request.method == 'POST':
+            xs, ys = _parse_points(request.get_json(silent=True))
+            include_geometry = request.args.get('geometry', '0') in ('1', 'true')
+        else:
+            lat = request.args.get('lat', None, type=float)
+            lon = request.args.get('lon', None, type=float)
+            if lat is None or lon is None:
+                return jsonify({'error': 'Please provide lat and lon'}), 400
+            xs, ys = _parse_points([[lon, lat]])
+            include_geometry = request.args.get('geometry', '1') in ('1', 'true')
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        results = locate_points(xs, ys, include_geometry)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if request.method == 'POST':
+        return jsonify({'results': results, 'count': len(results)})
+    return jsonify(results[0])
+
+# ============================================================
+# Admin - layer cache
+# ============================================================
+@app.route('/api/admin/cache', methods=['GET'])
+def cache_stats():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    stats = LAYER_CACHE.stats()
+    stats['exports'] = EXPORT_CACHE.stats()
+    return jsonify(stats)
+
+
+@app.route('/api/admin/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    layer = request.args.get('layer') or None
+    removed = LAYER_CACHE.invalidate(layer)
+    removed += TILE_CACHE.invalidate(layer)
+    if layer is not None:
+        # summary / damage_by_category and the bootstrap documents span the layers
+        removed += LAYER_CACHE.invalidate('summary')
+        removed += LAYER_CACHE.invalidate('bootstrap')
+    LAYER_STORE.invalidate(layer)
+    if layer is None:
+        GEOMETRY_FRAGMENTS.clear()
+    return jsonify({'invalidated': removed, 'layer': layer or 'all'})
+
+@app.route('/api/admin/tiles/seed', methods=['POST'])
+def tiles_seed():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    layers = [request.args['layer']] if request.args.get('layer') else list(TILE_LAYERS)
+    if any(name not in TILE_LAYERS for name in layers):
+        return jsonify({'error': 'Unknown layer'}), 400
+    min_zoom = request.args.get('min_zoom', int(os.environ.get("TILE_SEED_MIN_ZOOM", "10")), type=int)
+    max_zoom = request.args.get('max_zoom', int(os.environ.get("TILE_SEED_MAX_ZOOM", "14")), type=int)
+    if not 0 <= min_zoom <= max_zoom <= 18:
+        return jsonify({'error': 'Invalid zoom range'}), 400
+    try:
+        rendered = seed_tiles(layers, min_zoom, max_zoom)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'rendered': rendered, 'layers': layers, 'zoom': [min_zoom, max_zoom],
+                    'cache': TILE_CACHE.stats()['bytes']})
+
+
+@app.route('/api/admin/queries', methods=['GET'])
+def admin_queries():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.args.get('reset') in ('1', 'true'):
+        QUERY_STATS.reset()
+    return jsonify({'statement_cache_size': ORACLE_STMT_CACHE, 'shapes': QUERY_STATS.snapshot()})
+
+
+@app.route('/api/admin/warm', methods=['GET', 'POST'])
+def admin_warm():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'GET':
+        return jsonify(warm_status())
+
+    names = [n.strip() for n in request.args.get('layers', '').split(',') if n.strip()] or None
+    if request.args.get('wait') in ('1', 'true'):
+        started = warm_layers(names)
+        return jsonify(dict(warm_status(), started=started))
+    if _WARM_RUNNING.is_set():
+        return jsonify(dict(warm_status(), started=False)), 409
+    start_warm_up(names)
+    return jsonify(dict(warm_status(), started=True)), 202
+
+
+@app.route('/api/admin/static/compress', methods=['POST'])
+def admin_static_compress():
+    """Build the .gz / .br sidecars for the frontend in the background."""
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    force = request.args.get('force') in ('1', 'true')
+
+    def run():
+        written, saved = build_sidecars(FRONTEND_DIR, force=force)
+        app.logger.info("static sidecars: %d written, %.1f MB saved", written, saved / 1e6)
+
+    threading.Thread(target=run, name='static-compress', daemon=True).start()
+    return jsonify({'started': True, 'encodings': list(ENCODINGS)}), 202
+
+
+@app.route('/api/admin/static', methods=['GET'])
+def admin_static():
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.args.get('rebuild') in ('1', 'true'):
+        STATIC_MANIFEST.build()
+    return jsonify(STATIC_MANIFEST.stats())
+
+
+@app.route('/api/admin/lod', methods=['GET'])
+def lod_report():
+    """Vertex counts per level of detail, for tuning LOD_ZOOMS."""
+    if not _admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    names = [request.args['layer']] if request.args.get('layer') else list(LAYER_STORE.loaders)
+    report = {}
+    for name in names:
+        if name not in LAYER_STORE.loaders:
+            return jsonify({'error': f'Unknown layer: {name}'}), 400
+        try:
+            report[name] = LAYER_STORE.get(name).lods.report()
+        except Exception as e:
+            report[name] = {'error': str(e)}
+    return jsonify(report)
+
 # ============================================================
 # health check
 # ============================================================
 @app.route('/api/health', methods=['GET'])
 def health_check():
     conn = get_db_connection()
+    warm = warm_status()
     if conn:
         conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected', 'version': '4.0'})
-    return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+        return jsonify({'status': 'healthy', 'database': 'connected', 'version': '4.0', 'warm_up': warm})
+    return jsonify({'status': 'unhealthy', 'database': 'disconnected', 'warm_up': warm}), 500
 
 @app.route('/api')
 def index():
@@ -809,42 +2295,127 @@ def index():
             '/api/study_area', '/api/simd_zones', '/api/greenspaces',
             '/api/flood_zones', '/api/flood_damage', '/api/summary',
             '/api/damage_by_category', '/api/greenspace_ranking',
-            '/api/postcodes', '/api/postcode/search',
-            '/api/export/<type>', '/api/health'
+            '/api/postcodes', '/api/postcode/search', '/api/postcode/suggest',
+            '/api/locate', '/api/bootstrap',
+            '/api/export/<type>', '/api/tiles/<layer>/<z>/<x>/<y>.mvt', '/api/health',
+            '/api/admin/cache', '/api/admin/cache/invalidate',
+            '/api/admin/tiles/seed', '/api/admin/lod', '/api/admin/queries',
+            '/api/admin/warm', '/api/admin/static', '/api/admin/static/compress'
         ]
     })
     
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
 
+
+def send_static(directory, filename):
+    """send_from_directory, answering with a fresh .br / .gz sidecar when the client accepts one.
+
+    Sidecars are built ahead of time (`python compression.py` or
+    POST /api/admin/static/compress); nothing is compressed per request.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    available = {}
+    for encoding in ENCODINGS:
+        side = fresh_sidecar(path, encoding)
+        if side:
+            available[encoding] = side
+    encoding = negotiate(request.accept_encodings, available)
+    if encoding is None:
+        resp = send_from_directory(directory, filename)
+    else:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        resp = send_file(available[encoding], mimetype=mimetype, conditional=True, etag=True)
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+
+# content hashes of the frontend, taken once per worker
+STATIC_MANIFEST = StaticManifest(FRONTEND_DIR)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def send_page(rel):
+    """An HTML page with its asset references rewritten to the hashed /assets/ URLs."""
+    body = STATIC_MANIFEST.page(rel)
+    resp = Response(body, mimetype='text/html')
+    resp.set_etag(hashlib.sha1(body).hexdigest())
+    # pages revalidate every time; the assets they name never change
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
+
+@app.route("/assets/<digest>/<path:name>")
+def serve_hashed_asset(digest, name):
+    """One URL per distinct file content, whichever folder(s) it appears in. Range requests
+    (e.g. for the multi-MB scene.js files) are answered by send_file."""
+    path = STATIC_MANIFEST.resolve(digest)
+    if path is None:
+        raise NotFound()
+    resp = send_static(os.path.dirname(path), os.path.basename(path))
+    resp.headers['Cache-Control'] = IMMUTABLE
+    return resp
+
+
 @app.route("/css/<path:filename>")
 def serve_css(filename):
-    return send_from_directory(os.path.join(FRONTEND_DIR, "css"), filename)
+    return send_static(os.path.join(FRONTEND_DIR, "css"), filename)
 
 @app.route("/js/<path:filename>")
 def serve_js(filename):
-    return send_from_directory(os.path.join(FRONTEND_DIR, "js"), filename)
+    return send_static(os.path.join(FRONTEND_DIR, "js"), filename)
 
 @app.route("/images/<path:filename>")
 def serve_images(filename):
-    return send_from_directory(os.path.join(FRONTEND_DIR, "images"), filename)
+    return send_static(os.path.join(FRONTEND_DIR, "images"), filename)
+
+_SCENE_PACK_LOCK = threading.Lock()
+
+
+@app.route("/3d_models/<name>/scene.bin")
+def serve_packed_scene(name):
+    """A model's scene as packed by scene_packer.py (DEM grids as quantised typed arrays,
+    coarse levels first). Packed on the first request if missing or older than scene.js."""
+    model_dir = safe_join(os.path.join(FRONTEND_DIR, "3d_models"), name)
+    if model_dir is None or not os.path.isfile(os.path.join(model_dir, "data", "index", "scene.js")):
+        raise NotFound()
+    if scene_is_stale(model_dir):
+        with _SCENE_PACK_LOCK:
+            if scene_is_stale(model_dir):
+                try:
+                    pack_model(model_dir)
+                    app.logger.info("packed 3D scene: %s", name)
+                except (OSError, ValueError) as e:
+                    # the page falls back to scene.js
+                    app.logger.warning("could not pack 3D scene %s: %s", name, e)
+                    raise NotFound()
+    resp = send_static(os.path.dirname(packed_path(model_dir)), PACKED_NAME)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 @app.route("/3d_models/<path:filename>")
 def serve_3d_models(filename):
-    return send_from_directory(os.path.join(FRONTEND_DIR, "3d_models"), filename)
+    rel = f"3d_models/{filename}"
+    if rel in STATIC_MANIFEST.files and rel.endswith('.html'):
+        return send_page(rel)
+    return send_static(os.path.join(FRONTEND_DIR, "3d_models"), filename)
 
 @app.route("/")
 def serve_index():
-    return send_from_directory(FRONTEND_DIR, "index.html")
+    return send_page("index.html")
 
 @app.route("/index.html")
 def serve_index_html():
-    return send_from_directory(FRONTEND_DIR, "index.html")
+    return send_page("index.html")
 
 @app.route("/map.html")
 def serve_map():
-    return send_from_directory(FRONTEND_DIR, "map.html")
+    return send_page("map.html")
 
 if __name__ == '__main__':
+    warm_on_start()
     port = int(os.environ.get('PORT', 55430))
     print(f"\n{'='*60}")
     print(f"  Water of Leith WebMap API ")
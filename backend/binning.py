@@ -0,0 +1,114 @@
+"""
+Water of Leith WebMap - point aggregation
+Buildings are summarised at low zoom as grid clusters or hexagonal bins sized
+in screen pixels. Binning works on NumPy arrays of building centroids in Web
+Mercator metres, so every building is assigned and summed in a few array
+passes, whatever the layer size.
+2025
+"""
+
+import math
+
+import numpy as np
+
+from geojson_stream import dumps
+
+
+EARTH_RADIUS = 6378137.0
+# cell size on screen
+CLUSTER_PIXELS = 60
+HEX_PIXELS = 30
+
+
+def to_mercator(lon, lat):
+    x = np.radians(lon) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def to_lonlat(x, y):
+    lon = np.degrees(np.asarray(x) / EARTH_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / EARTH_RADIUS)) - np.pi / 2)
+    return lon, lat
+
+
+def pixel_metres(zoom):
+    """Width of one 256px tile pixel in Web Mercator metres at `zoom`."""
+    return 2 * math.pi * EARTH_RADIUS / (256 * 2 ** zoom)
+
+
+def hex_cells(x, y, radius):
+    """Axial (q, r) of the pointy-top hexagon of circumradius `radius` containing each point."""
+    q = (math.sqrt(3) / 3 * x - y / 3) / radius
+    r = (2 / 3 * y) / radius
+    # round in cube coordinates; fix the component with the largest rounding error
+    s = -q - r
+    rq, rr, rs = np.rint(q), np.rint(r), np.rint(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_ring(q, r, radius):
+    """Closed lon/lat ring of one hexagon."""
+    cx = radius * math.sqrt(3) * (q + r / 2)
+    cy = radius * 1.5 * r
+    angles = np.radians(30 + 60 * np.arange(7))
+    lon, lat = to_lonlat(cx + radius * np.cos(angles), cy + radius * np.sin(angles))
+    return [[float(a), float(b)] for a, b in zip(lon, lat)]
+
+
+def _group(keys):
+    """Cell number per point (0..n-1) and the key of each cell, from a 2-column key array."""
+    cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return cells, inverse.reshape(-1)
+
+
+def aggregate(mode, zoom, x, y, sums, maxima):
+    """Aggregate points (Web Mercator x, y) into cells at `zoom`.
+
+    `sums` and `maxima` map output names to value arrays aligned with x / y.
+    Returns (properties dicts, geometry fragments), one per non-empty cell:
+    hexagon polygons for 'hexbin', member-weighted centre points for 'cluster'.
+    """
+    if len(x) == 0:
+        return [], []
+    if mode == 'hexbin':
+        radius = HEX_PIXELS * pixel_metres(zoom)
+        q, r = hex_cells(x, y, radius)
+        cells, inverse = _group(np.column_stack([q, r]))
+    else:
+        size = CLUSTER_PIXELS * pixel_metres(zoom)
+        cells, inverse = _group(np.column_stack([np.floor(x / size), np.floor(y / size)]).astype(np.int64))
+
+    n = len(cells)
+    counts = np.bincount(inverse, minlength=n)
+    totals = {name: np.bincount(inverse, weights=np.nan_to_num(v), minlength=n) for name, v in sums.items()}
+    peaks = {}
+    for name, v in maxima.items():
+        peak = np.full(n, -np.inf)
+        np.maximum.at(peak, inverse, np.nan_to_num(v, nan=-np.inf))
+        peaks[name] = np.where(np.isfinite(peak), peak, 0.0)
+
+    if mode == 'cluster':
+        cx = np.bincount(inverse, weights=x, minlength=n) / counts
+        cy = np.bincount(inverse, weights=y, minlength=n) / counts
+        lon, lat = to_lonlat(cx, cy)
+
+    properties, geometries = [], []
+    for i in range(n):
+        props = {'cell': f'{int(cells[i][0])}:{int(cells[i][1])}', 'count': int(counts[i])}
+        for name in totals:
+            props[name] = round(float(totals[name][i]), 2)
+        for name in peaks:
+            props[name] = round(float(peaks[name][i]), 3)
+        properties.append(props)
+        if mode == 'hexbin':
+            geometry = {'type': 'Polygon', 'coordinates': [hex_ring(int(cells[i][0]), int(cells[i][1]), radius)]}
+        else:
+            geometry = {'type': 'Point', 'coordinates': [float(lon[i]), float(lat[i])]}
+        geometries.append(dumps(geometry))
+    return properties, geometries
@@ -0,0 +1,136 @@
+"""
+Water of Leith WebMap - classification breaks
+Class breaks for choropleth legends (quantile, equal interval, Jenks natural
+breaks), worked out with NumPy over a layer's attribute column. Jenks uses
+Fisher's exact dynamic programme, filled in blocks of whole matrix rows; large
+columns are first collapsed into JENKS_MAX_VALUES equal-count groups so the
+cost stays bounded whatever the table size.
+2025
+"""
+
+import numpy as np
+
+
+METHODS = ('quantile', 'jenks', 'equal')
+DEFAULT_METHOD = 'quantile'
+DEFAULT_CLASSES = 5
+MIN_CLASSES = 2
+MAX_CLASSES = 12
+JENKS_MAX_VALUES = 2000
+JENKS_BLOCK = 256
+
+
+def parse_classes(value):
+    """Number of classes for k=; raises ValueError outside MIN_CLASSES..MAX_CLASSES."""
+    if value in (None, ''):
+        return DEFAULT_CLASSES
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        k = 0
+    if not MIN_CLASSES <= k <= MAX_CLASSES:
+        raise ValueError(f'k must be between {MIN_CLASSES} and {MAX_CLASSES}')
+    return k
+
+
+def quantile_breaks(x, k):
+    # breaks are values that occur in the column (the inverted CDF of sorted x),
+    # indexed in whole numbers so rounding in i / k cannot push one onto the next value
+    n = len(x)
+    return x[np.maximum(-(-np.arange(k + 1) * n // k) - 1, 0)]
+
+
+def equal_breaks(x, k):
+    return np.linspace(x[0], x[-1], k + 1)
+
+
+def _weighted_groups(x):
+    """Distinct sorted values with their counts, collapsed to at most JENKS_MAX_VALUES
+    equal-count groups: (group means, weights, group maxima)."""
+    values, weights = np.unique(x, return_counts=True)
+    if len(values) <= JENKS_MAX_VALUES:
+        return values, weights.astype(np.float64), values
+    # group g holds the values whose cumulative count falls in its share of the total
+    group = (np.cumsum(weights) - 1) * JENKS_MAX_VALUES // weights.sum()
+    _, group = np.unique(group, return_inverse=True)
+    n = group[-1] + 1
+    w = np.bincount(group, weights=weights, minlength=n)
+    means = np.bincount(group, weights=values * weights, minlength=n) / w
+    upper = np.full(n, -np.inf)
+    np.maximum.at(upper, group, values)
+    return means, w, upper
+
+
+def jenks_breaks(x, k):
+    """Jenks natural breaks: the k classes with the least summed within-class variance."""
+    values, w, upper = _weighted_groups(x)
+    n = len(values)
+    if n <= k:
+        return np.concatenate([[x[0]], upper])
+
+    cw = np.concatenate([[0.0], np.cumsum(w)])
+    cx = np.concatenate([[0.0], np.cumsum(w * values)])
+    cxx = np.concatenate([[0.0], np.cumsum(w * values * values)])
+    starts = np.arange(n)
+
+    def ssd(ends):
+        """Within-class sum of squares for classes starts..ends, as an (ends x starts) matrix."""
+        e = ends[:, None] + 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = cx[e] - cx[starts]
+            out = cxx[e] - cxx[starts] - s * s / (cw[e] - cw[starts])
+        out[starts[None, :] > ends[:, None]] = np.inf
+        return out
+
+    # cost[i]: least cost of splitting values 0..i into the classes so far
+    cost = ssd(np.arange(n))[:, 0]
+    back = []
+    for _ in range(1, k):
+        before = np.concatenate([[np.inf], cost[:-1]])
+        new_cost = np.empty(n)
+        start_of_last = np.zeros(n, dtype=np.int64)
+        for lo in range(0, n, JENKS_BLOCK):
+            ends = np.arange(lo, min(lo + JENKS_BLOCK, n))
+            total = before[None, :] + ssd(ends)
+            best = np.argmin(total, axis=1)
+            new_cost[ends] = total[np.arange(len(ends)), best]
+            start_of_last[ends] = best
+        back.append(start_of_last)
+        cost = new_cost
+
+    uppers = []
+    i = n - 1
+    for start_of_last in reversed(back):
+        i = start_of_last[i] - 1
+        uppers.append(upper[i])
+    return np.array([x[0]] + uppers[::-1] + [x[-1]])
+
+
+BREAKS = {'quantile': quantile_breaks, 'jenks': jenks_breaks, 'equal': equal_breaks}
+
+
+def classify(column, method=DEFAULT_METHOD, k=DEFAULT_CLASSES):
+    """Class breaks for a float column (NaN = missing).
+
+    `breaks` holds the lower bound of the first class and the upper bound of
+    every class (each class takes values above the previous break, up to and
+    including its own); repeated breaks of skewed columns are merged, so fewer
+    than k classes can come back. `counts` is the number of values per class.
+    """
+    x = np.sort(column[np.isfinite(column)])
+    result = {'method': method, 'count': int(len(x))}
+    if len(x) == 0:
+        result.update(k=0, breaks=[], counts=[])
+        return result
+    breaks = np.unique(BREAKS[method](x, k))
+    if len(breaks) == 1:
+        breaks = np.repeat(breaks, 2)
+    classes = np.searchsorted(breaks[1:-1], x, side='left')
+    result.update(
+        k=len(breaks) - 1,
+        breaks=[float(b) for b in breaks],
+        counts=[int(c) for c in np.bincount(classes, minlength=len(breaks) - 1)],
+        min=float(x[0]),
+        max=float(x[-1]),
+    )
+    return result
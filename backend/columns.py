@@ -0,0 +1,107 @@
+"""
+Water of Leith WebMap - columnar attributes
+The properties of an in-memory layer, held column by column so filters and
+sorts run as NumPy operations over every row at once: numbers (and flags) as
+float arrays, text such as building_category, depth_band or function_type
+dictionary-encoded as integer codes into its distinct values. Columns are
+built on first use and kept with the layer. A layer can also carry attributes
+that are filtered or sorted on but not returned as feature properties.
+2025
+"""
+
+import threading
+
+import numpy as np
+
+
+def _number(v):
+    if v is None or isinstance(v, str) and not v.strip():
+        return np.nan
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class Columns:
+    """Column views of a list of properties dicts, by row number; `attributes` maps
+    further column names to per-row value lists."""
+
+    def __init__(self, properties, attributes=None):
+        self.properties = properties
+        self.attributes = attributes or {}
+        self._numeric = {}
+        self._categorical = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.properties)
+
+    def numeric(self, name):
+        """Float array of a property; missing or non-numeric values are NaN, flags 0 / 1."""
+        values = self._numeric.get(name)
+        if values is None:
+            values = np.array([_number(v) for v in self._values(name)], dtype=np.float64)
+            with self._lock:
+                values = self._numeric.setdefault(name, values)
+        return values
+
+    def categorical(self, name):
+        """(distinct values, int32 codes into them) of a property; None is a value like any other."""
+        encoded = self._categorical.get(name)
+        if encoded is None:
+            lookup = {}
+            codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in self._values(name)),
+                                dtype=np.int32, count=len(self.properties))
+            encoded = (list(lookup), codes)
+            with self._lock:
+                encoded = self._categorical.setdefault(name, encoded)
+        return encoded
+
+    def _values(self, name):
+        if name in self.attributes:
+            return self.attributes[name]
+        return (p.get(name) for p in self.properties)
+
+    # --------------------------------------------------------
+    # masks
+    # --------------------------------------------------------
+    def all(self):
+        return np.ones(len(self.properties), dtype=bool)
+
+    def between(self, name, low=None, high=None):
+        """Rows with low <= value <= high (either bound optional); NaN rows fail any bound."""
+        values = self.numeric(name)
+        mask = self.all()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def where(self, name, test):
+        """Rows whose value passes test(value); the test runs once per distinct value."""
+        distinct, codes = self.categorical(name)
+        passes = np.fromiter((bool(test(v)) for v in distinct), dtype=bool, count=len(distinct))
+        return passes[codes] if len(distinct) else self.all()
+
+    # --------------------------------------------------------
+    # ordering
+    # --------------------------------------------------------
+    def order(self, name, rows=None, descending=False):
+        """`rows` (all when None) sorted on a property, ties in row order, missing values last."""
+        rows = np.arange(len(self.properties)) if rows is None else np.asarray(rows, dtype=np.int64)
+        values = self.numeric(name)[rows]
+        if np.isnan(values).all() and len(rows):
+            # a text property: sort on its distinct values
+            distinct, codes = self.categorical(name)
+            rank = np.empty(len(distinct), dtype=np.float64)
+            present = [i for i, v in enumerate(distinct) if v is not None]
+            for r, i in enumerate(sorted(present, key=lambda i: str(distinct[i]))):
+                rank[i] = r
+            if len(present) < len(distinct):
+                rank[distinct.index(None)] = np.nan
+            values = rank[codes[rows]]
+        key = -values if descending else values
+        # NaN sorts last either way
+        return rows[np.argsort(key, kind='stable')]
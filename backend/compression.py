@@ -0,0 +1,128 @@
+"""
+Water of Leith WebMap - precompressed responses
+Bodies are compressed once, at the highest level, and the encoded variants are
+kept beside the raw bytes: in LayerCache entries for API responses, and as
+.gz / .br sidecar files for the static frontend. Requests only pick a variant.
+
+Usage:  python compression.py [frontend dir]   (builds the static sidecars)
+2025
+"""
+
+import gzip
+import os
+import sys
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+# preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# smaller than this is not worth a second round trip through the decoder
+MIN_SIZE = 1024
+# already compressed formats
+SKIP_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.woff', '.woff2',
+                   '.zip', '.gz', '.br', '.mp4', '.glb', '.pbf'}
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(bytes(data), quality=11)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output (and so its ETag) identical across workers
+        return gzip.compress(bytes(data), compresslevel=9, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def gzip_stream(chunks, level=6):
+    """gzip a streamed body as it is produced, for responses that are not cached yet.
+    Every chunk is flushed, so the client can decode it as soon as it arrives."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield z.flush()
+
+
+def compressible(mimetype, size):
+    if size < MIN_SIZE:
+        return False
+    mimetype = (mimetype or '').split(';')[0].strip()
+    return (mimetype.startswith('text/') or mimetype.endswith('json') or mimetype.endswith('xml')
+            or mimetype in ('application/javascript', 'application/vnd.mapbox-vector-tile'))
+
+
+def negotiate(accept_encodings, available):
+    """Best encoding in `available` that the client accepts (werkzeug MIMEAccept-like), or None."""
+    best, best_q = None, 0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        q = accept_encodings[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# ------------------------------------------------------------
+# static sidecars
+# ------------------------------------------------------------
+def sidecar_path(path, encoding):
+    return path + SUFFIXES[encoding]
+
+
+def fresh_sidecar(path, encoding):
+    """Path of an up-to-date sidecar for `path`, or None."""
+    side = sidecar_path(path, encoding)
+    try:
+        return side if os.stat(side).st_mtime >= os.stat(path).st_mtime else None
+    except OSError:
+        return None
+
+
+def build_sidecars(root, encodings=ENCODINGS, force=False):
+    """Write .gz / .br next to every compressible file under `root`. Returns (written, bytes saved)."""
+    written = 0
+    saved = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in SKIP_EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, filename)
+            size = os.path.getsize(path)
+            if size < MIN_SIZE:
+                continue
+            data = None
+            for encoding in encodings:
+                if not force and fresh_sidecar(path, encoding):
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                packed = compress(data, encoding)
+                side = sidecar_path(path, encoding)
+                if len(packed) >= size:
+                    # not worth it; make sure a stale one is not served
+                    if os.path.exists(side):
+                        os.remove(side)
+                    continue
+                tmp = f'{side}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(packed)
+                os.replace(tmp, side)
+                written += 1
+                saved += size - len(packed)
+    return written, saved
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, '..', 'frontend')
+    n, saved = build_sidecars(root)
+    print(f'{root}: {n} sidecars written ({", ".join(ENCODINGS)}), {saved / 1e6:.1f} MB saved')
@@ -0,0 +1,177 @@
+"""
+Water of Leith WebMap - Oracle data access
+Every query the API runs goes through `fetch`: cursors get array fetch sizes
+to match the result, CLOBs (geom_json) arrive as plain strings instead of LOB
+locators, NUMBER columns come back as int / float from the driver, and rows,
+bytes, time and an estimate of the round trips are recorded per query shape.
+2025
+"""
+
+import math
+import threading
+import time
+
+import oracledb
+
+
+# small lookups and aggregates
+DEFAULT_ARRAYSIZE = 100
+
+
+def output_type_handler(cursor, metadata):
+    """Fetch CLOBs as str and constrained NUMBERs as int / float, all in the driver."""
+    if metadata.type_code in (oracledb.DB_TYPE_CLOB, oracledb.DB_TYPE_NCLOB):
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_NUMBER:
+        if metadata.scale == 0 and metadata.precision:
+            return cursor.var(int, arraysize=cursor.arraysize)
+        if metadata.scale and metadata.scale > 0:
+            return cursor.var(float, arraysize=cursor.arraysize)
+    # unconstrained NUMBER (aggregates, NVL(...)) is already int or float by value
+    return None
+
+
+class QueryStats:
+    """Executions, rows, estimated round trips, bytes and timings per query shape."""
+
+    FIELDS = ('executions', 'rows', 'estimated_round_trips', 'bytes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def record(self, shape, seconds, rows=0, estimated_round_trips=1, nbytes=0):
+        with self._lock:
+            s = self._shapes.get(shape)
+            if s is None:
+                s = self._shapes[shape] = dict.fromkeys(self.FIELDS, 0)
+                s.update(total_ms=0.0, max_ms=0.0)
+            ms = seconds * 1000
+            s['executions'] += 1
+            s['rows'] += rows
+            s['estimated_round_trips'] += estimated_round_trips
+            s['bytes'] += nbytes
+            s['total_ms'] += ms
+            s['max_ms'] = max(s['max_ms'], ms)
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for shape, s in sorted(self._shapes.items()):
+                n = s['executions']
+                out[shape] = {k: s[k] for k in self.FIELDS}
+                out[shape].update({
+                    'avg_rows': round(s['rows'] / n, 1),
+                    'total_ms': round(s['total_ms'], 2),
+                    'avg_ms': round(s['total_ms'] / n, 2),
+                    'max_ms': round(s['max_ms'], 2),
+                })
+            return out
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+def _row_bytes(row):
+    n = 0
+    for v in row:
+        if isinstance(v, (str, bytes)):
+            n += len(v)
+        elif v is not None:
+            n += 8
+    return n
+
+
+class Rows:
+    """Rows of an executed query. Iterate it (once) or call fetchone / fetchall;
+    the stats are recorded when the rows run out or it is closed."""
+
+    def __init__(self, cursor, query, stats, started):
+        self.cursor = cursor
+        self.query = query
+        self.stats = stats
+        self.started = started
+        self.count = 0
+        self.nbytes = 0
+        self._done = False
+
+    def __iter__(self):
+        try:
+            for row in self.cursor:
+                self.count += 1
+                self.nbytes += _row_bytes(row)
+                yield row
+        finally:
+            self.finish()
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.count += 1
+            self.nbytes += _row_bytes(row)
+        return row
+
+    def fetchall(self):
+        return list(self)
+
+    @property
+    def estimated_round_trips(self):
+        """Execute (which carries the prefetched rows) plus one per further array fetch.
+        Worked out from the row count and fetch sizes; the driver does not report it."""
+        extra = max(0, self.count - self.cursor.prefetchrows + 1)
+        return 1 + math.ceil(extra / max(1, self.cursor.arraysize))
+
+    def finish(self):
+        if self._done:
+            return
+        self._done = True
+        if self.stats is not None:
+            self.stats.record(self.query.shape, time.perf_counter() - self.started,
+                              self.count, self.estimated_round_trips, self.nbytes)
+
+    def close(self):
+        self.finish()
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+
+
+def fetch(conn, query, stats=None, arraysize=DEFAULT_ARRAYSIZE):
+    """Execute a query_builder.Query on a tuned cursor and return its Rows."""
+    cursor = conn.cursor()
+    cursor.arraysize = arraysize
+    # the first batch comes back with the execute, and one extra row tells
+    # the driver the result has ended without another round trip
+    cursor.prefetchrows = arraysize + 1
+    cursor.outputtypehandler = output_type_handler
+
+    started = time.perf_counter()
+    try:
+        if query.binds:
+            cursor.execute(query.sql, query.binds)
+        else:
+            cursor.execute(query.sql)
+    except Exception:
+        cursor.close()
+        raise
+    return Rows(cursor, query, stats, started)
+
+
+def fetch_one(conn, query, stats=None):
+    """First row of a query (or None), cursor closed."""
+    rows = fetch(conn, query, stats, arraysize=1)
+    try:
+        return rows.fetchone()
+    finally:
+        rows.close()
+
+
+def fetch_all(conn, query, stats=None, arraysize=DEFAULT_ARRAYSIZE):
+    """Every row of a query as a list, cursor closed."""
+    rows = fetch(conn, query, stats, arraysize)
+    try:
+        return rows.fetchall()
+    finally:
+        rows.close()
@@ -0,0 +1,321 @@
+"""
+Water of Leith WebMap - table exports
+Export rows are written as the cursor is read, one array fetch at a time:
+CSV, NDJSON and JSON are streamed to the client, Parquet / Arrow are written in
+record batches (pyarrow) and FlatGeobuf / GeoPackage, with geometry, in
+appended batches (pyogrio). Finished files are kept under the export directory,
+named after the data version of the tables they came from, and served from
+disk until that version changes.
+2025
+"""
+
+import csv
+import glob
+import io
+import json
+import os
+import threading
+
+import oracledb
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet / Arrow exports unavailable
+    pyarrow = None
+
+
+BATCH_ROWS = 1000
+CHUNK_SIZE = 64 * 1024
+CRS = 'EPSG:4326'
+TMP_MARK = '.tmp'
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'ndjson': ('application/x-ndjson', '.ndjson'),
+    'json': ('application/json', '.json'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', '.arrow'),
+    'fgb': ('application/flatgeobuf', '.fgb'),
+    'gpkg': ('application/geopackage+sqlite3', '.gpkg'),
+}
+# written to the client as they are produced
+STREAMED_FORMATS = ('csv', 'ndjson', 'json')
+ARROW_FORMATS = ('parquet', 'arrow')
+GEO_FORMATS = ('fgb', 'gpkg')
+OGR_DRIVERS = {'fgb': 'FlatGeobuf', 'gpkg': 'GPKG'}
+
+
+def available(fmt):
+    return fmt in FORMATS and (fmt not in ARROW_FORMATS or pyarrow is not None)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _json_value(v):
+    return v if v is None or isinstance(v, (int, float, str, bool)) else str(v)
+
+
+# ------------------------------------------------------------
+# streamed text formats
+# ------------------------------------------------------------
+def iter_csv(rows, columns, chunk_size=CHUNK_SIZE):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if out.tell() >= chunk_size:
+            yield out.getvalue().encode('utf-8')
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue().encode('utf-8')
+
+
+def iter_ndjson(rows, columns, chunk_size=CHUNK_SIZE):
+    buf = []
+    size = 0
+    for row in rows:
+        line = json.dumps({c: _json_value(v) for c, v in zip(columns, row)},
+                          separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n'
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(buf)
+            buf = []
+            size = 0
+    yield b''.join(buf)
+
+
+def iter_json(rows, columns, chunk_size=CHUNK_SIZE):
+    """A JSON array of row objects (the original format=json export), streamed."""
+    buf = [b'[']
+    size = 1
+    sep = b''
+    for row in rows:
+        piece = sep + json.dumps({c: _json_value(v) for c, v in zip(columns, row)},
+                                 separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        sep = b','
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buf)
+            buf = []
+            size = 0
+    buf.append(b']')
+    yield b''.join(buf)
+
+
+STREAM_WRITERS = {'csv': iter_csv, 'ndjson': iter_ndjson, 'json': iter_json}
+
+
+# ------------------------------------------------------------
+# column types for the batch formats
+# ------------------------------------------------------------
+def description_kinds(description):
+    """Column kinds from a cursor description; None where the driver gives no type."""
+    kinds = []
+    for d in description or []:
+        type_code, precision, scale = d[1], d[4], d[5]
+        if type_code is None:
+            kinds.append(None)
+        elif type_code is oracledb.DB_TYPE_NUMBER:
+            # same rule as data_access.output_type_handler
+            kinds.append('int' if scale == 0 and precision else 'float')
+        elif type_code in (oracledb.DB_TYPE_BINARY_DOUBLE, oracledb.DB_TYPE_BINARY_FLOAT):
+            kinds.append('float')
+        elif type_code is oracledb.DB_TYPE_BOOLEAN:
+            kinds.append('bool')
+        else:
+            kinds.append('str')
+    return kinds
+
+
+def column_kinds(batch, ncols, known=None):
+    """'int', 'float', 'bool' or 'str' per column: `known` kinds (description_kinds)
+    where given, otherwise guessed from the values in the first batch."""
+    kinds = []
+    for i in range(ncols):
+        if known and i < len(known) and known[i]:
+            kinds.append(known[i])
+            continue
+        values = [row[i] for row in batch if row[i] is not None]
+        if values and all(isinstance(v, bool) for v in values):
+            kinds.append('bool')
+        elif values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            kinds.append('int')
+        elif values and all(isinstance(v, (int, float)) for v in values):
+            kinds.append('float')
+        else:
+            kinds.append('str')
+    return kinds
+
+
+def _column(batch, i, kind):
+    values = [row[i] for row in batch]
+    if kind == 'str':
+        return [None if v is None else str(v) for v in values]
+    if kind == 'int':
+        # only a guessed kind can meet a fraction in a later batch
+        return [None if v is None else (v if isinstance(v, int) else int(round(v))) for v in values]
+    if kind == 'float':
+        return [None if v is None else float(v) for v in values]
+    return [None if v is None else bool(v) for v in values]
+
+
+# ------------------------------------------------------------
+# Parquet / Arrow
+# ------------------------------------------------------------
+def write_arrow(rows, columns, path, fmt, known=None, batch_rows=BATCH_ROWS):
+    """Write rows to a Parquet or Arrow IPC file one record batch at a time."""
+    types = {'int': pyarrow.int64(), 'float': pyarrow.float64(),
+             'bool': pyarrow.bool_(), 'str': pyarrow.string()}
+    writer = None
+    schema = kinds = None
+    try:
+        for batch in _batches(rows, batch_rows):
+            if writer is None:
+                kinds = column_kinds(batch, len(columns), known)
+                schema = pyarrow.schema([(c, types[k]) for c, k in zip(columns, kinds)])
+                if fmt == 'parquet':
+                    writer = pyarrow.parquet.ParquetWriter(path, schema, compression='zstd')
+                else:
+                    writer = pyarrow.ipc.new_file(path, schema)
+            arrays = [pyarrow.array(_column(batch, i, k), type=types[k]) for i, k in enumerate(kinds)]
+            writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+        if writer is None:
+            # no rows: an empty file with string columns
+            schema = pyarrow.schema([(c, pyarrow.string()) for c in columns])
+            writer = (pyarrow.parquet.ParquetWriter(path, schema) if fmt == 'parquet'
+                      else pyarrow.ipc.new_file(path, schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# ------------------------------------------------------------
+# FlatGeobuf / GeoPackage
+# ------------------------------------------------------------
+def write_ogr(rows, columns, path, fmt, layer, known=None, batch_rows=BATCH_ROWS):
+    """Write (properties..., geometry fragment) rows with pyogrio, appending batch by batch.
+
+    The last value of each row is a GeoJSON geometry fragment (bytes or str)
+    or None; the other values match `columns`.
+    """
+    # pyogrio and shapely ship with geopandas; imported here so app start-up stays light
+    import numpy as np
+    import shapely
+    from pyogrio.raw import write
+
+    dtypes = {'int': np.int64, 'float': np.float64, 'bool': np.bool_, 'str': object}
+    fill = {'int': 0, 'float': 0.0, 'bool': False, 'str': None}
+    kinds = None
+    written = 0
+    for batch in _batches(rows, batch_rows):
+        if kinds is None:
+            kinds = column_kinds([row[:-1] for row in batch], len(columns), known)
+        shapes = shapely.from_geojson([row[-1] for row in batch], on_invalid='ignore')
+        fields, masks = [], []
+        for i, k in enumerate(kinds):
+            values = _column(batch, i, k)
+            masks.append(np.array([v is None for v in values]))
+            fields.append(np.array([fill[k] if v is None else v for v in values], dtype=dtypes[k]))
+        write(path, shapely.to_wkb(shapes), fields, fields=list(columns), field_mask=masks,
+              layer=layer, driver=OGR_DRIVERS[fmt], geometry_type='Unknown', crs=CRS,
+              append=written > 0)
+        written += len(batch)
+    if kinds is None:
+        # no rows: the layer with its columns and nothing in it
+        write(path, np.array([], dtype=object), [np.array([], dtype=object) for _ in columns],
+              fields=list(columns), layer=layer, driver=OGR_DRIVERS[fmt],
+              geometry_type='Unknown', crs=CRS)
+    return written
+
+
+# ------------------------------------------------------------
+# export files on disk
+# ------------------------------------------------------------
+class ExportCache:
+    """Finished exports under `root`, one file per (name, data version, format)."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+
+    def path(self, name, version, fmt):
+        return os.path.join(self.root, f'{name}-{version}{FORMATS[fmt][1]}')
+
+    def get(self, name, version, fmt):
+        if version is None:
+            return None
+        path = self.path(name, version, fmt)
+        return path if os.path.isfile(path) else None
+
+    def _tmp(self, path):
+        os.makedirs(self.root, exist_ok=True)
+        # the extension stays last: GDAL picks the output layout from it
+        stem, ext = os.path.splitext(path)
+        return f'{stem}.{os.getpid()}.{threading.get_ident()}{TMP_MARK}{ext}'
+
+    def _commit(self, tmp, name, version, fmt):
+        path = self.path(name, version, fmt)
+        os.replace(tmp, path)
+        # files of older versions (in any format) are never served again
+        current = f'{name}-{version}.'
+        for old in glob.glob(os.path.join(glob.escape(self.root), f'{glob.escape(name)}-*')):
+            if not os.path.basename(old).startswith(current) and TMP_MARK not in old:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
+
+    def build(self, name, version, fmt, write):
+        """Run write(tmp_path) and keep the result; returns the file path.
+        Without a version the file is still written, to be sent once and removed."""
+        path = self.path(name, version or 'unversioned', fmt)
+        tmp = self._tmp(path)
+        try:
+            write(tmp)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if version is None:
+            return tmp
+        return self._commit(tmp, name, version, fmt)
+
+    def tee(self, chunks, name, version, fmt):
+        """Yield `chunks` while copying them into the cache; kept only if the stream completes."""
+        if version is None:
+            yield from chunks
+            return
+        tmp = self._tmp(self.path(name, version, fmt))
+        f = open(tmp, 'wb')
+        complete = False
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            f.close()
+            if complete:
+                self._commit(tmp, name, version, fmt)
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+
+    def stats(self):
+        files = glob.glob(os.path.join(glob.escape(self.root), '*-*.*'))
+        files = [f for f in files if TMP_MARK not in f]
+        return {'files': len(files), 'bytes': sum(os.path.getsize(f) for f in files)}
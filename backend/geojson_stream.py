@@ -0,0 +1,106 @@
+"""
+Water of Leith WebMap - streamed GeoJSON
+Writes a FeatureCollection chunk by chunk so large layers never have to be
+held in memory as one list of feature dicts.
+2025
+"""
+
+import json
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def iter_feature_collection(features, metadata=None, chunk_size=CHUNK_SIZE):
+    """Yield a FeatureCollection as UTF-8 byte chunks of roughly `chunk_size`.
+
+    `features` is any iterable of feature dicts or pre-encoded feature bytes
+    (see `feature_bytes`). `metadata` (a dict, or a callable returning one) is
+    written after the last feature, so it can hold counts and ranges gathered
+    while the features were produced.
+    """
+    buf = [b'{"type":"FeatureCollection","features":[']
+    size = len(buf[0])
+    sep = b''
+    for feature in features:
+        piece = sep + (feature if isinstance(feature, bytes) else dumps(feature))
+        sep = b','
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buf)
+            buf = []
+            size = 0
+
+    buf.append(b']')
+    if metadata is not None:
+        if callable(metadata):
+            metadata = metadata()
+        buf.append(b',"metadata":' + dumps(metadata))
+    buf.append(b'}')
+    yield b''.join(buf)
+
+
+def feature_bytes(properties, geometry):
+    """Encode one Feature around an already-serialized geometry fragment."""
+    return (b'{"type":"Feature","properties":' + dumps(properties)
+            + b',"geometry":' + geometry + b'}')
+
+
+def normalise_geometry_text(text):
+    """Validate stored geometry JSON and return it as a UTF-8 fragment, or None.
+
+    A bare coordinate ring becomes a Polygon and a Feature is unwrapped to its
+    geometry; anything that already is a geometry is passed through verbatim.
+    """
+    text = text.strip()
+    try:
+        obj = json.loads(text)
+    except ValueError:
+        return None
+
+    if isinstance(obj, list):
+        return dumps({'type': 'Polygon', 'coordinates': [obj]})
+    if isinstance(obj, dict):
+        if obj.get('type') == 'Feature':
+            geometry = obj.get('geometry')
+            return dumps(geometry) if geometry else None
+        if 'type' in obj and ('coordinates' in obj or 'geometries' in obj):
+            return text.encode('utf-8')
+    return None
+
+
+class GeometryFragments:
+    """Memo of validated geometry fragments keyed on the stored text.
+
+    Each distinct geom_json value is parsed once; afterwards a lookup costs a
+    string hash, and the text is written into responses without a json round trip.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries=500000):
+        self.max_entries = max_entries
+        self._memo = {}
+        self.invalid = 0
+
+    def get(self, text):
+        fragment = self._memo.get(text, self._MISSING)
+        if fragment is self._MISSING:
+            fragment = normalise_geometry_text(text)
+            if fragment is None:
+                self.invalid += 1
+            if len(self._memo) >= self.max_entries:
+                self._memo.clear()
+            self._memo[text] = fragment
+        return fragment
+
+    def clear(self):
+        self._memo.clear()
+
+    def __len__(self):
+        return len(self._memo)
@@ -0,0 +1,11 @@
+"""
+Water of Leith WebMap - gunicorn settings
+Picked up automatically when gunicorn is started from backend/. Each worker
+warms its own layers in the background once it has booted (WARM_ON_START).
+2025
+"""
+
+
+def post_worker_init(worker):
+    from app import warm_on_start
+    warm_on_start()
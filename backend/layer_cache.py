@@ -0,0 +1,220 @@
+"""
+Water of Leith WebMap - layer response cache
+Keeps the serialized bytes of the GeoJSON layer responses in process so repeat
+requests do not go back to Oracle.
+2025
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from compression import ENCODINGS, compress, compressible
+
+
+# query parameters that never change the response body (jQuery / fetch cache busters)
+IGNORED_PARAMS = {'_', 'cb'}
+
+
+class CacheEntry:
+    __slots__ = ('layer', 'body', 'mimetype', 'etag', 'created', 'expires', 'variants')
+
+    def __init__(self, layer, body, mimetype, ttl, etag=None):
+        self.layer = layer
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag or hashlib.sha1(body).hexdigest()
+        self.created = time.time()
+        self.expires = self.created + ttl if ttl > 0 else None
+        # encoding -> compressed body, filled in the background after put()
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    def expired(self, now=None):
+        return self.expires is not None and (now or time.time()) >= self.expires
+
+
+class LayerCache:
+    """LRU cache of response bodies with a TTL and a total byte budget."""
+
+    def __init__(self, ttl=3600, max_bytes=256 * 1024 * 1024, precompress=True):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # one background thread compresses new entries, so requests never do
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compress') \
+            if precompress else None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(endpoint, args):
+        """Endpoint plus sorted, stripped query parameters; empty values are dropped."""
+        items = []
+        for k in sorted(args.keys()):
+            if k in IGNORED_PARAMS:
+                continue
+            for v in args.getlist(k) if hasattr(args, 'getlist') else [args[k]]:
+                v = str(v).strip()
+                if v != '':
+                    items.append(f'{k}={v}')
+        return endpoint + ('?' + '&'.join(items) if items else '')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expired():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def peek(self, key):
+        """True when a live entry exists, without touching the LRU order or the counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not entry.expired()
+
+    def claim(self, key):
+        """Single-flight: (event, True) if the caller should build `key` and then
+        `release(key, event)`, otherwise (event, False) where the event is set when
+        the request already building it is done."""
+        with self._lock:
+            event = self._inflight.get(key)
+            if event is None:
+                event = self._inflight[key] = threading.Event()
+                return event, True
+            self.coalesced += 1
+            return event, False
+
+    def release(self, key, event):
+        """End a claim; safe to call more than once, and leaves a newer claim on key alone."""
+        with self._lock:
+            if self._inflight.get(key) is event:
+                del self._inflight[key]
+        event.set()
+
+    def put(self, key, layer, body, mimetype='application/json', etag=None):
+        entry = CacheEntry(layer, body, mimetype, self.ttl, etag)
+        if self.max_bytes <= 0 or entry.size > self.max_bytes:
+            # too big to keep, but the caller can still use the ETag
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+        if self._compressor is not None and compressible(mimetype, len(body)):
+            self._compressor.submit(self._compress, key, entry)
+        return entry
+
+    def _compress(self, key, entry):
+        for encoding in ENCODINGS:
+            data = compress(entry.body, encoding)
+            if len(data) >= len(entry.body):
+                continue
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    # replaced or evicted meanwhile
+                    return
+                entry.variants[encoding] = data
+                self._bytes += len(data)
+                self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def tee(self, key, layer, chunks, mimetype='application/json', done=None):
+        """Pass streamed chunks through, storing the body once the stream completes.
+
+        Collection stops as soon as the body outgrows the cache budget, so a
+        layer that cannot be cached is still streamed with flat memory. The last
+        chunk is held back until the body is stored, and `done()` is called as
+        soon as it is stored (or known not to be), so requests waiting for it do
+        not depend on this client reading or closing the stream.
+        """
+        body = []
+        size = 0
+        pending = None
+        try:
+            for chunk in chunks:
+                if pending is not None:
+                    yield pending
+                pending = chunk
+                if body is not None:
+                    body.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        body = None
+                        if done is not None:
+                            done()
+            if body is not None:
+                self.put(key, layer, b''.join(body), mimetype)
+        finally:
+            if done is not None:
+                done()
+        if pending is not None:
+            yield pending
+
+    def invalidate(self, layer=None):
+        """Drop every entry, or only those belonging to one layer. Returns the count removed.
+
+        Dropping everything also wakes any request waiting on an in-flight build;
+        the build that is still running releases its own (no longer held) claim.
+        """
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if layer is None or e.layer == layer]
+            for k in keys:
+                self._remove(k)
+            waiting = []
+            if layer is None:
+                waiting = list(self._inflight.values())
+                self._inflight.clear()
+        for event in waiting:
+            event.set()
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            layers = {}
+            compressed = 0
+            for e in self._entries.values():
+                info = layers.setdefault(e.layer, {'entries': 0, 'bytes': 0})
+                info['entries'] += 1
+                info['bytes'] += e.size
+                compressed += bool(e.variants)
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'compressed_entries': compressed,
+                'in_flight': len(self._inflight),
+                'layers': layers,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
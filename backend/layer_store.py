@@ -0,0 +1,141 @@
+"""
+Water of Leith WebMap - in-memory layers
+Each layer is loaded from Oracle once (per TTL) into plain Python lists, with a
+columnar view of its properties (columns.py), that the viewport, filter, lookup
+and analysis endpoints work from.
+2025
+"""
+
+import json
+import threading
+import time
+
+from columns import Columns
+from lod import LodSet
+from point_locator import PointLocator
+from spatial_index import STRTree, geometry_envelope
+
+
+class LayerData:
+    """Rows of one layer: properties dicts and validated geometry fragments, by row number.
+    `attributes` ({name: per-row values}) are columns for filters and sorts that are
+    not returned as properties."""
+
+    def __init__(self, name, properties, geometries, envelopes=None, attributes=None):
+        self.name = name
+        self.properties = properties
+        self.geometries = geometries
+        self.columns = Columns(properties, attributes)
+        self.loaded_at = time.time()
+        self._envelopes = envelopes
+        self._index = None
+        self._lods = None
+        self._locator = None
+        self._centroids = None
+        self._variants = {}
+        self._derive_lock = threading.RLock()
+
+    def _derived(self, attr, build):
+        """Structures built from the rows on first use and kept for the life of the layer."""
+        value = getattr(self, attr)
+        if value is None:
+            with self._derive_lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = build()
+                    setattr(self, attr, value)
+        return value
+
+    def variant(self, key, build):
+        """Like _derived, for structures that come in several versions (per LOD, per precision)."""
+        value = self._variants.get(key)
+        if value is None:
+            with self._derive_lock:
+                value = self._variants.get(key)
+                if value is None:
+                    value = build()
+                    self._variants[key] = value
+        return value
+
+    @property
+    def envelopes(self):
+        """(minx, miny, maxx, maxy) of each row, None where a geometry is empty."""
+        return self._derived('_envelopes', lambda: [geometry_envelope(json.loads(g)) for g in self.geometries])
+
+    @property
+    def index(self):
+        """STR R-tree over the envelopes (see spatial_index.py)."""
+        return self._derived('_index', lambda: STRTree(self.envelopes))
+
+    @property
+    def lods(self):
+        """Simplified geometry levels (see lod.py)."""
+        return self._derived('_lods', lambda: LodSet(self.geometries))
+
+    @property
+    def locator(self):
+        """Point-in-polygon lookup (see point_locator.py)."""
+        return self._derived('_locator', lambda: PointLocator(self))
+
+    @property
+    def centroids(self):
+        """(lon, lat) float arrays of each row's centroid; NaN where a geometry is empty."""
+        def build():
+            # shapely ships with geopandas; imported here so app start-up stays light
+            import shapely
+            points = shapely.centroid(shapely.from_geojson(self.geometries, on_invalid='ignore'))
+            return shapely.get_x(points), shapely.get_y(points)
+        return self._derived('_centroids', build)
+
+    def column(self, name):
+        """A numeric property as a float array by row number; missing values are NaN."""
+        return self.columns.numeric(name)
+
+    def __len__(self):
+        return len(self.properties)
+
+    def query(self, bbox):
+        return self.index.query(bbox)
+
+
+class LayerStore:
+    """Loads layers on first use and keeps them for `ttl` seconds (0 = until invalidated).
+    `on_load(layer)` runs after each load, before the layer is handed out."""
+
+    def __init__(self, loaders, ttl=3600, on_load=None):
+        self.loaders = loaders
+        self.ttl = ttl
+        self.on_load = on_load
+        self._layers = {}
+        self._locks = {name: threading.Lock() for name in loaders}
+
+    def get(self, name):
+        layer = self._fresh(name)
+        if layer is not None:
+            return layer
+        with self._locks[name]:
+            # another thread may have finished the load while we waited
+            layer = self._fresh(name)
+            if layer is None:
+                layer = self.loaders[name]()
+                if self.on_load is not None:
+                    self.on_load(layer)
+                self._layers[name] = layer
+            return layer
+
+    def is_loaded(self, name):
+        return self._fresh(name) is not None
+
+    def _fresh(self, name):
+        layer = self._layers.get(name)
+        if layer is None:
+            return None
+        if self.ttl > 0 and time.time() - layer.loaded_at >= self.ttl:
+            return None
+        return layer
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._layers.clear()
+        else:
+            self._layers.pop(name, None)
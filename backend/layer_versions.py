@@ -0,0 +1,98 @@
+"""
+Water of Leith WebMap - layer versions
+When a layer loads, every feature is hashed (properties and geometry) and the
+layer's data version is a hash of its (feature id, row hash) pairs, so the same
+data gives the same version in every worker. The id -> row hash map of each
+version is kept on disk, which lets a request name the version it already
+holds and get back only the features added, changed or removed since.
+2025
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+from geojson_stream import feature_bytes
+
+
+SNAPSHOTS_KEPT = 8
+VERSION_RE = re.compile(r'^[0-9a-f]{16}$')
+
+
+def row_hash(properties, geometry):
+    return feature_hash(feature_bytes(properties, geometry))
+
+
+def feature_hash(data):
+    """Row hash of a feature already serialized by feature_bytes."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+class Snapshot:
+    """Feature ids and row hashes of one loaded layer, with its data version."""
+
+    def __init__(self, ids, hashes):
+        self.ids = ids
+        self.hashes = hashes
+        pairs = sorted(zip((json.dumps(i) for i in ids), hashes))
+        self.version = hashlib.sha1(json.dumps(pairs).encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def of(cls, layer, id_field):
+        return cls([p.get(id_field) for p in layer.properties],
+                   [row_hash(p, g) for p, g in zip(layer.properties, layer.geometries)])
+
+    def changes(self, old):
+        """(added rows, changed rows, removed ids) relative to an older {id: row hash} map."""
+        added, changed = [], []
+        for row, (i, h) in enumerate(zip(self.ids, self.hashes)):
+            before = old.get(json.dumps(i))
+            if before is None:
+                added.append(row)
+            elif before != h:
+                changed.append(row)
+        current = {json.dumps(i) for i in self.ids}
+        removed = [json.loads(k) for k in old if k not in current]
+        return added, changed, removed
+
+
+class VersionStore:
+    """Snapshots under `root` as <layer>-<version>.json, the newest `keep` per layer."""
+
+    def __init__(self, root, keep=SNAPSHOTS_KEPT):
+        self.root = os.path.abspath(root)
+        self.keep = keep
+
+    def _path(self, name, version):
+        return os.path.join(self.root, f'{name}-{version}.json')
+
+    def save(self, name, snapshot):
+        path = self._path(name, snapshot.version)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            # ids as JSON text, so 12 and "12" stay different keys
+            json.dump(dict(zip((json.dumps(i) for i in snapshot.ids), snapshot.hashes)), f)
+        os.replace(tmp, path)
+        saved = sorted(glob.glob(os.path.join(glob.escape(self.root), f'{glob.escape(name)}-*.json')),
+                       key=os.path.getmtime, reverse=True)
+        for old in saved[self.keep:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def load(self, name, version):
+        """{id as JSON text: row hash} of an earlier version, or None if it is not kept."""
+        if not VERSION_RE.match(version or ''):
+            return None
+        try:
+            with open(self._path(name, version), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,241 @@
+"""
+Water of Leith WebMap - geometry levels of detail
+Simplified copies of a layer's geometries, one per zoom level, computed once
+and kept with the layer. The layer is first cut into shared arcs (see
+topology.py) and Douglas-Peucker runs on each arc once, so neighbouring SIMD
+zones, flood zones and postcodes keep a common boundary at every level instead
+of opening gaps and slivers between them. Arcs of rings that would collapse or
+turn invalid are kept at full resolution. Levels that would not remove any
+vertices are skipped.
+2025
+"""
+
+import json
+
+from geojson_stream import dumps
+from topology import Topology
+
+
+# Web map zoom levels that get their own simplified copy; above the last one
+# the full-resolution geometry is served.
+LOD_ZOOMS = (8, 10, 12, 14)
+# grid the arcs are cut on: 7 decimal places is about 1cm
+LOD_PRECISION = 7
+
+
+def zoom_tolerance(zoom):
+    """Width of one 256px tile pixel in degrees at a zoom level."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+class LevelOfDetail:
+    __slots__ = ('zoom', 'tolerance', 'geometries', 'shapes', 'vertex_count', 'size')
+
+    def __init__(self, zoom, tolerance, geometries, shapes, vertex_count):
+        self.zoom = zoom
+        self.tolerance = tolerance
+        self.geometries = geometries
+        self.shapes = shapes
+        self.vertex_count = vertex_count
+        self.size = sum(len(g) for g in geometries)
+
+
+def _arc_points(arcs, index):
+    return arcs[index] if index >= 0 else arcs[~index][::-1]
+
+
+def _join(arcs, indexes):
+    """Points of a line or ring made of arcs; consecutive arcs share their end point."""
+    points = []
+    for index in indexes:
+        part = _arc_points(arcs, index)
+        points.extend(part[1:] if points else part)
+    return points
+
+
+class ArcSimplifier:
+    """Douglas-Peucker over the shared arcs of a Topology, rebuilt into GeoJSON."""
+
+    def __init__(self, topology):
+        import numpy as np
+        import shapely
+        self.topology = topology
+        self.lines = []
+        if topology.arcs:
+            coords = np.array([p for a in topology.arcs for p in a], dtype=np.float64)
+            indices = np.repeat(np.arange(len(topology.arcs)), [len(a) for a in topology.arcs])
+            self.lines = shapely.linestrings(coords, indices=indices)
+
+    def simplify(self, tolerance):
+        """Simplified arcs (tuples of grid points) at `tolerance` degrees; end points are kept."""
+        import shapely
+        if not len(self.lines):
+            return []
+        simplified = shapely.simplify(self.lines, tolerance * self.topology.k, preserve_topology=False)
+        out = []
+        for original, line in zip(self.topology.arcs, simplified):
+            coords = shapely.get_coordinates(line)
+            if len(coords) >= len(original):
+                out.append(original)
+            else:
+                out.append(tuple((int(x), int(y)) for x, y in coords))
+        return out
+
+    def geometry(self, geometry, arcs):
+        """GeoJSON dict of a topology geometry rebuilt from `arcs`, back in degrees."""
+        t = self.topology
+
+        def position(p):
+            return [t.x0 + p[0] / t.k, t.y0 + p[1] / t.k]
+
+        def line(indexes):
+            return [position(p) for p in _join(arcs, indexes)]
+
+        kind = geometry['type']
+        if kind == 'GeometryCollection':
+            return {'type': kind, 'geometries': [self.geometry(g, arcs) for g in geometry['geometries']]}
+        if kind == 'Point':
+            return {'type': kind, 'coordinates': position(geometry['coordinates'])}
+        if kind == 'MultiPoint':
+            return {'type': kind, 'coordinates': [position(p) for p in geometry['coordinates']]}
+        if kind == 'LineString':
+            return {'type': kind, 'coordinates': line(geometry['arcs'])}
+        if kind in ('MultiLineString', 'Polygon'):
+            return {'type': kind, 'coordinates': [line(part) for part in geometry['arcs']]}
+        return {'type': kind, 'coordinates': [[line(ring) for ring in poly] for poly in geometry['arcs']]}
+
+
+def _arc_indexes(geometry, out):
+    if geometry.get('type') == 'GeometryCollection':
+        for g in geometry['geometries']:
+            _arc_indexes(g, out)
+        return out
+    stack = [geometry.get('arcs') or []]
+    while stack:
+        a = stack.pop()
+        if isinstance(a, int):
+            out.add(a if a >= 0 else ~a)
+        else:
+            stack.extend(a)
+    return out
+
+
+def _rings(geometry):
+    kind = geometry.get('type')
+    if kind == 'GeometryCollection':
+        return [r for g in geometry['geometries'] for r in _rings(g)]
+    if kind == 'Polygon':
+        return geometry['arcs']
+    if kind == 'MultiPolygon':
+        return [r for poly in geometry['arcs'] for r in poly]
+    return []
+
+
+class LodSet:
+    """All precomputed levels for one layer, finest last.
+
+    The shapely geometries are kept alongside the GeoJSON fragments so tile
+    rendering does not have to parse them again.
+    """
+
+    def __init__(self, geometries, zooms=LOD_ZOOMS):
+        # shapely ships with geopandas; imported here so app start-up stays light
+        import shapely
+        from shapely.geometry import shape
+
+        shapes = [shape(json.loads(g)) for g in geometries]
+        self.shapes = shapes
+        self.full_vertex_count = int(shapely.get_num_coordinates(shapes).sum())
+        self.full_size = sum(len(g) for g in geometries)
+
+        topology = Topology(geometries, LOD_PRECISION)
+        simplifier = ArcSimplifier(topology)
+        uses = [_arc_indexes(g, set()) if g else set() for g in topology.geometries]
+
+        levels = []
+        for zoom in sorted(zooms):
+            tolerance = zoom_tolerance(zoom)
+            arcs = self._valid_arcs(topology, simplifier, simplifier.simplify(tolerance), uses)
+            out, level_shapes = list(geometries), list(shapes)
+            if any(a is not b for a, b in zip(arcs, topology.arcs)):
+                # every feature is rebuilt from the same grid, so shared edges match exactly
+                rebuilt = [i for i, g in enumerate(topology.geometries) if g]
+                for i in rebuilt:
+                    out[i] = dumps(simplifier.geometry(topology.geometries[i], arcs))
+                for i, s in zip(rebuilt, shapely.from_geojson([out[i] for i in rebuilt])):
+                    level_shapes[i] = s
+            vertex_count = int(shapely.get_num_coordinates(level_shapes).sum())
+            levels.append(LevelOfDetail(zoom, tolerance, out, level_shapes, vertex_count))
+
+        # a level is only worth keeping if it is lighter than the next finer one kept
+        self.levels = []
+        self.skipped = []
+        finer = self.full_vertex_count
+        for level in reversed(levels):
+            if level.vertex_count < finer:
+                self.levels.insert(0, level)
+                finer = level.vertex_count
+            else:
+                self.skipped.insert(0, level.zoom)
+
+    @staticmethod
+    def _valid_arcs(topology, simplifier, arcs, uses):
+        """`arcs`, with the arcs of every polygon that collapsed or became invalid put
+        back to full resolution (repeated until no polygon changes)."""
+        import shapely
+        arcs = list(arcs)
+        pending = range(len(uses))
+        while True:
+            broken = set()
+            candidates = [i for i in pending if topology.geometries[i]
+                          and any(arcs[a] is not topology.arcs[a] for a in uses[i])]
+            rebuilt = []
+            for i in candidates:
+                geometry = topology.geometries[i]
+                if any(len(_join(arcs, ring)) < 4 for ring in _rings(geometry)):
+                    broken.add(i)
+                else:
+                    rebuilt.append(i)
+            if rebuilt:
+                parsed = shapely.from_geojson([dumps(simplifier.geometry(topology.geometries[i], arcs))
+                                               for i in rebuilt])
+                broken.update(i for i, valid in zip(rebuilt, shapely.is_valid(parsed)) if not valid)
+            if not broken:
+                return arcs
+            reverted = set()
+            for i in broken:
+                for a in uses[i]:
+                    if arcs[a] is not topology.arcs[a]:
+                        arcs[a] = topology.arcs[a]
+                        reverted.add(a)
+            # neighbours sharing a reverted arc now mix full and simplified arcs; check again
+            pending = [i for i, used in enumerate(uses) if used & reverted]
+
+    def for_zoom(self, zoom):
+        """Coarsest level that is still within one pixel at `zoom`, or None for full resolution."""
+        for level in self.levels:
+            if level.zoom >= zoom:
+                return level
+        return None
+
+    def for_tolerance(self, tolerance):
+        """Coarsest level whose tolerance does not exceed `tolerance`, or None for full resolution."""
+        for level in self.levels:
+            if level.tolerance <= tolerance:
+                return level
+        return None
+
+    def report(self):
+        levels = [{
+            'zoom': level.zoom,
+            'tolerance': level.tolerance,
+            'vertex_count': level.vertex_count,
+            'bytes': level.size,
+            'vertex_ratio': round(level.vertex_count / self.full_vertex_count, 4) if self.full_vertex_count else None,
+        } for level in self.levels]
+        return {
+            'full': {'vertex_count': self.full_vertex_count, 'bytes': self.full_size},
+            'levels': levels,
+            # zooms whose simplified copy would not have removed any vertices
+            'skipped': self.skipped,
+        }
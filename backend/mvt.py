@@ -0,0 +1,286 @@
+"""
+Water of Leith WebMap - Mapbox Vector Tiles
+Clips, quantises and encodes in-memory layer geometries into MVT (v2) protobuf
+without a tile server or protobuf library.
+2025
+"""
+
+import math
+import struct
+
+
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+# MVT GeomType
+POINT, LINESTRING, POLYGON = 1, 2, 3
+# command ids
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+
+
+# ------------------------------------------------------------
+# tile maths (Web Mercator, XYZ scheme)
+# ------------------------------------------------------------
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of a tile in degrees."""
+    n = 2 ** z
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return (x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y))
+
+
+def lonlat_to_tile(lon, lat, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_covering(bounds, z):
+    """Every (x, y) tile at zoom z that touches a (minx, miny, maxx, maxy) box."""
+    x0, y0 = lonlat_to_tile(bounds[0], bounds[3], z)
+    x1, y1 = lonlat_to_tile(bounds[2], bounds[1], z)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_query_bounds(z, x, y, buffer=BUFFER, extent=EXTENT):
+    """Tile bounds grown by the clip buffer, for the spatial index query."""
+    west, south, east, north = tile_bounds(z, x, y)
+    pad = buffer / extent
+    dx = (east - west) * pad
+    dy = (north - south) * pad
+    return (west - dx, south - dy, east + dx, north + dy)
+
+
+def to_tile_coords(geoms, z, x, y, extent=EXTENT):
+    """Project lon/lat shapely geometries into tile pixel space (y down)."""
+    import numpy as np
+    import shapely
+
+    n = 2 ** z
+
+    def project(coords):
+        lon = coords[:, 0]
+        lat = np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+        mx = (lon + 180.0) / 360.0 * n - x
+        my = (1 - np.arcsinh(np.tan(lat)) / math.pi) / 2 * n - y
+        return np.column_stack([mx * extent, my * extent])
+
+    return shapely.transform(geoms, project)
+
+
+def clip_to_tile(geoms, buffer=BUFFER, extent=EXTENT):
+    import shapely
+    return shapely.clip_by_rect(geoms, -buffer, -buffer, extent + buffer, extent + buffer)
+
+
+# ------------------------------------------------------------
+# protobuf primitives
+# ------------------------------------------------------------
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _len_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _packed(field, values):
+    return _len_field(field, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(v):
+    if isinstance(v, bool):
+        return _key(7, 0) + _varint(int(v))
+    if isinstance(v, int):
+        if v >= 0:
+            return _key(5, 0) + _varint(v)
+        return _key(6, 0) + _varint(_zigzag(v))
+    if isinstance(v, float):
+        return _key(3, 1) + struct.pack('<d', v)
+    return _len_field(1, str(v).encode('utf-8'))
+
+
+# ------------------------------------------------------------
+# geometry commands
+# ------------------------------------------------------------
+def _command(cmd, count):
+    return (cmd & 0x7) | (count << 3)
+
+
+def _quantise(coords):
+    """Round to the integer grid and drop repeated points."""
+    out = []
+    for cx, cy in coords:
+        p = (int(round(cx)), int(round(cy)))
+        if not out or out[-1] != p:
+            out.append(p)
+    return out
+
+
+def _ring_area(ring):
+    s = 0
+    for i in range(len(ring)):
+        x0, y0 = ring[i]
+        x1, y1 = ring[(i + 1) % len(ring)]
+        s += x0 * y1 - x1 * y0
+    return s / 2
+
+
+class _Cursor:
+    """Tracks the pen position so coordinates can be written as zigzag deltas."""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.out = []
+
+    def move_to(self, p):
+        self.out.append(_command(MOVE_TO, 1))
+        self._delta(p)
+
+    def line_to(self, points):
+        self.out.append(_command(LINE_TO, len(points)))
+        for p in points:
+            self._delta(p)
+
+    def close(self):
+        self.out.append(_command(CLOSE_PATH, 1))
+
+    def points(self, points):
+        self.out.append(_command(MOVE_TO, len(points)))
+        for p in points:
+            self._delta(p)
+
+    def _delta(self, p):
+        self.out.append(_zigzag(p[0] - self.x))
+        self.out.append(_zigzag(p[1] - self.y))
+        self.x, self.y = p
+
+
+def _parts(geom, kind):
+    """Flatten a (multi / collection) geometry to its parts of one kind."""
+    gtype = geom.geom_type
+    if gtype == kind:
+        return [geom]
+    if gtype == 'Multi' + kind or gtype == 'GeometryCollection':
+        parts = []
+        for g in geom.geoms:
+            parts.extend(_parts(g, kind))
+        return parts
+    return []
+
+
+def encode_geometry(geom):
+    """(GeomType, command integers) for a shapely geometry in tile coordinates, or None."""
+    if geom is None or geom.is_empty:
+        return None
+    cur = _Cursor()
+
+    polygons = _parts(geom, 'Polygon')
+    if polygons:
+        for poly in polygons:
+            exterior = _quantise(poly.exterior.coords)[:-1]
+            area = _ring_area(exterior) if len(exterior) >= 3 else 0
+            if area == 0:
+                continue
+            # exterior rings have positive area in tile coordinates, holes negative
+            for ring, sign in [(exterior, 1)] + [(_quantise(r.coords)[:-1], -1) for r in poly.interiors]:
+                if len(ring) < 3:
+                    continue
+                a = _ring_area(ring)
+                if a == 0:
+                    continue
+                if (a > 0) != (sign > 0):
+                    ring = ring[::-1]
+                cur.move_to(ring[0])
+                cur.line_to(ring[1:])
+                cur.close()
+        return (POLYGON, cur.out) if cur.out else None
+
+    lines = _parts(geom, 'LineString')
+    if lines:
+        for line in lines:
+            pts = _quantise(line.coords)
+            if len(pts) < 2:
+                continue
+            cur.move_to(pts[0])
+            cur.line_to(pts[1:])
+        return (LINESTRING, cur.out) if cur.out else None
+
+    points = [_quantise(p.coords)[0] for p in _parts(geom, 'Point')]
+    if points:
+        cur.points(points)
+        return POINT, cur.out
+    return None
+
+
+# ------------------------------------------------------------
+# tile encoding
+# ------------------------------------------------------------
+def encode_layer(name, features, extent=EXTENT):
+    """Encode one MVT layer. `features` yields (id or None, properties dict, shapely geometry)."""
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    encoded = []
+
+    for fid, props, geom in features:
+        geometry = encode_geometry(geom)
+        if geometry is None:
+            continue
+        gtype, commands = geometry
+
+        tags = []
+        for k, v in props.items():
+            if v is None or isinstance(v, (dict, list)):
+                continue
+            if k not in key_index:
+                key_index[k] = len(keys)
+                keys.append(k)
+            vkey = (type(v).__name__, v)
+            if vkey not in value_index:
+                value_index[vkey] = len(values)
+                values.append(v)
+            tags.extend((key_index[k], value_index[vkey]))
+
+        body = b''
+        if isinstance(fid, int) and fid >= 0:
+            body += _key(1, 0) + _varint(fid)
+        body += _packed(2, tags) + _key(3, 0) + _varint(gtype) + _packed(4, commands)
+        encoded.append(_len_field(2, body))
+
+    if not encoded:
+        return b''
+
+    layer = _key(15, 0) + _varint(2) + _len_field(1, name.encode('utf-8'))
+    layer += b''.join(encoded)
+    layer += b''.join(_len_field(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_len_field(4, _encode_value(v)) for v in values)
+    layer += _key(5, 0) + _varint(extent)
+    return _len_field(3, layer)
@@ -0,0 +1,154 @@
+"""
+Water of Leith WebMap - point lookup
+Vectorised (NumPy) point-in-polygon and point-to-polygon distance over the
+polygons of an in-memory layer, with the layer's R-tree picking candidates.
+2025
+"""
+
+import json
+import math
+from collections import defaultdict
+
+import numpy as np
+
+
+# keep the points x edges work arrays to a few MB
+MAX_CELLS = 2000000
+EARTH_RADIUS_M = 6371008.8
+
+
+def _rings(geometry):
+    gtype = geometry.get('type')
+    coords = geometry.get('coordinates') or []
+    if gtype == 'Polygon':
+        return list(coords)
+    if gtype == 'MultiPolygon':
+        return [ring for poly in coords for ring in poly]
+    if gtype == 'GeometryCollection':
+        return [r for g in geometry.get('geometries') or [] for r in _rings(g)]
+    return []
+
+
+def polygon_edges(geometry):
+    """(E, 4) array of x0, y0, x1, y1 over every ring, or None for non-polygons."""
+    parts = []
+    for ring in _rings(geometry):
+        pts = np.asarray([c[:2] for c in ring], dtype=float)
+        if len(pts) < 3:
+            continue
+        if not np.array_equal(pts[0], pts[-1]):
+            pts = np.vstack([pts, pts[:1]])
+        parts.append(np.hstack([pts[:-1], pts[1:]]))
+    return np.vstack(parts) if parts else None
+
+
+def _chunks(n, edges):
+    step = max(1, MAX_CELLS // max(1, len(edges)))
+    for i in range(0, n, step):
+        yield slice(i, i + step)
+
+
+def points_in_polygon(xs, ys, edges):
+    """Even-odd ray casting of many points against one polygon's edges."""
+    inside = np.zeros(len(xs), dtype=bool)
+    x0, y0, x1, y1 = edges.T
+    for s in _chunks(len(xs), edges):
+        px = xs[s, None]
+        py = ys[s, None]
+        straddle = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        inside[s] = (np.count_nonzero(straddle & (px < x_cross), axis=1) % 2) == 1
+    return inside
+
+
+def distance_to_edges_m(xs, ys, edges):
+    """Metres from each point to the nearest edge, on a local equirectangular projection."""
+    lat0 = math.radians(float(np.mean(ys))) if len(ys) else 0.0
+    kx = math.radians(1) * EARTH_RADIUS_M * math.cos(lat0)
+    ky = math.radians(1) * EARTH_RADIUS_M
+    ax, ay, bx, by = edges[:, 0] * kx, edges[:, 1] * ky, edges[:, 2] * kx, edges[:, 3] * ky
+    dx = bx - ax
+    dy = by - ay
+    seg_len2 = dx * dx + dy * dy
+    out = np.empty(len(xs))
+    for s in _chunks(len(xs), edges):
+        px = xs[s, None] * kx
+        py = ys[s, None] * ky
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(seg_len2 > 0, ((px - ax) * dx + (py - ay) * dy) / seg_len2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        out[s] = np.hypot(ax + t * dx - px, ay + t * dy - py).min(axis=1)
+    return out
+
+
+class PointLocator:
+    """Answers 'which polygons contain these points' for one LayerData."""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.edges = [polygon_edges(json.loads(g)) for g in layer.geometries]
+
+    def containing(self, xs, ys):
+        """For each point, the sorted row numbers of the polygons that contain it."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        # group points by candidate polygon so each polygon is tested once, vectorised
+        candidates = defaultdict(list)
+        for p, (x, y) in enumerate(zip(xs, ys)):
+            for row in self.layer.query((x, y, x, y)):
+                if self.edges[row] is not None:
+                    candidates[row].append(p)
+
+        result = [[] for _ in range(len(xs))]
+        for row, pts in candidates.items():
+            pts = np.asarray(pts)
+            inside = points_in_polygon(xs[pts], ys[pts], self.edges[row])
+            for p in pts[inside]:
+                result[p].append(row)
+        for rows in result:
+            rows.sort()
+        return result
+
+    def pairs(self, xs, ys):
+        """Every (point, polygon row) containment pair, as two aligned index arrays.
+
+        Meant for joining many points at once: the points are sorted on x once,
+        each polygon takes the slice inside its envelope and tests it in one pass.
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        order = np.argsort(xs, kind='stable')
+        sorted_x = xs[order]
+        points, rows = [], []
+        for row, edges in enumerate(self.edges):
+            envelope = self.layer.envelopes[row]
+            if edges is None or envelope is None:
+                continue
+            minx, miny, maxx, maxy = envelope
+            lo = np.searchsorted(sorted_x, minx, side='left')
+            hi = np.searchsorted(sorted_x, maxx, side='right')
+            candidates = order[lo:hi]
+            candidates = candidates[(ys[candidates] >= miny) & (ys[candidates] <= maxy)]
+            if len(candidates) == 0:
+                continue
+            inside = candidates[points_in_polygon(xs[candidates], ys[candidates], edges)]
+            points.append(inside)
+            rows.append(np.full(len(inside), row, dtype=np.int64))
+        if not points:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(points), np.concatenate(rows)
+
+    def distances_m(self, rows, xs, ys):
+        """(points, rows) array of metres from each point to each polygon; 0 inside."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        out = np.full((len(xs), len(rows)), np.inf)
+        for j, row in enumerate(rows):
+            edges = self.edges[row]
+            if edges is None:
+                continue
+            d = distance_to_edges_m(xs, ys, edges)
+            d[points_in_polygon(xs, ys, edges)] = 0.0
+            out[:, j] = d
+        return out
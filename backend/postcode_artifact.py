@@ -0,0 +1,184 @@
+"""
+Water of Leith WebMap - compiled postcode artifact
+Turns data/Postcode.gpkg into a single file that workers mmap and serve
+directly: the reprojected FeatureCollection, its affected / unaffected subsets
+(each also precompressed) and the attribute columns. GeoPandas is only needed
+to compile it.
+
+Usage:  python postcode_artifact.py [Postcode.gpkg] [Postcode.artifact]
+2025
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+from compression import ENCODINGS, compress
+from geojson_stream import dumps, feature_bytes
+
+
+MAGIC = b'WOLPCA01'
+FORMAT_VERSION = 2
+WANT_COLUMNS = [
+    'Postcode', 'District', 'Sector', 'Council', 'OA22',
+    'affected_count', 'total_damage', 'protection_value'
+]
+SECTIONS = ('all', 'affected', 'unaffected')
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+
+def _affected(props):
+    try:
+        return float(props.get('affected_count') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _collection(pieces):
+    return b'{"type":"FeatureCollection","features":[' + b','.join(pieces) + b']}'
+
+
+def compile_postcodes(gpkg_path, layer='postcode'):
+    """Read the GeoPackage, reproject EPSG:27700 -> 4326 and return the artifact bytes."""
+    import geopandas as gpd
+    from spatial_index import geometry_envelope
+
+    gdf = gpd.read_file(gpkg_path, layer=layer)
+    if gdf.crs is None:
+        gdf = gdf.set_crs(epsg=27700)
+    gdf = gdf.to_crs(epsg=4326)
+    fields = [c for c in WANT_COLUMNS if c in gdf.columns]
+    gdf = gdf[fields + ['geometry']]
+    features = [f for f in json.loads(gdf.to_json())['features'] if f.get('geometry')]
+
+    pieces = []
+    spans = []
+    offset = len(b'{"type":"FeatureCollection","features":[')
+    for i, f in enumerate(features):
+        props = f.get('properties') or {}
+        geometry = dumps(f['geometry'])
+        piece = feature_bytes(props, geometry)
+        start = offset + (1 if i else 0) + len(piece) - len(geometry) - 1
+        spans.append([start, start + len(geometry)])
+        offset += (1 if i else 0) + len(piece)
+        pieces.append(piece)
+
+    sections = {
+        'all': _collection(pieces),
+        'affected': _collection([p for p, f in zip(pieces, features) if _affected(f['properties']) > 0]),
+        'unaffected': _collection([p for p, f in zip(pieces, features) if _affected(f['properties']) == 0]),
+    }
+    for name in SECTIONS:
+        for encoding in ENCODINGS:
+            sections[f'{name}.{encoding}'] = compress(sections[name], encoding)
+    sections['columns'] = dumps({
+        'fields': fields,
+        'values': {c: [(f.get('properties') or {}).get(c) for f in features] for c in fields},
+        'bbox': [geometry_envelope(f['geometry']) for f in features],
+        'geometry': spans,
+    })
+
+    header = {
+        'version': FORMAT_VERSION,
+        'count': len(features),
+        'source': _source_stamp(gpkg_path),
+        'sections': {},
+    }
+    body = []
+    pos = 0
+    for name, data in sections.items():
+        header['sections'][name] = {'offset': pos, 'length': len(data),
+                                    'etag': hashlib.sha1(data).hexdigest()}
+        body.append(data)
+        pos += len(data)
+    header_bytes = dumps(header)
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(body)
+
+
+def write_artifact(data, path):
+    """Write atomically so workers never mmap a half-written file."""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class PostcodeArtifact:
+    """Read-only view over compiled artifact bytes (an mmap or an in-memory buffer)."""
+
+    def __init__(self, buf):
+        if bytes(buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a postcode artifact')
+        (header_len,) = struct.unpack('<I', buf[len(MAGIC):len(MAGIC) + 4])
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(buf[start:start + header_len]))
+        if self.header.get('version') != FORMAT_VERSION:
+            raise ValueError('Unsupported postcode artifact version')
+        self._buf = buf
+        self._view = memoryview(buf)
+        self._data_start = start + header_len
+        self.count = self.header['count']
+        self.columns = json.loads(bytes(self.section('columns')))
+        self._properties = None
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm)
+
+    def is_stale(self, gpkg_path):
+        """True when the GeoPackage has changed since the artifact was compiled."""
+        if not os.path.exists(gpkg_path):
+            return False
+        return _source_stamp(gpkg_path) != self.header.get('source')
+
+    def section(self, name):
+        info = self.header['sections'][name]
+        start = self._data_start + info['offset']
+        return self._view[start:start + info['length']]
+
+    def etag(self, name):
+        return self.header['sections'][name]['etag']
+
+    def variants(self, name):
+        """encoding -> section name of the precompressed copies of a section."""
+        return {encoding: f'{name}.{encoding}' for encoding in ENCODINGS
+                if f'{name}.{encoding}' in self.header['sections']}
+
+    def iter_section(self, name, chunk_size=256 * 1024):
+        view = self.section(name)
+        for i in range(0, len(view), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+
+    def properties_list(self):
+        """Per-row properties dicts rebuilt from the attribute columns."""
+        if self._properties is None:
+            fields = self.columns['fields']
+            values = self.columns['values']
+            self._properties = [{c: values[c][i] for c in fields} for i in range(self.count)]
+        return self._properties
+
+    def geometry_bytes(self, row):
+        start, end = self.columns['geometry'][row]
+        return bytes(self.section('all')[start:end])
+
+    def envelope(self, row):
+        env = self.columns['bbox'][row]
+        return tuple(env) if env else None
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, '..', 'data', 'Postcode.gpkg')
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + '.artifact'
+    data = compile_postcodes(src)
+    write_artifact(data, dst)
+    print(f'{dst}: {PostcodeArtifact(data).count} postcodes, {len(data) / 1e6:.1f} MB')
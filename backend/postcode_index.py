@@ -0,0 +1,117 @@
+"""
+Water of Leith WebMap - postcode index
+Exact and prefix lookup over the postcode properties, built once when the
+postcode data is loaded.
+2025
+"""
+
+import heapq
+import re
+from bisect import bisect_left
+
+
+# prefixes up to this length get their top completions precomputed, since
+# they match most of the table
+PRECOMPUTED_PREFIX_LEN = 3
+MAX_SUGGESTIONS = 20
+
+
+def normalise_postcode(value):
+    return ''.join(str(value or '').split()).upper()
+
+
+def _natural_key(value):
+    """'EH10' sorts after 'EH9'."""
+    return [int(p) if p.isdigit() else p for p in re.split(r'(\d+)', str(value or '').upper())]
+
+
+def _affected(props):
+    try:
+        return float(props.get('affected_count') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PostcodeIndex:
+    """Hash lookup on the normalised postcode plus a sorted key list for prefixes.
+
+    Completions are ranked by district, sector and postcode in natural order,
+    or, when weighted, by affected_count first.
+    """
+
+    def __init__(self, properties):
+        self.exact = {}
+        self.display = []
+        self.affected = []
+        entries = []
+        for i, props in enumerate(properties):
+            props = props or {}
+            pc = props.get('Postcode') or props.get('postcode') or ''
+            key = normalise_postcode(pc)
+            self.display.append(' '.join(str(pc).upper().split()))
+            self.affected.append(_affected(props))
+            if not key:
+                continue
+            self.exact.setdefault(key, i)
+            entries.append((key, i))
+
+        entries.sort()
+        self.keys = [k for k, _ in entries]
+        self.rows = [i for _, i in entries]
+
+        ordered = sorted(range(len(properties)), key=lambda i: (
+            _natural_key((properties[i] or {}).get('District')),
+            _natural_key((properties[i] or {}).get('Sector')),
+            _natural_key(self.display[i])))
+        self.order = [0] * len(properties)
+        for pos, i in enumerate(ordered):
+            self.order[i] = pos
+
+        self._top = {}
+        for length in range(1, PRECOMPUTED_PREFIX_LEN + 1):
+            for prefix in {k[:length] for k in self.keys if len(k) >= length}:
+                candidates = self._candidates(prefix)
+                self._top[prefix] = (self._rank(candidates, MAX_SUGGESTIONS, False),
+                                     self._rank(candidates, MAX_SUGGESTIONS, True))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, key):
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + '\uffff')
+        return self.rows[lo:hi]
+
+    def _rank(self, rows, limit, weighted):
+        if weighted:
+            return heapq.nsmallest(limit, rows, key=lambda i: (-self.affected[i], self.order[i]))
+        return heapq.nsmallest(limit, rows, key=lambda i: self.order[i])
+
+    def get(self, postcode):
+        """Feature row for an exact postcode (any spacing / case), or None."""
+        return self.exact.get(normalise_postcode(postcode))
+
+    def suggest(self, query, limit=10, weighted=False):
+        """Row numbers of the best `limit` postcodes starting with `query`."""
+        key = normalise_postcode(query)
+        if not key:
+            return []
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        spaced = ' '.join(str(query).upper().split())
+
+        if ' ' not in spaced and key in self._top:
+            return self._top[key][1 if weighted else 0][:limit]
+
+        rows = self._candidates(key)
+        if ' ' in spaced:
+            # "EH1 1" must not complete to EH11 1..
+            rows = [i for i in rows if self.display[i].startswith(spaced)]
+        return self._rank(rows, limit, weighted)
+
+    def lookup(self, query):
+        """Exact match, else the top-ranked completion; None when nothing matches."""
+        row = self.get(query)
+        if row is not None:
+            return row
+        best = self.suggest(query, limit=1)
+        return best[0] if best else None
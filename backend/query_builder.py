@@ -0,0 +1,59 @@
+"""
+Water of Leith WebMap - bind-variable queries
+Filtered endpoints build their SQL from a fixed base statement plus optional
+clauses whose values are always bind variables. Every combination of clauses
+is one SQL text ("shape"), so Oracle parses each shape once and the client
+statement cache reuses it whatever the filter values are.
+2025
+"""
+
+import re
+
+
+def like_contains(value):
+    """Bind value for `LIKE :x ESCAPE '\\'` that matches `value` as a plain substring."""
+    value = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{value}%'
+
+
+class Query:
+    """A named base SELECT, optional WHERE clauses and a trailing ORDER BY / FETCH."""
+
+    def __init__(self, name, base):
+        self.name = name
+        self.base = base
+        self.clauses = []
+        self.tags = []
+        self.binds = {}
+        self.suffix = []
+
+    def where(self, tag, clause, **binds):
+        """AND a clause onto the WHERE; `tag` names it in the shape."""
+        self.tags.append(tag)
+        self.clauses.append(clause)
+        self.binds.update(binds)
+        return self
+
+    def order_by(self, clause):
+        self.suffix.append(f'ORDER BY {clause}')
+        return self
+
+    def fetch_first(self, limit):
+        self.tags.append('limit')
+        self.suffix.append('FETCH FIRST :row_limit ROWS ONLY')
+        self.binds['row_limit'] = int(limit)
+        return self
+
+    @property
+    def shape(self):
+        return f"{self.name}[{','.join(self.tags)}]" if self.tags else self.name
+
+    @property
+    def sql(self):
+        sql = self.base.rstrip()
+        if self.clauses:
+            joiner = ' AND ' if re.search(r'\bwhere\b', sql, re.IGNORECASE) else ' WHERE '
+            sql += joiner + ' AND '.join(self.clauses)
+        if self.suffix:
+            sql += ' ' + ' '.join(self.suffix)
+        return sql
@@ -0,0 +1,132 @@
+"""
+Water of Leith WebMap - what-if scenarios
+Recomputes building damage for changed greenspace storage. Each building is
+given a depth-damage curve by category and the property value that makes the
+curve reproduce its 2024 (unprotected) damage at its flood depth. Inverting the
+curve at its protected damage gives the depth reduction the greenspaces buy;
+that reduction is credited to the nearest key greenspace and scaled by its
+storage multiplier. A scenario with every multiplier at 1 reproduces the
+FLOOD_DAMAGE columns. All of it runs as array operations over every building.
+2025
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+MAX_MULTIPLIER = 10.0
+RESULT_CACHE_SIZE = 256
+
+# depth (m) -> share of the property's damage at full depth
+DEPTH_DAMAGE_CURVES = {
+    'residential': ([0.0, 0.1, 0.3, 0.6, 1.0, 1.5, 2.0, 3.0],
+                    [0.0, 0.15, 0.30, 0.45, 0.60, 0.72, 0.82, 1.0]),
+    'non_residential': ([0.0, 0.1, 0.3, 0.6, 1.0, 1.5, 2.0, 3.0],
+                        [0.0, 0.10, 0.25, 0.40, 0.55, 0.70, 0.85, 1.0]),
+}
+
+
+def curve_name(category):
+    return 'residential' if 'resid' in (category or '').lower() else 'non_residential'
+
+
+def scenario_key(multipliers):
+    """Canonical form and short hash of {greenspace index: multiplier}; 1.0 entries are dropped."""
+    key = tuple(sorted((int(i), round(float(m), 3)) for i, m in multipliers.items()
+                       if round(float(m), 3) != 1.0))
+    digest = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()[:16]
+    return key, digest
+
+
+class ScenarioModel:
+    """Per-building curve parameters for one loaded copy of the building layer.
+
+    `greenspace` is the index (into the scenario's key greenspaces) credited with
+    each building's protection, -1 for none; `categories` the building categories.
+    """
+
+    def __init__(self, categories, depth, damage, protected, greenspace, n_greenspaces):
+        self.n = len(depth)
+        self.n_greenspaces = n_greenspaces
+        self.damage = np.nan_to_num(damage)
+        self.protected = np.nan_to_num(protected)
+        self.depth = np.nan_to_num(depth)
+        self.greenspace = greenspace
+        self.category_names, self.category = np.unique(
+            np.array([c or '' for c in categories], dtype=object), return_inverse=True)
+        self.category = self.category.reshape(-1)
+
+        curves = np.array([curve_name(c) for c in categories], dtype=object)
+        self.curve_rows = {name: np.flatnonzero(curves == name) for name in DEPTH_DAMAGE_CURVES}
+        share = self._share(self.depth)
+        # buildings the curves can describe: flooded, damaged, and credited to a greenspace
+        self.modelled = (share > 0) & (self.damage > 0) & (greenspace >= 0)
+        self.value = np.where(self.modelled, self.damage / np.where(share > 0, share, 1), 0.0)
+        protected_share = np.clip(self.protected / np.where(self.value > 0, self.value, 1), 0, share)
+        self.reduction = np.where(self.modelled, self.depth - self._depth(protected_share), 0.0)
+
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _share(self, depth):
+        out = np.zeros(self.n)
+        for name, rows in self.curve_rows.items():
+            depths, shares = DEPTH_DAMAGE_CURVES[name]
+            out[rows] = np.interp(depth[rows], depths, shares)
+        return out
+
+    def _depth(self, share):
+        out = np.zeros(self.n)
+        for name, rows in self.curve_rows.items():
+            depths, shares = DEPTH_DAMAGE_CURVES[name]
+            out[rows] = np.interp(share[rows], shares, depths)
+        return out
+
+    def run(self, multipliers):
+        """Totals for {greenspace index: storage multiplier}; memoised by scenario hash."""
+        key, digest = scenario_key(multipliers)
+        with self._lock:
+            result = self._results.get(digest)
+            if result is not None:
+                self._results.move_to_end(digest)
+                return result
+        result = self._compute(dict(key), digest)
+        with self._lock:
+            self._results[digest] = result
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return result
+
+    def _compute(self, multipliers, digest):
+        factor = np.ones(self.n_greenspaces + 1)
+        for i, m in multipliers.items():
+            factor[i] = m
+        # index -1 (no greenspace) reads the trailing 1.0
+        per_building = factor[self.greenspace]
+        depth = np.maximum(self.depth - self.reduction * per_building, 0.0)
+        protected = np.where(self.modelled, self.value * self._share(depth), self.protected)
+        protection = self.damage - protected
+
+        n_cat = len(self.category_names)
+        counts = np.bincount(self.category, minlength=n_cat)
+        cat_damage = np.bincount(self.category, weights=self.damage, minlength=n_cat)
+        cat_protection = np.bincount(self.category, weights=protection, minlength=n_cat)
+        credited = self.greenspace >= 0
+        gs_counts = np.bincount(self.greenspace[credited], minlength=self.n_greenspaces)
+        gs_protection = np.bincount(self.greenspace[credited], weights=protection[credited],
+                                    minlength=self.n_greenspaces)
+        return {
+            'scenario': digest,
+            'multipliers': multipliers,
+            'total_damage_2024': float(self.damage.sum()),
+            'total_damage_protected': float(protected.sum()),
+            'total_protection_value': float(protection.sum()),
+            'max_flood_depth_m': float(depth.max()) if self.n else 0.0,
+            'categories': [(str(self.category_names[i]) or None, int(counts[i]),
+                            float(cat_damage[i]), float(cat_protection[i])) for i in range(n_cat)],
+            'greenspaces': [(int(gs_counts[i]), float(gs_protection[i])) for i in range(self.n_greenspaces)],
+        }
@@ -0,0 +1,199 @@
+"""
+Water of Leith WebMap - packed 3D scenes
+Qgis2threejs exports each green space as one data/index/scene.js: a JSON
+literal holding the texture as a base64 data URL and every DEM height as a
+decimal number. The packer turns it into data/index/scene.bin - a JSON manifest
+followed by the DEM grids as quantised uint16 arrays, coarse levels of detail
+first - with the textures written out as separate image files.
+
+Usage:  python scene_packer.py [3d_models dir]
+2025
+"""
+
+import base64
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+
+MAGIC = b'WOLSCN01'
+FORMAT_VERSION = 1
+SOURCE_NAME = 'scene.js'
+PACKED_NAME = 'scene.bin'
+TEXTURE_PREFIX = 'scene_tex_'
+# every n-th grid row / column, coarsest first; the full grid always comes last
+LOD_STEPS = (8, 2)
+# coarse levels with fewer vertices than this across are skipped
+MIN_LOD_SIZE = 9
+QUANT_MAX = 65535
+ALIGN = 4
+
+_EXTENSIONS = {'image/png': '.png', 'image/jpeg': '.jpg', 'image/webp': '.webp'}
+
+
+def read_scene_js(path):
+    """The object passed to app.loadJSONObject(...) in a Qgis2threejs scene.js."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    start = text.find('loadJSONObject(')
+    if start < 0:
+        raise ValueError(f'{path}: not a Qgis2threejs scene file')
+    scene, _ = json.JSONDecoder().raw_decode(text, start + len('loadJSONObject('))
+    return scene
+
+
+def quantise(values):
+    """float heights -> (uint16 array, min, step); non-finite values become the minimum."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(values.shape, dtype='<u2'), 0.0, 0.0
+    lo = float(values[finite].min())
+    hi = float(values[finite].max())
+    step = (hi - lo) / QUANT_MAX
+    if step == 0:
+        return np.zeros(values.shape, dtype='<u2'), lo, 0.0
+    q = np.rint((np.where(finite, values, lo) - lo) / step)
+    return np.clip(q, 0, QUANT_MAX).astype('<u2'), lo, step
+
+
+def lod_steps(width, height):
+    """Steps that divide the grid evenly (so vertices keep their spacing), coarsest first."""
+    steps = []
+    for step in LOD_STEPS:
+        if (width - 1) % step or (height - 1) % step:
+            continue
+        if min((width - 1) // step, (height - 1) // step) + 1 < MIN_LOD_SIZE:
+            continue
+        steps.append(step)
+    return steps
+
+
+def _refinable(block, layer):
+    # clipped DEMs, sides, edges and wireframes are built once from the first grid
+    return not layer.get('properties', {}).get('clipped') and not any(
+        k in block for k in ('sides', 'edges', 'wireframe'))
+
+
+def _decode_data_url(url):
+    header, _, payload = url.partition(',')
+    if not header.startswith('data:') or not header.endswith(';base64'):
+        raise ValueError('not a base64 data URL')
+    mimetype = header[len('data:'):-len(';base64')]
+    return mimetype, base64.b64decode(payload)
+
+
+def pack_scene(scene, texture_dir, texture_url_prefix):
+    """Packed bytes for a parsed scene. Textures are written to `texture_dir` and
+    referenced as `texture_url_prefix` + file name (relative to the model page)."""
+    buffers = []       # (level, order, bytes, level entry in the manifest)
+    textures = []
+
+    for layer in scene.get('layers', []):
+        for block in layer.get('data') or []:
+            for m in block.get('materials') or []:
+                image = m.get('image') or {}
+                if 'base64' not in image:
+                    continue
+                mimetype, data = _decode_data_url(image['base64'])
+                name = (f"{TEXTURE_PREFIX}{layer.get('id')}_{block.get('block')}_{m.get('mtlIndex', 0)}"
+                        f"{_EXTENSIONS.get(mimetype, '.bin')}")
+                path = os.path.join(texture_dir, name)
+                tmp = f'{path}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                m['image'] = {'url': texture_url_prefix + name}
+                textures.append({'url': texture_url_prefix + name, 'bytes': len(data)})
+
+            grid = block.get('grid')
+            if not grid or 'array' not in grid:
+                continue
+            w, h = int(grid['width']), int(grid['height'])
+            values = np.asarray(grid.pop('array'), dtype=np.float64).reshape(h, w)
+            q, lo, step = quantise(values)
+            steps = lod_steps(w, h) if _refinable(block, layer) else []
+            levels = []
+            for n, s in enumerate(steps + [1]):
+                sub = np.ascontiguousarray(q[::s, ::s])
+                levels.append({'width': int(sub.shape[1]), 'height': int(sub.shape[0])})
+                buffers.append((n, len(buffers), sub.tobytes(), levels[-1]))
+            grid['packed'] = {'type': 'uint16', 'min': lo, 'step': step, 'levels': levels}
+
+    # level n of every block before level n + 1 of any: all the coarse grids arrive first
+    buffers.sort(key=lambda b: (b[0], b[1]))
+    table = []
+    offset = 0
+    for i, (_, _, data, level) in enumerate(buffers):
+        level['buffer'] = i
+        table.append({'offset': offset, 'length': len(data)})
+        offset += len(data) + (-len(data)) % ALIGN
+    n_levels = max([b[0] for b in buffers], default=0) + 1
+
+    manifest = {'version': FORMAT_VERSION, 'levels': n_levels, 'buffers': table,
+                'textures': textures, 'scene': scene}
+    header = json.dumps(manifest, separators=(',', ':')).encode('utf-8')
+    header += b' ' * ((-(len(MAGIC) + 4 + len(header))) % ALIGN)
+
+    out = [MAGIC, struct.pack('<I', len(header)), header]
+    for _, _, data, _ in buffers:
+        out.append(data)
+        out.append(b'\0' * ((-len(data)) % ALIGN))
+    return b''.join(out)
+
+
+def packed_path(model_dir):
+    return os.path.join(model_dir, 'data', 'index', PACKED_NAME)
+
+
+def is_stale(model_dir):
+    src = os.path.join(model_dir, 'data', 'index', SOURCE_NAME)
+    try:
+        return os.stat(packed_path(model_dir)).st_mtime < os.stat(src).st_mtime
+    except OSError:
+        return True
+
+
+def pack_model(model_dir):
+    """Write data/index/scene.bin (and the texture files) for one exported model. Returns its path."""
+    index_dir = os.path.join(model_dir, 'data', 'index')
+    scene = read_scene_js(os.path.join(index_dir, SOURCE_NAME))
+    data = pack_scene(scene, index_dir, './data/index/')
+    path = packed_path(model_dir)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def read_manifest(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path}: not a packed scene')
+        (n,) = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(n))
+
+
+def pack_all(models_root):
+    """Pack every model folder that has a scene.js. Returns [(folder, source bytes, packed bytes)]."""
+    done = []
+    for name in sorted(os.listdir(models_root)):
+        model_dir = os.path.join(models_root, name)
+        src = os.path.join(model_dir, 'data', 'index', SOURCE_NAME)
+        if not os.path.isfile(src):
+            continue
+        path = pack_model(model_dir)
+        textures = sum(t['bytes'] for t in read_manifest(path)['textures'])
+        done.append((name, os.path.getsize(src), os.path.getsize(path) + textures))
+    return done
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, '..', 'frontend', '3d_models')
+    for name, before, after in pack_all(root):
+        print(f'{name}: scene.js {before / 1e6:.2f} MB -> scene.bin + textures {after / 1e6:.2f} MB')
@@ -0,0 +1,109 @@
+"""
+Water of Leith WebMap - spatial index
+Sort-Tile-Recursive packed R-tree over feature envelopes, plus the helpers that
+work out an envelope from a GeoJSON geometry.
+2025
+"""
+
+import math
+
+
+def geometry_envelope(geometry):
+    """(minx, miny, maxx, maxy) of a GeoJSON geometry dict, or None when it has no coordinates."""
+    if not geometry:
+        return None
+    if geometry.get('type') == 'GeometryCollection':
+        envs = [geometry_envelope(g) for g in geometry.get('geometries') or []]
+        envs = [e for e in envs if e]
+        if not envs:
+            return None
+        return (min(e[0] for e in envs), min(e[1] for e in envs),
+                max(e[2] for e in envs), max(e[3] for e in envs))
+
+    minx = miny = math.inf
+    maxx = maxy = -math.inf
+    stack = [geometry.get('coordinates')]
+    while stack:
+        c = stack.pop()
+        if not c:
+            continue
+        if isinstance(c[0], (int, float)):
+            x, y = c[0], c[1]
+            if x < minx: minx = x
+            if x > maxx: maxx = x
+            if y < miny: miny = y
+            if y > maxy: maxy = y
+        else:
+            stack.extend(c)
+    if minx == math.inf:
+        return None
+    return (minx, miny, maxx, maxy)
+
+
+def parse_bbox(value):
+    """Parse 'minx,miny,maxx,maxy'. Raises ValueError on anything else."""
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(p) for p in parts):
+        raise ValueError('bbox must be minx,miny,maxx,maxy')
+    minx, miny, maxx, maxy = parts
+    if minx > maxx or miny > maxy:
+        raise ValueError('bbox min must not exceed max')
+    return (minx, miny, maxx, maxy)
+
+
+class STRTree:
+    """Static R-tree packed with the Sort-Tile-Recursive algorithm.
+
+    Entries are (minx, miny, maxx, maxy, payload) tuples; at the leaves the
+    payload is the row number, higher up it is the list of child entries.
+    A query costs O(log n + k) node visits.
+    """
+
+    def __init__(self, envelopes, node_capacity=16):
+        self.node_capacity = max(2, node_capacity)
+        entries = [(e[0], e[1], e[2], e[3], i) for i, e in enumerate(envelopes) if e is not None]
+        self.size = len(entries)
+        self.height = 0
+        while len(entries) > self.node_capacity:
+            entries = self._pack(entries)
+            self.height += 1
+        self._root = entries
+
+    def _pack(self, entries):
+        cap = self.node_capacity
+        node_count = math.ceil(len(entries) / cap)
+        slice_count = math.ceil(math.sqrt(node_count))
+        slice_size = slice_count * cap
+
+        entries = sorted(entries, key=lambda e: e[0] + e[2])
+        nodes = []
+        for s in range(0, len(entries), slice_size):
+            vertical = sorted(entries[s:s + slice_size], key=lambda e: e[1] + e[3])
+            for n in range(0, len(vertical), cap):
+                group = vertical[n:n + cap]
+                nodes.append((min(e[0] for e in group), min(e[1] for e in group),
+                              max(e[2] for e in group), max(e[3] for e in group), group))
+        return nodes
+
+    @property
+    def bounds(self):
+        if not self._root:
+            return None
+        return (min(e[0] for e in self._root), min(e[1] for e in self._root),
+                max(e[2] for e in self._root), max(e[3] for e in self._root))
+
+    def query(self, bbox):
+        """Sorted row numbers whose envelope intersects bbox."""
+        qminx, qminy, qmaxx, qmaxy = bbox
+        out = []
+        stack = [(self._root, self.height)]
+        while stack:
+            entries, depth = stack.pop()
+            for e in entries:
+                if e[0] <= qmaxx and e[2] >= qminx and e[1] <= qmaxy and e[3] >= qminy:
+                    if depth == 0:
+                        out.append(e[4])
+                    else:
+                        stack.append((e[4], depth - 1))
+        out.sort()
+        return out
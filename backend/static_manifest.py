@@ -0,0 +1,129 @@
+"""
+Water of Leith WebMap - static asset manifest
+Content-hashes the frontend files once at startup. Pages are served with the
+relative src= / href= attributes of their tags rewritten to /assets/<hash>/<name>
+(script and style bodies and comments are left alone), so identical
+files (every 3D model folder ships the same three.js, tween.js and Qgis2threejs
+files) share one URL that browsers cache for good.
+2025
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import threading
+
+
+HASH_LENGTH = 16
+# not assets: sidecars written by compression.py and partial writes
+SKIP_SUFFIXES = ('.gz', '.br', '.tmp')
+PAGE_SUFFIXES = ('.html', '.htm')
+# comments, script / style elements (opening tag, body, closing tag) and other tags
+_MARKUP = re.compile(r'<!--.*?-->|(<(script|style)\b[^>]*>)(.*?)(</\2\s*>)|<[a-zA-Z][^>]*>', re.S | re.I)
+# relative references in a tag: src="./x.js", href='css/y.css'
+_ATTR = re.compile(r'''(\s(?:src|href)\s*=\s*)(["'])([^"'<>\s:#?]+?)\2''', re.I)
+
+
+def _digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+class StaticManifest:
+    """relpath -> content hash for every file under `root`, and hash -> one canonical file."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self.files = {}
+        self.by_hash = {}
+        self._pages = {}
+        self.build()
+
+    def build(self):
+        files, by_hash = {}, {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(SKIP_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                st = os.stat(path)
+                digest = _digest(path)
+                files[rel] = (digest, st.st_size, st.st_mtime)
+                by_hash.setdefault(digest, rel)
+        with self._lock:
+            self.files = files
+            self.by_hash = by_hash
+            self._pages = {}
+
+    def _changed(self, rel):
+        info = self.files.get(rel)
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            return True
+        return info is None or (st.st_size, st.st_mtime) != info[1:]
+
+    def resolve(self, digest):
+        """Absolute path of the canonical file for a hash, or None.
+
+        Files edited since the manifest was built trigger a rebuild, so a hashed
+        URL never serves content other than the bytes it was named after.
+        """
+        rel = self.by_hash.get(digest)
+        if rel is not None and self._changed(rel):
+            self.build()
+            rel = self.by_hash.get(digest)
+        return os.path.join(self.root, rel) if rel else None
+
+    def asset_url(self, rel, from_dir=''):
+        """Relative URL (from a page in `from_dir`) of the hashed copy of `rel`, or None."""
+        info = self.files.get(rel)
+        if info is None or rel.endswith(PAGE_SUFFIXES):
+            return None
+        target = f'assets/{info[0]}/{posixpath.basename(rel)}'
+        return posixpath.relpath(target, from_dir or '.')
+
+    def page(self, rel):
+        """Bytes of an HTML page with its local asset references pointing at hashed URLs."""
+        if self._changed(rel):
+            self.build()
+        cached = self._pages.get(rel)
+        if cached is not None:
+            return cached
+        with open(os.path.join(self.root, rel), 'rb') as f:
+            text = f.read().decode('utf-8')
+        page_dir = posixpath.dirname(rel)
+
+        def swap(m):
+            target = posixpath.normpath(posixpath.join(page_dir, m.group(3)))
+            url = self.asset_url(target, page_dir)
+            return f'{m.group(1)}{m.group(2)}{url}{m.group(2)}' if url else m.group(0)
+
+        def tag(m):
+            if m.group(0).startswith('<!--'):
+                return m.group(0)
+            if m.group(1):
+                # only the opening tag; the script or stylesheet itself is not markup
+                return _ATTR.sub(swap, m.group(1)) + m.group(3) + m.group(4)
+            return _ATTR.sub(swap, m.group(0))
+
+        body = _MARKUP.sub(tag, text).encode('utf-8')
+        self._pages[rel] = body
+        return body
+
+    def stats(self):
+        total = sum(info[1] for info in self.files.values())
+        unique = sum(self.files[rel][1] for rel in self.by_hash.values())
+        return {
+            'files': len(self.files),
+            'unique': len(self.by_hash),
+            'bytes': total,
+            'deduplicated_bytes': total - unique,
+        }
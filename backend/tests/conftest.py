@@ -0,0 +1,132 @@
+"""
+Water of Leith WebMap - test fixtures
+The backend modules are imported flat, as gunicorn imports them from backend/.
+API tests run against a small SQLite database standing in for the Oracle
+schema: the cursor wrapper carries the attributes data_access.fetch sets and
+rewrites the few Oracle-only SQL forms the queries use.
+2025
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+
+TABLES = {
+    'STUDY_AREA': ('area_id', 'area_name', 'pva_reference', 'geom_json'),
+    'SIMD_ZONE': ('simd_zone_id', 'datazone_code', 'datazone_name', 'simd_decile',
+                  'risk_index', 'simd_rank', 'geom_json'),
+    'GREENSPACE': ('greenspace_id', 'name', 'function_type', 'storage_volume_m3',
+                   'is_key_greenspace', 'geom_json'),
+    'FLOOD_ZONE': ('zone_id', 'probability', 'depth_band', 'scenario', 'geom_json'),
+    'FLOOD_DAMAGE': ('damage_id', 'building_id', 'building_category', 'flood_depth_m',
+                     'damage_2024_pound', 'damage_protected_pound', 'protection_value_pound',
+                     'geom_json'),
+}
+
+
+def square(x, y, size=0.001):
+    """geom_json text of a square polygon with its south-west corner at (x, y)."""
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return json.dumps({'type': 'Polygon', 'coordinates': [ring]})
+
+
+class SqliteCursor:
+    def __init__(self, db):
+        self._cursor = db.cursor()
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.outputtypehandler = None
+        self.description = None
+
+    def execute(self, sql, binds=None):
+        sql = re.sub(r'FETCH FIRST (\S+) ROWS ONLY', r'LIMIT \1', sql)
+        sql = sql.replace('ORA_ROWSCN', 'rowid')
+        self._cursor.execute(sql, binds or {})
+        self.description = [(d[0].upper(), None, None, None, None, None, None)
+                            for d in self._cursor.description or []]
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return SqliteCursor(self.db)
+
+    def close(self):
+        pass
+
+
+class SqlitePool:
+    max = 2
+
+    def __init__(self, db):
+        self.db = db
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        return SqliteConnection(self.db)
+
+
+def insert(db, table, rows):
+    columns = TABLES[table]
+    db.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                   rows)
+    db.commit()
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.create_function('NVL', 2, lambda a, b: b if a is None else a)
+    conn.create_function('NVL2', 3, lambda a, b, c: c if a is None else b)
+    for table, columns in TABLES.items():
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    insert(conn, 'STUDY_AREA', [(1, 'Water of Leith', 'PVA_02_05', square(-3.3, 55.9, 0.1))])
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def api(db, tmp_path, monkeypatch):
+    """The app module wired to the SQLite database, with empty caches."""
+    import app
+    from layer_versions import VersionStore
+
+    monkeypatch.setattr(app, '_ORACLE_POOL', SqlitePool(db))
+    monkeypatch.setattr(app, 'VERSION_STORE', VersionStore(str(tmp_path / 'versions')))
+    app.LAYER_CACHE.invalidate()
+    app.TILE_CACHE.invalidate()
+    app.LAYER_STORE.invalidate()
+    yield app
+    app.LAYER_CACHE.invalidate()
+    app.TILE_CACHE.invalidate()
+    app.LAYER_STORE.invalidate()
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
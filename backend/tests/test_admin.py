@@ -0,0 +1,19 @@
+def test_admin_is_closed_without_a_token(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    monkeypatch.delenv('ADMIN_OPEN', raising=False)
+    assert client.get('/api/admin/cache').status_code == 403
+    assert client.post('/api/admin/cache/invalidate').status_code == 403
+
+
+def test_admin_needs_the_matching_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 's3cret')
+    monkeypatch.setenv('ADMIN_OPEN', '1')
+    assert client.get('/api/admin/cache').status_code == 403
+    assert client.get('/api/admin/cache', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/api/admin/cache', headers={'X-Admin-Token': 's3cret'}).status_code == 200
+
+
+def test_admin_open_is_an_explicit_opt_in(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    monkeypatch.setenv('ADMIN_OPEN', '1')
+    assert client.get('/api/admin/cache').status_code == 200
@@ -0,0 +1,34 @@
+from conftest import insert, square
+
+
+def _load(db):
+    insert(db, 'SIMD_ZONE', [
+        (1, 'S01008662', 'Balerno - 01', 9, 0.12, 6201, square(-3.30, 55.90, 0.01)),
+        (2, 'S01008719', 'Stenhouse - 03', 2, 0.81, 901, square(-3.29, 55.90, 0.01)),
+    ])
+    buildings = [
+        # (zone x, protection value, depth)
+        (-3.299, 100.0, 0.3), (-3.295, 250.0, 0.9), (-3.285, 4000.0, 0.5), (-3.25, 999.0, 2.0),
+    ]
+    insert(db, 'FLOOD_DAMAGE', [(i + 1, f'B{i}', 'Residential', depth, value * 3, value * 2, value,
+                                 square(x, 55.905, 0.0002)) for i, (x, value, depth) in enumerate(buildings)])
+
+
+def test_buildings_are_summed_per_zone(db, client):
+    _load(db)
+    body = client.get('/api/aggregate?by=simd_zone').get_json()
+    assert body['metadata'] == {'by': 'simd_zone', 'zone_count': 2, 'building_count': 4, 'unassigned_count': 1}
+    stenhouse, balerno = body['zones']
+    assert stenhouse['datazone_code'] == 'S01008719'
+    assert (stenhouse['building_count'], stenhouse['protection_value_pound']) == (1, 4000.0)
+    assert (balerno['building_count'], balerno['protection_value_pound']) == (2, 350.0)
+    assert balerno['damage_2024_pound'] == 1050.0
+    assert balerno['max_flood_depth_m'] == 0.9
+
+
+def test_geojson_carries_the_zone_geometry(db, client):
+    _load(db)
+    body = client.get('/api/aggregate?by=simd_zone&format=geojson').get_json()
+    assert [f['properties']['simd_zone_id'] for f in body['features']] == [1, 2]
+    assert body['features'][0]['geometry']['type'] == 'Polygon'
+    assert client.get('/api/aggregate?by=nope').status_code == 400
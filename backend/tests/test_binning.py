@@ -0,0 +1,58 @@
+import json
+import math
+
+import numpy as np
+from shapely.geometry import Point, shape
+
+from binning import aggregate, hex_cells, pixel_metres, to_lonlat, to_mercator
+
+
+def _buildings(n=400, seed=2):
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(-3.32, -3.18, n)
+    lat = rng.uniform(55.88, 55.96, n)
+    return lon, lat, rng.uniform(0, 10000, n), rng.uniform(0, 2, n)
+
+
+def test_mercator_round_trip():
+    lon, lat = np.array([-3.25, 0.0]), np.array([55.9, -10.0])
+    back = to_lonlat(*to_mercator(lon, lat))
+    assert np.allclose(back, (lon, lat))
+
+
+def test_points_fall_in_the_nearest_hexagon():
+    rng = np.random.default_rng(4)
+    x, y = rng.uniform(-5000, 5000, 2000), rng.uniform(-5000, 5000, 2000)
+    radius = 300.0
+    q, r = hex_cells(x, y, radius)
+    cx, cy = radius * math.sqrt(3) * (q + r / 2), radius * 1.5 * r
+    mine = np.hypot(x - cx, y - cy)
+    for dq, dr in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)):
+        ox, oy = radius * math.sqrt(3) * (q + dq + (r + dr) / 2), radius * 1.5 * (r + dr)
+        assert (mine <= np.hypot(x - ox, y - oy) + 1e-9).all()
+
+
+def test_hexbins_keep_every_building_and_their_totals():
+    lon, lat, value, depth = _buildings()
+    x, y = to_mercator(lon, lat)
+    depth[0] = np.nan
+    props, geometries = aggregate('hexbin', 12, x, y, {'total_value': value}, {'max_depth': depth})
+    assert sum(p['count'] for p in props) == len(x)
+    assert abs(sum(p['total_value'] for p in props) - value.sum()) < len(props) * 0.01
+    assert max(p['max_depth'] for p in props) == round(float(np.nanmax(depth)), 3)
+    cells = {p['cell']: shape(json.loads(g)) for p, g in zip(props, geometries)}
+    q, r = hex_cells(x, y, 30 * pixel_metres(12))
+    for i in range(0, len(x), 37):
+        assert cells[f'{q[i]}:{r[i]}'].buffer(1e-9).contains(Point(lon[i], lat[i]))
+
+
+def test_clusters_sit_at_the_centre_of_their_members():
+    lon = np.array([-3.25, -3.25002, -3.1])
+    lat = np.array([55.9, 55.90002, 55.95])
+    x, y = to_mercator(lon, lat)
+    props, geometries = aggregate('cluster', 10, x, y, {}, {})
+    by_count = sorted(zip(props, geometries), key=lambda pg: pg[0]['count'])
+    assert [p['count'] for p, _ in by_count] == [1, 2]
+    centre = json.loads(by_count[1][1])['coordinates']
+    assert np.allclose(centre, [-3.25001, 55.90001], atol=1e-7)
+    assert aggregate('cluster', 10, np.array([]), np.array([]), {}, {}) == ([], [])
@@ -0,0 +1,56 @@
+import gzip
+import json
+import zlib
+
+from compression import gzip_stream
+
+
+def test_gzip_stream_flushes_each_chunk():
+    chunks = [b'{"layers":{', b'"a":[1,2,3]', b'}}']
+    out = list(gzip_stream(iter(chunks)))
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # the first two sections can be decoded before the stream ends
+    assert decoder.decompress(out[0] + out[1]) == b'{"layers":{"a":[1,2,3]'
+    assert gzip.decompress(b''.join(out)) == b''.join(chunks)
+
+
+def test_miss_streams_the_sections_and_caches_the_document(client):
+    resp = client.get('/api/bootstrap?layers=study_area,summary')
+    assert resp.headers['X-Cache'] == 'MISS'
+    assert resp.is_streamed
+    body = json.loads(resp.data)
+    assert set(body) == {'layers'}
+    assert body['layers']['study_area']['features'][0]['properties']['area_name'] == 'Water of Leith'
+
+    hit = client.get('/api/bootstrap?layers=study_area,summary')
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert json.loads(hit.data) == body
+    etag = hit.headers['ETag']
+    assert client.get('/api/bootstrap?layers=study_area,summary',
+                      headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_miss_is_gzipped_on_the_fly(client):
+    resp = client.get('/api/bootstrap?layers=study_area', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'study_area' in json.loads(gzip.decompress(resp.data))['layers']
+
+
+def test_cached_sections_come_first(client):
+    client.get('/api/summary')
+    body = client.get('/api/bootstrap?layers=study_area,summary').data
+    assert body.index(b'"summary"') < body.index(b'"study_area"')
+
+
+def test_failed_sections_are_named_and_not_cached(api, client, monkeypatch):
+    monkeypatch.setitem(api.BOOTSTRAP_SECTIONS, 'summary', '/api/no_such_endpoint')
+    body = json.loads(client.get('/api/bootstrap?layers=study_area,summary').data)
+    assert list(body['layers']) == ['study_area']
+    assert 'summary' in body['errors']
+    assert client.get('/api/bootstrap?layers=study_area,summary').headers['X-Cache'] == 'MISS'
+
+
+def test_unknown_sections_are_rejected(client):
+    resp = client.get('/api/bootstrap?layers=study_area,nope')
+    assert resp.status_code == 400
+    assert 'nope' in resp.get_json()['error']
@@ -0,0 +1,70 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import classify as classify_module
+from classify import classify, parse_classes
+
+
+def _ssd(x, breaks):
+    classes = np.searchsorted(np.asarray(breaks[1:-1]), x, side='left')
+    return sum(((x[classes == c] - x[classes == c].mean()) ** 2).sum()
+               for c in range(len(breaks) - 1) if (classes == c).any())
+
+
+def _best_ssd(x, k):
+    """Least within-class sum of squares over every split of the sorted values into k runs."""
+    x = np.sort(x)
+    best = np.inf
+    for cuts in itertools.combinations(range(1, len(x)), k - 1):
+        parts = np.split(x, cuts)
+        best = min(best, sum(((p - p.mean()) ** 2).sum() for p in parts))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_jenks_matches_an_exhaustive_search(seed):
+    rng = np.random.default_rng(seed)
+    x = np.round(rng.lognormal(3, 1, 14), 1)
+    for k in (2, 3, 4):
+        result = classify(x, 'jenks', k)
+        assert result['k'] == k
+        assert _ssd(np.sort(x), result['breaks']) == pytest.approx(_best_ssd(x, k))
+
+
+def test_jenks_groups_large_columns(monkeypatch):
+    monkeypatch.setattr(classify_module, 'JENKS_MAX_VALUES', 50)
+    rng = np.random.default_rng(1)
+    x = np.concatenate([rng.normal(10, 1, 3000), rng.normal(50, 1, 3000), rng.normal(90, 1, 3000)])
+    result = classify(x, 'jenks', 3)
+    # grouped into 50 runs of 180 values, so a class can be off by at most one group
+    assert all(abs(c - 3000) <= 180 for c in result['counts'])
+    assert sum(result['counts']) == 9000
+    assert result['breaks'][0] == x.min() and result['breaks'][-1] == x.max()
+
+
+def test_quantile_breaks_are_values_of_the_column():
+    x = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, np.nan], dtype=np.float64)
+    result = classify(x, 'quantile', 5)
+    assert result['count'] == 10
+    assert result['breaks'] == [1, 2, 4, 6, 8, 10]
+    assert result['counts'] == [2, 2, 2, 2, 2]
+
+
+def test_skewed_columns_merge_repeated_breaks():
+    x = np.array([0.0] * 90 + [5.0] * 5 + [100.0] * 5)
+    result = classify(x, 'quantile', 5)
+    assert result['k'] < 5
+    assert sum(result['counts']) == 100
+    assert classify(np.array([3.0, 3.0]), 'jenks', 4)['breaks'] == [3.0, 3.0]
+    assert classify(np.array([np.nan]), 'equal', 4) == {'method': 'equal', 'count': 0,
+                                                        'k': 0, 'breaks': [], 'counts': []}
+
+
+def test_parse_classes():
+    assert parse_classes(None) == classify_module.DEFAULT_CLASSES
+    assert parse_classes('7') == 7
+    for bad in ('1', '13', 'x'):
+        with pytest.raises(ValueError):
+            parse_classes(bad)
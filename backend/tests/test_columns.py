@@ -0,0 +1,51 @@
+import numpy as np
+
+from columns import Columns
+
+
+PROPERTIES = [
+    {'category': 'Residential', 'depth': 0.4, 'key': True},
+    {'category': 'Commercial', 'depth': '1.2', 'key': False},
+    {'category': None, 'depth': None, 'key': None},
+    {'category': 'Residential', 'depth': 'n/a', 'key': True},
+    {'category': 'Industrial', 'depth': 0.9, 'key': 0},
+]
+
+
+def test_numbers_and_flags_become_floats():
+    columns = Columns(PROPERTIES)
+    depth = columns.numeric('depth')
+    assert depth[[0, 1, 4]].tolist() == [0.4, 1.2, 0.9]
+    assert np.isnan(depth[[2, 3]]).all()
+    assert columns.numeric('key')[[0, 1, 4]].tolist() == [1, 0, 0]
+    # built once and kept
+    assert columns.numeric('depth') is depth
+
+
+def test_text_is_dictionary_encoded():
+    distinct, codes = Columns(PROPERTIES).categorical('category')
+    assert distinct == ['Residential', 'Commercial', None, 'Industrial']
+    assert codes.tolist() == [0, 1, 2, 0, 3]
+
+
+def test_masks():
+    columns = Columns(PROPERTIES)
+    assert columns.between('depth', 0.5).tolist() == [False, True, False, False, True]
+    assert columns.between('depth', None, 1.0).tolist() == [True, False, False, False, True]
+    assert columns.where('category', lambda v: v == 'Residential').tolist() == [True, False, False, True, False]
+    assert Columns([]).where('category', bool).tolist() == []
+
+
+def test_order_puts_missing_values_last_and_keeps_ties_in_row_order():
+    columns = Columns(PROPERTIES)
+    assert columns.order('depth').tolist() == [0, 4, 1, 2, 3]
+    assert columns.order('depth', descending=True).tolist() == [1, 4, 0, 2, 3]
+    assert columns.order('category').tolist() == [1, 4, 0, 3, 2]
+    assert columns.order('category', descending=True).tolist() == [0, 3, 4, 1, 2]
+    assert columns.order('depth', rows=[4, 3, 0]).tolist() == [0, 4, 3]
+
+
+def test_attributes_are_columns_without_being_properties():
+    columns = Columns([{'id': 1}, {'id': 2}], attributes={'value': [5.0, 2.5]})
+    assert columns.order('value').tolist() == [1, 0]
+    assert 'value' not in columns.properties[0]
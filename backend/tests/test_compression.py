@@ -0,0 +1,60 @@
+import gzip
+import os
+
+from werkzeug.datastructures import Accept
+
+import compression
+from compression import build_sidecars, compress, compressible, fresh_sidecar, negotiate
+
+
+def test_gzip_is_reproducible():
+    data = b'{"type":"FeatureCollection","features":[]}' * 100
+    assert compress(data, 'gzip') == compress(data, 'gzip')
+    assert gzip.decompress(compress(data, 'gzip')) == data
+
+
+def test_only_text_like_bodies_over_the_minimum_are_compressed():
+    assert compressible('application/json; charset=utf-8', 5000)
+    assert compressible('application/vnd.mapbox-vector-tile', 5000)
+    assert not compressible('application/json', 100)
+    assert not compressible('image/png', 5000)
+
+
+def test_negotiation_follows_the_client_and_what_exists():
+    # the preferred encoding wins a tie (br when brotli is installed)
+    everything = {e: b'' for e in compression.ENCODINGS}
+    assert negotiate(Accept([('gzip', 1), ('br', 1)]), everything) == compression.ENCODINGS[0]
+    assert negotiate(Accept([('gzip', 1)]), {'gzip': b''}) == 'gzip'
+    assert negotiate(Accept([('identity', 1)]), {'gzip': b''}) is None
+    assert negotiate(Accept([('gzip', 1)]), {}) is None
+
+
+def test_sidecars_are_written_once_and_go_stale_with_the_source(tmp_path):
+    script = tmp_path / 'js' / 'map.js'
+    script.parent.mkdir()
+    script.write_text('const layers = {};\n' * 500)
+    (tmp_path / 'tiny.css').write_text('a{}')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 5000)
+
+    written, saved = build_sidecars(str(tmp_path), encodings=('gzip',))
+    assert written == 1 and saved > 0
+    assert gzip.decompress((tmp_path / 'js' / 'map.js.gz').read_bytes()) == script.read_bytes()
+    assert build_sidecars(str(tmp_path), encodings=('gzip',)) == (0, 0)
+
+    stat = os.stat(script)
+    os.utime(script, (stat.st_atime, stat.st_mtime + 10))
+    assert fresh_sidecar(str(script), 'gzip') is None
+
+
+def test_static_files_are_served_from_a_fresh_sidecar(api, client, tmp_path, monkeypatch):
+    (tmp_path / 'app.js').write_text('console.log("water of leith");\n' * 200)
+    build_sidecars(str(tmp_path), encodings=('gzip',))
+    with api.app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+        resp = api.send_static(str(tmp_path), 'app.js')
+        resp.direct_passthrough = False
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(resp.get_data()) == (tmp_path / 'app.js').read_bytes()
+    with api.app.test_request_context('/'):
+        resp = api.send_static(str(tmp_path), 'app.js')
+        resp.direct_passthrough = False
+        assert 'Content-Encoding' not in resp.headers
@@ -0,0 +1,57 @@
+from conftest import SqliteConnection, insert, square
+from data_access import QueryStats, fetch, fetch_all, fetch_one
+from query_builder import Query
+
+
+def _damage(db, n):
+    insert(db, 'FLOOD_DAMAGE', [(i, f'B{i}', 'Residential', 0.5, 1000.0 * i, 0.0, 1000.0 * i,
+                                 square(-3.3 + i * 0.001, 55.9)) for i in range(1, n + 1)])
+
+
+def test_round_trips_are_estimated_from_the_fetch_sizes(db):
+    _damage(db, 25)
+    stats = QueryStats()
+    rows = fetch(SqliteConnection(db), Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE'), stats, arraysize=10)
+    assert rows.cursor.prefetchrows == 11
+    assert len(list(rows)) == 25
+    # the execute brings 11 rows back, the other 14 (and the end) take two fetches
+    assert rows.estimated_round_trips == 3
+    shape = stats.snapshot()['damage']
+    assert shape['executions'] == 1 and shape['rows'] == 25
+    assert shape['estimated_round_trips'] == 3
+    assert 'round_trips' not in shape
+
+
+def test_a_result_within_the_prefetch_is_one_round_trip(db):
+    _damage(db, 10)
+    stats = QueryStats()
+    assert len(fetch_all(SqliteConnection(db), Query('damage', 'SELECT * FROM FLOOD_DAMAGE'), stats,
+                         arraysize=10)) == 10
+    assert stats.snapshot()['damage']['estimated_round_trips'] == 1
+
+
+def test_stats_are_kept_per_shape_whatever_the_values(db):
+    _damage(db, 5)
+    stats = QueryStats()
+    conn = SqliteConnection(db)
+    for limit in (1, 2, 3):
+        query = Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE').order_by('damage_id').fetch_first(limit)
+        assert len(fetch_all(conn, query, stats)) == limit
+    assert fetch_one(conn, Query('damage_count', 'SELECT COUNT(*) FROM FLOOD_DAMAGE'), stats) == (5,)
+    snapshot = stats.snapshot()
+    assert snapshot['damage[limit]']['executions'] == 3
+    assert snapshot['damage[limit]']['rows'] == 6
+    assert snapshot['damage_count']['avg_rows'] == 1
+    stats.reset()
+    assert stats.snapshot() == {}
+
+
+def test_rows_record_once_when_closed_early(db):
+    _damage(db, 5)
+    stats = QueryStats()
+    rows = fetch(SqliteConnection(db), Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE'), stats)
+    assert rows.fetchone() is not None
+    rows.close()
+    rows.close()
+    assert stats.snapshot()['damage']['rows'] == 1
+    assert stats.snapshot()['damage']['executions'] == 1
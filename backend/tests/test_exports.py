@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+
+import pytest
+
+import exports
+from conftest import insert, square
+from exports import ExportCache, column_kinds, iter_csv, iter_json, iter_ndjson, write_arrow
+
+
+ROWS = [(1, 'Saughton Park', 103265.0, None), (2, 'Oriam, "pitches"', None, 1)]
+COLUMNS = ['greenspace_id', 'name', 'storage_volume_m3', 'is_key_greenspace']
+
+
+@pytest.fixture
+def export_cache(api, tmp_path, monkeypatch):
+    cache = ExportCache(str(tmp_path / 'exports'))
+    monkeypatch.setattr(api, 'EXPORT_CACHE', cache)
+    return cache
+
+
+def test_text_writers_round_trip_in_small_chunks():
+    text = b''.join(iter_csv(iter(ROWS), COLUMNS, chunk_size=8)).decode()
+    assert list(csv.reader(io.StringIO(text)))[2] == ['2', 'Oriam, "pitches"', '', '1']
+    lines = b''.join(iter_ndjson(iter(ROWS), COLUMNS, chunk_size=8)).splitlines()
+    assert json.loads(lines[0]) == dict(zip(COLUMNS, ROWS[0]))
+    assert json.loads(b''.join(iter_json(iter(ROWS), COLUMNS, chunk_size=8))) == \
+        [dict(zip(COLUMNS, r)) for r in ROWS]
+    assert json.loads(b''.join(iter_json(iter([]), COLUMNS))) == []
+
+
+def test_column_kinds_are_guessed_from_values():
+    assert column_kinds(ROWS, 4) == ['int', 'str', 'float', 'int']
+    assert column_kinds(ROWS, 4, known=[None, None, None, 'bool'])[3] == 'bool'
+
+
+def test_arrow_batches_round_trip(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    path = str(tmp_path / 'gs.parquet')
+    write_arrow(iter(ROWS * 3), COLUMNS, path, 'parquet', batch_rows=2)
+    table = pyarrow.parquet.read_table(path)
+    assert table.num_rows == 6
+    assert table.column('storage_volume_m3').to_pylist()[:2] == [103265.0, None]
+
+
+def test_tee_keeps_only_complete_streams(tmp_path):
+    cache = ExportCache(str(tmp_path))
+    stream = cache.tee(iter([b'a', b'b']), 'summary', 'v1', 'csv')
+    next(stream)
+    stream.close()
+    assert cache.get('summary', 'v1', 'csv') is None
+    assert list(tmp_path.iterdir()) == []
+
+    assert b''.join(cache.tee(iter([b'a', b'b']), 'summary', 'v1', 'csv')) == b'ab'
+    with open(cache.get('summary', 'v1', 'csv'), 'rb') as f:
+        assert f.read() == b'ab'
+
+
+def test_new_versions_replace_old_files(tmp_path):
+    cache = ExportCache(str(tmp_path))
+    b''.join(cache.tee(iter([b'old']), 'summary', 'v1', 'csv'))
+    cache.build('summary', 'v1', 'json', lambda tmp: open(tmp, 'w').close())
+    b''.join(cache.tee(iter([b'new']), 'summary', 'v2', 'csv'))
+    assert cache.get('summary', 'v1', 'csv') is None and cache.get('summary', 'v1', 'json') is None
+    assert cache.get('summary', 'v2', 'csv')
+
+
+def test_export_is_kept_until_the_table_changes(db, client, export_cache):
+    insert(db, 'GREENSPACE', [(1, 'Saughton Park', 'Public Park', 103265.0, 1, square(-3.3, 55.9))])
+    first = client.get('/api/export/greenspaces?format=ndjson')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert json.loads(first.data.splitlines()[0])['name'] == 'Saughton Park'
+    assert client.get('/api/export/greenspaces?format=ndjson').headers['X-Cache'] == 'HIT'
+
+    insert(db, 'GREENSPACE', [(2, 'Oriam', 'Playing Field', 5431.0, 0, square(-3.29, 55.9))])
+    again = client.get('/api/export/greenspaces?format=ndjson')
+    assert again.headers['X-Cache'] == 'MISS'
+    assert len(again.data.splitlines()) == 2
+
+
+def test_fields_pick_and_order_the_columns(db, client, export_cache):
+    insert(db, 'GREENSPACE', [(1, 'Saughton Park', 'Public Park', 103265.0, 1, square(-3.3, 55.9))])
+    text = client.get('/api/export/greenspaces?format=csv&fields=name,greenspace_id').data.decode()
+    assert text.splitlines() == ['name,greenspace_id', 'Saughton Park,1']
+    assert client.get('/api/export/greenspaces?fields=nope').status_code == 400
+
+
+def test_arrow_formats_need_pyarrow(client, export_cache, monkeypatch):
+    monkeypatch.setattr(exports, 'pyarrow', None)
+    resp = client.get('/api/export/greenspaces?format=parquet')
+    assert resp.status_code == 501
+    assert 'requirements-optional.txt' in resp.get_json()['error']
@@ -0,0 +1,57 @@
+import json
+
+from geojson_stream import GeometryFragments, feature_bytes, iter_feature_collection, normalise_geometry_text
+
+
+POINT = b'{"type":"Point","coordinates":[-3.25,55.93]}'
+
+
+def test_chunks_join_into_one_feature_collection():
+    features = [feature_bytes({'id': i, 'name': f'zone {i}'}, POINT) for i in range(500)]
+    chunks = list(iter_feature_collection(iter(features), {'total_count': 500}, chunk_size=1024))
+    assert len(chunks) > 1
+    body = json.loads(b''.join(chunks))
+    assert [f['properties']['id'] for f in body['features']] == list(range(500))
+    assert body['metadata'] == {'total_count': 500}
+
+
+def test_metadata_callable_runs_after_the_last_feature():
+    seen = []
+
+    def features():
+        for i in range(3):
+            seen.append(i)
+            yield {'type': 'Feature', 'properties': {'id': i}, 'geometry': None}
+    body = json.loads(b''.join(iter_feature_collection(features(), lambda: {'total_count': len(seen)})))
+    assert body['metadata'] == {'total_count': 3}
+
+
+def test_empty_collection_is_valid_json():
+    assert json.loads(b''.join(iter_feature_collection([]))) == {'type': 'FeatureCollection', 'features': []}
+
+
+def test_stored_geometry_text_is_spliced_verbatim():
+    text = '{"type": "Point", "coordinates": [-3.25, 55.93]}'
+    assert normalise_geometry_text(text) == text.encode('utf-8')
+    feature = json.loads(feature_bytes({'name': 'Leith – ford'}, normalise_geometry_text(text)))
+    assert feature['geometry']['coordinates'] == [-3.25, 55.93]
+    assert feature['properties']['name'] == 'Leith – ford'
+
+
+def test_rings_and_features_are_normalised_and_junk_rejected():
+    ring = [[0, 0], [1, 0], [1, 1], [0, 0]]
+    assert json.loads(normalise_geometry_text(json.dumps(ring))) == {'type': 'Polygon', 'coordinates': [ring]}
+    wrapped = {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [1, 2]}}
+    assert json.loads(normalise_geometry_text(json.dumps(wrapped))) == wrapped['geometry']
+    assert normalise_geometry_text('{"type": "Feature", "geometry": null}') is None
+    assert normalise_geometry_text('not json') is None
+    assert normalise_geometry_text('{"name": "no geometry"}') is None
+
+
+def test_fragments_parse_each_text_once():
+    fragments = GeometryFragments(max_entries=2)
+    text = POINT.decode()
+    assert fragments.get(text) is fragments.get(text)
+    assert fragments.get('oops') is None and fragments.invalid == 1
+    fragments.get('[[0,0],[1,0],[1,1],[0,0]]')
+    assert len(fragments) == 1
@@ -0,0 +1,55 @@
+from conftest import insert, square
+
+
+# the ranking query /api/greenspace_ranking ran before it was served from memory
+BASELINE_RANKING_SQL = """
+    SELECT greenspace_id, name, function_type, storage_volume_m3, is_key_greenspace
+    FROM GREENSPACE
+    WHERE storage_volume_m3 IS NOT NULL
+    ORDER BY storage_volume_m3 DESC
+    FETCH FIRST {limit} ROWS ONLY
+"""
+
+GREENSPACES = [
+    (1, 'Saughton Park and Gardens', 'Public Park', 103265.0, 1),
+    (2, 'Hailes Quarry Park', 'Public Park', 86560.0, 1),
+    (3, 'Spylaw Public Park', 'Public Park', None, 1),
+    (4, 'Colinton and Craiglockhart Dells', 'Woodland', 41855.0, 1),
+    (5, 'Baberton Golf Course', 'Golf Course', 0.0, 0),
+    (6, 'Saughton Cemetery', 'Cemetery', 13518.5, 0),
+    (7, 'Roseburn Public Park', 'Public Park', None, 0),
+    (8, 'Murray Field', 'Playing Field', 6214.0, 1),
+    (9, 'Campbell Park', 'Public Park', 250.0, 0),
+    (10, 'Oriam', 'Playing Field', 5431.0, 0),
+]
+
+
+def _load(db):
+    insert(db, 'GREENSPACE', [row + (square(-3.3 + i * 0.002, 55.9),) for i, row in enumerate(GREENSPACES)])
+
+
+def _baseline(db, limit):
+    sql = BASELINE_RANKING_SQL.format(limit=limit).replace(f'FETCH FIRST {limit} ROWS ONLY', f'LIMIT {limit}')
+    return [(gs_id, float(storage) if storage else 0) for gs_id, _, _, storage, _ in db.execute(sql)]
+
+
+def test_ranking_matches_baseline_query(db, client):
+    _load(db)
+    for limit in (3, 10, 20):
+        ranked = client.get(f'/api/greenspace_ranking?limit={limit}').get_json()
+        assert [(g['greenspace_id'], g['storage_volume_m3']) for g in ranked] == _baseline(db, limit)
+
+
+def test_ranking_leaves_out_missing_storage_under_filters(db, client):
+    _load(db)
+    ranked = client.get('/api/greenspace_ranking?limit=20&min_storage=0').get_json()
+    ids = [g['greenspace_id'] for g in ranked]
+    assert 3 not in ids and 7 not in ids
+    assert ids == [gs_id for gs_id, _ in _baseline(db, 20)]
+
+
+def test_ranking_leaves_out_greenspaces_without_geometry(db, client):
+    _load(db)
+    insert(db, 'GREENSPACE', [(11, 'No Outline', 'Public Park', 999999.0, 0, None)])
+    ranked = client.get('/api/greenspace_ranking?limit=3').get_json()
+    assert [g['greenspace_id'] for g in ranked] == [1, 2, 4]
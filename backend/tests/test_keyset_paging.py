@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import insert, square
+
+
+def _damage(db, n=23):
+    # protection values repeat, so pages have to break ties on damage_id
+    insert(db, 'FLOOD_DAMAGE', [(i, f'B{i}', 'Residential' if i % 2 else 'Commercial', 0.4,
+                                 5000.0, 1000.0, float((i % 4) * 1000), square(-3.3 + i * 0.001, 55.9))
+                                for i in range(1, n + 1)])
+
+
+def _walk(client, query):
+    pages, ids = 0, []
+    url = f'/api/flood_damage?{query}'
+    while url:
+        body = client.get(url).get_json()
+        pages += 1
+        ids.extend(f['properties']['damage_id'] for f in body['features'])
+        cursor = body['metadata']['next_cursor']
+        url = f'/api/flood_damage?{query}&cursor={cursor}' if cursor else None
+    return pages, ids
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('limit=5', list(range(1, 24))),
+    ('limit=5&order=desc', list(range(23, 0, -1))),
+    ('limit=4&sort=protection_value_pound',
+     sorted(range(1, 24), key=lambda i: (-(i % 4), -i))),
+    ('limit=3&sort=protection_value_pound&order=asc',
+     sorted(range(1, 24), key=lambda i: (i % 4, i))),
+])
+def test_pages_have_no_gaps_or_repeats(db, client, query, expected):
+    _damage(db)
+    pages, ids = _walk(client, query)
+    assert ids == expected
+    limit = int(query.split('&')[0].split('=')[1])
+    assert pages == -(-len(expected) // limit)
+
+
+def test_filters_apply_to_every_page(db, client):
+    _damage(db)
+    pages, ids = _walk(client, 'limit=4&type=Commercial')
+    assert ids == list(range(2, 24, 2))
+    assert pages == 3
+
+
+def test_fields_select_only_the_named_columns(db, client):
+    _damage(db, 3)
+    body = client.get('/api/flood_damage?fields=building_id&limit=2').get_json()
+    assert [f['properties'] for f in body['features']] == [{'building_id': 'B1'}, {'building_id': 'B2'}]
+    assert all(f['geometry'] is None for f in body['features'])
+    assert body['metadata']['fields'] == ['building_id']
+
+
+def test_cursors_are_tied_to_their_ordering(db, client, api):
+    _damage(db)
+    cursor = client.get('/api/flood_damage?limit=5').get_json()['metadata']['next_cursor']
+    assert api.decode_cursor(cursor, 'damage_id', 'asc') == [5]
+    assert api.decode_cursor(api.encode_cursor('protection_value_pound', 'desc', [3000.0, 7]),
+                             'protection_value_pound', 'desc') == [3000.0, 7]
+    resp = client.get(f'/api/flood_damage?limit=5&order=desc&cursor={cursor}')
+    assert resp.status_code == 400
+    assert client.get('/api/flood_damage?limit=5&cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/flood_damage?limit=0').status_code == 400
+    assert client.get('/api/flood_damage?fields=nope').status_code == 400
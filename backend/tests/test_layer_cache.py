@@ -0,0 +1,92 @@
+import time
+
+from werkzeug.datastructures import MultiDict
+
+from layer_cache import LayerCache
+
+
+def _cache(**kwargs):
+    kwargs.setdefault('precompress', False)
+    return LayerCache(**kwargs)
+
+
+def test_key_ignores_cache_busters_and_parameter_order():
+    a = LayerCache.make_key('/api/simd_zones', MultiDict([('min', '2'), ('_', '171'), ('max', '5')]))
+    b = LayerCache.make_key('/api/simd_zones', MultiDict([('max', '5'), ('min', ' 2 '), ('cb', 'x')]))
+    assert a == b == '/api/simd_zones?max=5&min=2'
+
+
+def test_entries_expire_after_ttl():
+    cache = _cache(ttl=1)
+    cache.put('k', 'layer', b'{}')
+    assert cache.get('k') is not None
+    cache._entries['k'].expires = time.time() - 1
+    assert cache.get('k') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_budget():
+    cache = _cache(max_bytes=10)
+    cache.put('a', 'layer', b'1234')
+    cache.put('b', 'layer', b'1234')
+    cache.get('a')
+    cache.put('c', 'layer', b'1234')
+    assert cache.peek('a') and cache.peek('c') and not cache.peek('b')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_tee_stores_the_body_before_the_last_chunk_goes_out():
+    cache = _cache()
+    released = []
+    stream = cache.tee('k', 'layer', iter([b'{"a":', b'1}']), done=lambda: released.append(True))
+    assert next(stream) == b'{"a":'
+    assert not cache.peek('k')
+    # the client has not read the last chunk yet, but waiters can already be served
+    assert next(stream) == b'1}'
+    assert cache.get('k').body == b'{"a":1}'
+    assert released
+
+
+def test_tee_gives_up_on_bodies_over_budget_and_says_so_early():
+    cache = _cache(max_bytes=4)
+    released = []
+    stream = cache.tee('k', 'layer', iter([b'123', b'456', b'789']), done=lambda: released.append(True))
+    next(stream)
+    next(stream)
+    assert released
+    assert b''.join(stream) == b'789'
+    assert not cache.peek('k')
+
+
+def test_waiters_follow_the_claim_owner():
+    cache = _cache()
+    event, owner = cache.claim('k')
+    waiting, second = cache.claim('k')
+    assert owner and not second and waiting is event
+    cache.release('k', event)
+    assert waiting.is_set()
+    assert cache.claim('k')[1]
+
+
+def test_release_leaves_a_newer_claim_alone():
+    cache = _cache()
+    old, _ = cache.claim('k')
+    cache.invalidate()
+    assert old.is_set()
+    new, owner = cache.claim('k')
+    assert owner
+    cache.release('k', old)
+    assert not new.is_set()
+    assert not cache.claim('k')[1]
+
+
+def test_cold_layer_requests_do_not_wait_on_an_unclosed_stream(api, client):
+    first = client.get('/api/study_area')
+    assert first.headers['X-Cache'] == 'MISS'
+    started = time.time()
+    second = client.get('/api/study_area')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    api.LAYER_CACHE.invalidate()
+    assert client.get('/api/study_area').headers['X-Cache'] == 'MISS'
+    assert time.time() - started < 5
@@ -0,0 +1,84 @@
+from conftest import insert, square
+from layer_versions import Snapshot, VersionStore
+
+
+FLOOD_ZONES = [
+    (1, 'High', '0.3-1.0m', 'Present day'),
+    (2, 'High', '>1.0m', 'Present day'),
+    (3, 'Medium', '<0.3m', 'Present day'),
+]
+
+
+def _load(db):
+    insert(db, 'FLOOD_ZONE', [row + (square(-3.3 + i * 0.002, 55.9),) for i, row in enumerate(FLOOD_ZONES)])
+
+
+def _ids(features):
+    return sorted(f['properties']['zone_id'] for f in features)
+
+
+def test_changes_lists_added_changed_and_removed_ids():
+    old = Snapshot([1, 2, 3], [10, 20, 30])
+    new = Snapshot([1, 2, 4], [10, 21, 40])
+    stored = dict(zip(('1', '2', '3'), old.hashes))
+    added, changed, removed = new.changes(stored)
+    assert [new.ids[i] for i in added] == [4]
+    assert [new.ids[i] for i in changed] == [2]
+    assert removed == [3]
+
+
+def test_version_depends_on_the_data_not_the_row_order():
+    assert Snapshot([1, 2], [10, 20]).version == Snapshot([2, 1], [20, 10]).version
+    assert Snapshot([1, 2], [10, 20]).version != Snapshot([1, 2], [10, 21]).version
+    # 12 and "12" are different ids
+    assert Snapshot([12], [1]).version != Snapshot(['12'], [1]).version
+
+
+def test_store_keeps_the_newest_versions(tmp_path):
+    store = VersionStore(str(tmp_path), keep=2)
+    snapshots = [Snapshot([1], [h]) for h in (1, 2, 3)]
+    for snapshot in snapshots:
+        store.save('flood_zones', snapshot)
+    assert store.load('flood_zones', snapshots[0].version) is None
+    assert store.load('flood_zones', snapshots[2].version) == {'1': 3}
+    assert store.load('flood_zones', '../../etc/passwd') is None
+
+
+def test_since_feed_after_an_update_and_a_delete(api, db, client):
+    _load(db)
+    version = client.get('/api/versions').get_json()['flood_zones']['version']
+
+    db.execute("UPDATE FLOOD_ZONE SET depth_band = '>1.0m' WHERE zone_id = 1")
+    db.execute('DELETE FROM FLOOD_ZONE WHERE zone_id = 3')
+    insert(db, 'FLOOD_ZONE', [(4, 'Low', '<0.3m', 'Present day', square(-3.2, 55.9))])
+    api.LAYER_STORE.invalidate()
+    api.LAYER_CACHE.invalidate()
+
+    feed = client.get(f'/api/flood_zones?since={version}').get_json()
+    metadata = feed['metadata']
+    assert metadata['delta'] is True
+    assert metadata['added'] == [4] and metadata['changed'] == [1] and metadata['removed'] == [3]
+    assert _ids(feed['features']) == [1, 4]
+    assert metadata['version'] != version
+
+    current = client.get(f"/api/flood_zones?since={metadata['version']}").get_json()
+    assert current['features'] == [] and current['metadata']['total_count'] == 0
+
+
+def test_unknown_version_returns_the_whole_layer(db, client):
+    _load(db)
+    feed = client.get('/api/flood_zones?since=0123456789abcdef').get_json()
+    assert feed['metadata']['delta'] is False
+    assert _ids(feed['features']) == [1, 2, 3]
+
+
+def test_versions_reports_each_layer_on_its_own(api, db, client, monkeypatch):
+    _load(db)
+
+    def missing():
+        raise FileNotFoundError('Postcode.gpkg not found')
+    monkeypatch.setitem(api.LAYER_STORE.loaders, 'postcodes', missing)
+    versions = client.get('/api/versions').get_json()
+    assert versions['postcodes'] == {'version': None, 'error': 'Postcode.gpkg not found'}
+    assert versions['flood_zones']['version'] == \
+        client.get('/api/flood_zones?sort=zone_id').get_json()['metadata']['version']
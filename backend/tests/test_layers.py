@@ -0,0 +1,66 @@
+from conftest import insert, square
+
+
+SIMD_ZONES = [
+    (1, 'S01008662', 'Balerno - 01', 9, 0.12, 6201),
+    (2, 'S01008719', 'Stenhouse - 03', 2, 0.81, 901),
+    (3, 'S01008725', 'Saughton Mains - 02', 1, 0.93, 312),
+]
+
+
+def _load(db):
+    insert(db, 'SIMD_ZONE', [row + (square(-3.3 + i * 0.002, 55.9),) for i, row in enumerate(SIMD_ZONES)])
+
+
+def test_oracle_and_memory_paths_carry_the_same_metadata(api, db, client):
+    _load(db)
+    streamed = client.get('/api/simd_zones').get_json()
+    # the stream keeps no rows; the layer is loaded on its own
+    assert not api.LAYER_STORE.is_loaded('simd_zones')
+
+    api.LAYER_STORE.get('simd_zones')
+    api.LAYER_CACHE.invalidate()
+    served = client.get('/api/simd_zones').get_json()
+    assert served['metadata'] == streamed['metadata']
+    assert served['features'] == streamed['features']
+    assert set(streamed['metadata']) >= {'total_count', 'matched_count', 'truncated', 'version', 'note'}
+
+
+def test_loaded_layer_is_not_read_from_oracle_again(api, db, client):
+    _load(db)
+    api.LAYER_STORE.get('simd_zones')
+    db.execute('DELETE FROM SIMD_ZONE')
+    db.commit()
+
+    api.LAYER_CACHE.invalidate()
+    body = client.get('/api/simd_zones').get_json()
+    assert [f['properties']['simd_zone_id'] for f in body['features']] == [1, 2, 3]
+
+
+def test_streamed_version_matches_loaded_layer(api, db, client):
+    _load(db)
+    version = client.get('/api/simd_zones').get_json()['metadata']['version']
+    assert client.get('/api/versions').get_json()['simd_zones']['version'] == version
+
+
+def test_streamed_damage_ranges_match_the_memory_path(api, db, client):
+    insert(db, 'FLOOD_DAMAGE', [
+        (1, 'B1', 'Residential', 0.4, 12000.0, 3000.0, 9000.0, square(-3.3, 55.9)),
+        (2, 'B2', 'Commercial', 1.2, 80000.0, 80000.0, 0.0, square(-3.298, 55.9)),
+        (3, 'B3', 'Residential', 0.2, 5000.0, 4500.0, 500.0, square(-3.296, 55.9)),
+    ])
+    streamed = client.get('/api/flood_damage').get_json()['metadata']
+    assert streamed['max_protection_value'] == 9000.0 and streamed['min_protection_value'] == 500.0
+
+    api.LAYER_STORE.get('flood_damage')
+    api.LAYER_CACHE.invalidate()
+    assert client.get('/api/flood_damage').get_json()['metadata'] == streamed
+
+
+def test_study_area_served_from_memory(api, client):
+    streamed = client.get('/api/study_area').get_json()
+    api.LAYER_STORE.get('study_area')
+    api.LAYER_CACHE.invalidate()
+    served = client.get('/api/study_area').get_json()
+    assert served == streamed
+    assert streamed['features'][0]['properties']['area_name'] == 'Water of Leith'
@@ -0,0 +1,82 @@
+import json
+import math
+
+import shapely
+
+from lod import LodSet, zoom_tolerance
+
+
+def _wiggle(x0, y0, x1, y1, n=200, amplitude=0.0002):
+    """Points from (x0, y0) to (x1, y1) with a small sine wobble across x in between."""
+    points = []
+    for i in range(n + 1):
+        t = i / n
+        wobble = amplitude * math.sin(t * 40) if 0 < i < n else 0
+        points.append([x0 + (x1 - x0) * t + wobble, y0 + (y1 - y0) * t])
+    return points
+
+
+def _polygon(ring):
+    return json.dumps({'type': 'Polygon', 'coordinates': [ring]}).encode()
+
+
+def _neighbours():
+    # two zones with one long wiggly shared boundary along x = -3.29
+    shared = _wiggle(-3.29, 55.90, -3.29, 55.92)
+    left = [[-3.31, 55.90]] + shared + [[-3.31, 55.92], [-3.31, 55.90]]
+    right = shared + [[-3.27, 55.92], [-3.27, 55.90], [-3.29, 55.90]]
+    return [_polygon(left), _polygon(right[::-1])]
+
+
+def _inner_vertices(shape, x_min, x_max):
+    return {(round(x, 9), round(y, 9)) for x, y in shape.exterior.coords
+            if x_min < x < x_max and 55.90 < y < 55.92}
+
+
+def test_neighbours_keep_one_shared_boundary_at_every_level():
+    lods = LodSet(_neighbours())
+    assert lods.levels
+    for level in lods.levels:
+        left, right = level.shapes
+        assert left.is_valid and right.is_valid
+        # the simplified boundary is the same vertices on both sides: no gap, no overlap
+        assert _inner_vertices(left, -3.30, -3.28) == _inner_vertices(right, -3.30, -3.28)
+        assert left.intersection(right).area < 1e-12
+        assert abs(shapely.union_all([left, right]).area - left.area - right.area) < 1e-12
+
+
+def test_levels_get_lighter_as_the_zoom_drops():
+    lods = LodSet(_neighbours())
+    counts = [level.vertex_count for level in lods.levels]
+    assert counts == sorted(counts)
+    assert counts[-1] < lods.full_vertex_count
+    for level in lods.levels:
+        assert level.tolerance == zoom_tolerance(level.zoom)
+
+
+def test_levels_that_remove_nothing_are_skipped():
+    square = _polygon([[-3.3, 55.9], [-3.29, 55.9], [-3.29, 55.91], [-3.3, 55.91], [-3.3, 55.9]])
+    lods = LodSet([square])
+    assert lods.levels == []
+    assert lods.skipped == [8, 10, 12, 14]
+    assert lods.for_zoom(8) is None
+    assert lods.report()['skipped'] == [8, 10, 12, 14]
+
+
+def test_zoom_picks_the_coarsest_level_still_within_a_pixel():
+    lods = LodSet(_neighbours())
+    zooms = [level.zoom for level in lods.levels]
+    assert lods.for_zoom(zooms[0]).zoom == zooms[0]
+    assert lods.for_zoom(zooms[-1] + 1) is None
+    skipped_below = [z for z in lods.skipped if z < zooms[0]]
+    for z in skipped_below:
+        assert lods.for_zoom(z).zoom == zooms[0]
+
+
+def test_small_features_keep_their_outline():
+    # an island far smaller than a z8 pixel would collapse; it is kept as it is
+    tiny = _polygon([[-3.25, 55.9], [-3.24999, 55.9], [-3.24999, 55.90001], [-3.25, 55.90001], [-3.25, 55.9]])
+    lods = LodSet(_neighbours() + [tiny])
+    for level in lods.levels:
+        assert level.shapes[2].is_valid
+        assert level.shapes[2].area > 0
@@ -0,0 +1,61 @@
+import pytest
+from shapely.geometry import LineString, Point, Polygon, box
+
+from mvt import (CLOSE_PATH, LINE_TO, MOVE_TO, POLYGON, _varint, _zigzag, clip_to_tile,
+                 encode_geometry, encode_layer, lonlat_to_tile, tile_bounds, tiles_covering,
+                 to_tile_coords)
+
+
+def test_protobuf_primitives():
+    assert _varint(1) == b'\x01'
+    assert _varint(300) == b'\xac\x02'
+    assert [_zigzag(n) for n in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+
+
+def test_polygon_commands_use_deltas_and_tile_winding():
+    # an exterior with negative area in tile space (y down) is written the other way round
+    kind, commands = encode_geometry(Polygon([(0, 0), (0, 10), (10, 10), (10, 0)]))
+    assert kind == POLYGON
+    assert commands == [MOVE_TO | 1 << 3, _zigzag(10), 0,
+                        LINE_TO | 3 << 3, 0, _zigzag(10), _zigzag(-10), 0, 0, _zigzag(-10),
+                        CLOSE_PATH | 1 << 3]
+    # a ring that rounds away to nothing is dropped
+    assert encode_geometry(Polygon([(0, 0), (0.2, 0), (0.2, 0.2)])) is None
+    assert encode_geometry(Point(3.4, 5.6))[1] == [MOVE_TO | 1 << 3, _zigzag(3), _zigzag(6)]
+
+
+def test_tile_maths_round_trip():
+    lon, lat = -3.27, 55.92
+    for z in (8, 12, 16):
+        x, y = lonlat_to_tile(lon, lat, z)
+        west, south, east, north = tile_bounds(z, x, y)
+        assert west <= lon < east and south <= lat < north
+    tiles = list(tiles_covering((-3.32, 55.88, -3.2, 55.95), 12))
+    assert len(tiles) == len(set(tiles)) > 1
+    assert lonlat_to_tile(-3.27, 55.92, 12) in tiles
+
+
+def test_layer_round_trips_through_a_decoder():
+    mapbox_vector_tile = pytest.importorskip('mapbox_vector_tile')
+    z, x, y = 14, *lonlat_to_tile(-3.27, 55.92, 14)
+    west, south, east, north = tile_bounds(z, x, y)
+    inside = box(west + (east - west) * 0.25, south + (north - south) * 0.25,
+                 west + (east - west) * 0.75, north - (north - south) * 0.25)
+    overhanging = box(west - 1, south - 1, east + 1, (south + north) / 2)
+    geoms = clip_to_tile(to_tile_coords([inside, overhanging, LineString([(west, south), (east, north)])], z, x, y))
+    data = encode_layer('flood_zones', [
+        (1, {'probability': 'High', 'depth': 0.5, 'count': 3, 'flag': True}, geoms[0]),
+        (2, {'probability': 'High', 'note': None}, geoms[1]),
+        (None, {}, geoms[2]),
+    ])
+    layer = mapbox_vector_tile.decode(data, default_options={'y_coord_down': True})['flood_zones']
+    assert layer['extent'] == 4096
+    first, second, third = layer['features']
+    assert first['id'] == 1 and first['properties'] == {'probability': 'High', 'depth': 0.5, 'count': 3, 'flag': True}
+    assert first['geometry']['type'] == 'Polygon'
+    assert Polygon(first['geometry']['coordinates'][0]).bounds == (1024, 1024, 3072, 3072)
+    # clipped to the tile plus its buffer
+    assert Polygon(second['geometry']['coordinates'][0]).bounds == (-64, 2048, 4160, 4160)
+    assert second['properties'] == {'probability': 'High'}
+    assert third['geometry']['type'] == 'LineString'
+    assert encode_layer('empty', [(1, {}, None)]) == b''
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+from shapely.geometry import Point, shape
+
+from conftest import square
+from layer_store import LayerData
+from point_locator import PointLocator, distance_to_edges_m
+
+
+def _layer():
+    donut = json.dumps({'type': 'Polygon', 'coordinates': [
+        [[-3.30, 55.90], [-3.26, 55.90], [-3.26, 55.92], [-3.30, 55.92], [-3.30, 55.90]],
+        [[-3.29, 55.905], [-3.27, 55.905], [-3.27, 55.915], [-3.29, 55.915], [-3.29, 55.905]],
+    ]})
+    overlapping = square(-3.275, 55.91, 0.02)
+    line = json.dumps({'type': 'LineString', 'coordinates': [[-3.3, 55.9], [-3.2, 55.95]]})
+    geometries = [donut, overlapping, line]
+    return LayerData('zones', [{'id': i} for i in range(3)], geometries)
+
+
+def test_containment_matches_shapely():
+    layer = _layer()
+    locator = PointLocator(layer)
+    rng = np.random.default_rng(5)
+    xs = rng.uniform(-3.31, -3.25, 500)
+    ys = rng.uniform(55.895, 55.935, 500)
+    shapes = [shape(json.loads(g)) for g in layer.geometries[:2]]
+    expected = [[row for row, s in enumerate(shapes) if s.contains(Point(x, y))] for x, y in zip(xs, ys)]
+    assert locator.containing(xs, ys) == expected
+
+    points, rows = locator.pairs(xs, ys)
+    assert sorted(zip(points.tolist(), rows.tolist())) == sorted(
+        (p, row) for p, found in enumerate(expected) for row in found)
+
+
+def test_the_hole_is_outside():
+    locator = PointLocator(_layer())
+    assert locator.containing([-3.28, -3.295], [55.91, 55.91]) == [[], [0]]
+
+
+def test_distances_are_zero_inside_and_metres_outside():
+    layer = _layer()
+    locator = PointLocator(layer)
+    # 0.01 degrees of latitude south of the donut, and inside it
+    d = locator.distances_m([0, 1], [-3.28, -3.295], [55.89, 55.91])
+    assert abs(d[0, 0] - 1111.95) < 1
+    assert d[1, 0] == 0
+    assert np.isinf(locator.distances_m([2], [-3.28], [55.89])).all()
+    edges = locator.edges[0]
+    # a point in the hole is nearest the hole's edge
+    assert abs(distance_to_edges_m(np.array([-3.28]), np.array([55.912]), edges)[0] - 333.6) < 1
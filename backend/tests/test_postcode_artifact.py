@@ -0,0 +1,66 @@
+import gzip
+import json
+
+import pytest
+
+from postcode_artifact import PostcodeArtifact, compile_postcodes, write_artifact
+
+
+@pytest.fixture
+def gpkg(tmp_path):
+    gpd = pytest.importorskip('geopandas')
+    from shapely.geometry import box
+
+    # British National Grid, around Balerno
+    frame = gpd.GeoDataFrame({
+        'Postcode': ['EH14 7AA', 'EH14 7AB', 'EH14 7AD'],
+        'District': ['EH14'] * 3,
+        'Sector': ['EH14 7'] * 3,
+        'affected_count': [2, 0, 5],
+        'total_damage': [1200.5, 0.0, 9000.0],
+        'unused': ['x', 'y', 'z'],
+    }, geometry=[box(316000 + i * 100, 666000, 316090 + i * 100, 666090) for i in range(3)], crs='EPSG:27700')
+    path = tmp_path / 'Postcode.gpkg'
+    frame.to_file(path, layer='postcode', driver='GPKG')
+    return path
+
+
+def test_compiled_sections(gpkg, tmp_path):
+    path = tmp_path / 'Postcode.artifact'
+    write_artifact(compile_postcodes(str(gpkg)), str(path))
+    artifact = PostcodeArtifact.open(str(path))
+    assert artifact.count == 3
+    assert not artifact.is_stale(str(gpkg))
+
+    everything = json.loads(bytes(artifact.section('all')))
+    assert [f['properties']['Postcode'] for f in everything['features']] == ['EH14 7AA', 'EH14 7AB', 'EH14 7AD']
+    assert 'unused' not in everything['features'][0]['properties']
+    # reprojected to lon / lat
+    lon, lat = everything['features'][0]['geometry']['coordinates'][0][0]
+    assert -3.4 < lon < -3.3 and 55.8 < lat < 55.95
+
+    affected = json.loads(b''.join(artifact.iter_section('affected', chunk_size=64)))
+    assert [f['properties']['Postcode'] for f in affected['features']] == ['EH14 7AA', 'EH14 7AD']
+    unaffected = json.loads(bytes(artifact.section('unaffected')))
+    assert [f['properties']['Postcode'] for f in unaffected['features']] == ['EH14 7AB']
+    assert gzip.decompress(bytes(artifact.section(artifact.variants('all')['gzip']))) == bytes(artifact.section('all'))
+
+
+def test_rows_come_back_from_the_columns(gpkg):
+    artifact = PostcodeArtifact(compile_postcodes(str(gpkg)))
+    features = json.loads(bytes(artifact.section('all')))['features']
+    for row, feature in enumerate(features):
+        assert json.loads(artifact.geometry_bytes(row)) == feature['geometry']
+        assert artifact.properties_list()[row] == feature['properties']
+        minx, miny, maxx, maxy = artifact.envelope(row)
+        xs = [p[0] for p in feature['geometry']['coordinates'][0]]
+        assert (minx, maxx) == (min(xs), max(xs))
+
+
+def test_stale_and_foreign_files(gpkg):
+    data = compile_postcodes(str(gpkg))
+    artifact = PostcodeArtifact(data)
+    gpkg.write_bytes(gpkg.read_bytes() + b'\0')
+    assert artifact.is_stale(str(gpkg))
+    with pytest.raises(ValueError):
+        PostcodeArtifact(b'NOTANARTIFACT' + data)
@@ -0,0 +1,60 @@
+import random
+
+from postcode_index import PostcodeIndex, normalise_postcode
+
+
+POSTCODES = [
+    ('EH11 1AA', 'EH11', 'EH11 1', 4), ('EH1 1AB', 'EH1', 'EH1 1', 0), ('EH10 5QT', 'EH10', 'EH10 5', 9),
+    ('EH9 2AA', 'EH9', 'EH9 2', 1), ('EH1 2CD', 'EH1', 'EH1 2', 7), ('EH11 1AB', 'EH11', 'EH11 1', 2),
+    ('EH14 3XY', 'EH14', 'EH14 3', 0), ('EH1 1AA', 'EH1', 'EH1 1', 3),
+]
+
+
+def _index(rows=POSTCODES):
+    return PostcodeIndex([{'Postcode': pc, 'District': d, 'Sector': s, 'affected_count': n}
+                          for pc, d, s, n in rows])
+
+
+def _codes(index, rows):
+    return [index.display[i] for i in rows]
+
+
+def test_exact_lookup_ignores_case_and_spacing():
+    index = _index()
+    assert normalise_postcode(' eh1  1ab ') == 'EH11AB'
+    assert index.display[index.get('eh11ab')] == 'EH1 1AB'
+    assert index.get('EH99 9ZZ') is None
+    assert len(index) == len(POSTCODES)
+
+
+def test_prefixes_rank_in_natural_order_or_by_affected_count():
+    index = _index()
+    assert _codes(index, index.suggest('EH1', limit=20)) == [
+        'EH1 1AA', 'EH1 1AB', 'EH1 2CD', 'EH10 5QT', 'EH11 1AA', 'EH11 1AB', 'EH14 3XY']
+    assert _codes(index, index.suggest('EH1', limit=2, weighted=True)) == ['EH10 5QT', 'EH1 2CD']
+    assert _codes(index, index.suggest('E', limit=1)) == ['EH1 1AA']
+
+
+def test_a_space_separates_the_district():
+    index = _index()
+    assert _codes(index, index.suggest('EH1 1')) == ['EH1 1AA', 'EH1 1AB']
+    # without the space "EH11" could be either
+    assert _codes(index, index.suggest('EH11')) == ['EH1 1AA', 'EH1 1AB', 'EH11 1AA', 'EH11 1AB']
+    assert index.suggest('') == []
+    assert index.display[index.lookup('EH14')] == 'EH14 3XY'
+    assert index.lookup('G1') is None
+
+
+def test_precomputed_prefixes_match_a_scan():
+    rng = random.Random(3)
+    rows = []
+    for _ in range(400):
+        district = f'EH{rng.randint(1, 55)}'
+        sector = rng.randint(1, 9)
+        pc = f'{district} {sector}{rng.choice("ABDEFG")}{rng.choice("JLNPQR")}'
+        rows.append((pc, district, f'{district} {sector}', rng.randint(0, 50)))
+    index = _index(rows)
+    for prefix in ('E', 'EH', 'EH1', 'EH2', 'EH55'):
+        for weighted in (False, True):
+            matches = [i for i, key in enumerate(normalise_postcode(r[0]) for r in rows) if key.startswith(prefix)]
+            assert index.suggest(prefix, limit=10, weighted=weighted) == index._rank(matches, 10, weighted)
@@ -0,0 +1,43 @@
+from conftest import SqliteConnection, insert, square
+from data_access import fetch_all
+from query_builder import Query, like_contains
+
+
+def test_clauses_and_shape():
+    query = (Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE')
+             .where('min', 'protection_value_pound >= :min_value', min_value=10.0)
+             .where('type', 'building_category = :t', t='Residential')
+             .order_by('damage_id')
+             .fetch_first(5))
+    assert query.shape == 'damage[min,type,limit]'
+    assert query.sql == ('SELECT damage_id FROM FLOOD_DAMAGE WHERE protection_value_pound >= :min_value'
+                         ' AND building_category = :t ORDER BY damage_id FETCH FIRST :row_limit ROWS ONLY')
+    assert query.binds == {'min_value': 10.0, 't': 'Residential', 'row_limit': 5}
+    assert Query('damage', 'SELECT 1 FROM dual').shape == 'damage'
+
+
+def test_an_existing_where_is_extended():
+    query = Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE WHERE geom_json IS NOT NULL\n')
+    query.where('after', 'damage_id > :after_id', after_id=3)
+    assert query.sql == 'SELECT damage_id FROM FLOOD_DAMAGE WHERE geom_json IS NOT NULL AND damage_id > :after_id'
+
+
+def test_like_values_match_literally(db):
+    insert(db, 'FLOOD_DAMAGE', [
+        (1, 'B1', 'Retail_100%', 0.1, 0, 0, 0, square(-3.3, 55.9)),
+        (2, 'B2', 'Retail 1000', 0.1, 0, 0, 0, square(-3.3, 55.9)),
+    ])
+    assert like_contains('a_b%c\\') == '%a\\_b\\%c\\\\%'
+    for value, expected in (('_100%', [(1,)]), ('retail', [(1,), (2,)]), ('1000', [(2,)])):
+        query = Query('damage', 'SELECT damage_id FROM FLOOD_DAMAGE').where(
+            'type', "LOWER(building_category) LIKE :t ESCAPE '\\'", t=like_contains(value.lower()))
+        assert fetch_all(SqliteConnection(db), query.order_by('damage_id')) == expected
+
+
+def test_filter_values_share_one_shape(api, db, client):
+    insert(db, 'FLOOD_DAMAGE', [(1, 'B1', 'Residential', 0.1, 0, 0, 500.0, square(-3.3, 55.9))])
+    api.QUERY_STATS.reset()
+    for value in ('100', '200', '300'):
+        assert client.get(f'/api/flood_damage?limit=10&min_value={value}').status_code == 200
+    shapes = api.QUERY_STATS.snapshot()
+    assert shapes['flood_damage_page[min,limit]']['executions'] == 3
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from scenario import ScenarioModel, scenario_key
+
+
+def _model():
+    categories = ['Residential', 'Retail', 'Residential', 'Office', None]
+    depth = np.array([0.8, 1.2, 0.2, 0.5, 0.0])
+    damage = np.array([30000.0, 55000.0, 8000.0, 12000.0, 0.0])
+    protected = np.array([21000.0, 40000.0, 8000.0, 6000.0, 0.0])
+    # building 2 has no greenspace to credit
+    greenspace = np.array([0, 1, -1, 0, 1])
+    return ScenarioModel(categories, depth, damage, protected, greenspace, 2)
+
+
+def test_unit_multipliers_reproduce_the_table():
+    result = _model().run({})
+    assert result['total_damage_2024'] == pytest.approx(105000)
+    assert result['total_damage_protected'] == pytest.approx(75000)
+    assert result['total_protection_value'] == pytest.approx(30000)
+    by_name = {c[0]: c[1:] for c in result['categories']}
+    assert by_name['Residential'] == (2, pytest.approx(38000), pytest.approx(9000))
+    assert by_name[None] == (1, 0.0, 0.0)
+    assert result['greenspaces'] == [(2, pytest.approx(15000)), (2, pytest.approx(15000))]
+
+
+def test_more_storage_protects_more_and_none_protects_nothing():
+    model = _model()
+    base = model.run({})['greenspaces']
+    doubled = model.run({0: 2.0})
+    assert doubled['greenspaces'][0][1] > base[0][1]
+    assert doubled['greenspaces'][1][1] == pytest.approx(base[1][1])
+    removed = model.run({0: 0.0, 1: 0.0})
+    # without storage every modelled building is back to its 2024 damage
+    assert removed['total_protection_value'] == pytest.approx(0.0)
+    assert removed['max_flood_depth_m'] == pytest.approx(1.2)
+
+
+def test_scenarios_are_keyed_canonically_and_memoised():
+    assert scenario_key({'1': 2, 0: 1.0}) == scenario_key({1: 2.0004})
+    assert scenario_key({})[1] != scenario_key({1: 2})[1]
+    model = _model()
+    first = model.run({1: 1.5, 0: 1})
+    assert model.run({1: 1.5}) is first
+    assert first['multipliers'] == {1: 1.5}
@@ -0,0 +1,72 @@
+import base64
+import json
+import os
+import struct
+
+import numpy as np
+
+from scene_packer import (ALIGN, MAGIC, is_stale, lod_steps, pack_model, packed_path,
+                          quantise, read_manifest)
+
+
+def _scene_js(model_dir, width=17, height=17):
+    heights = [round(10 + 0.5 * x + 0.25 * y, 3) for y in range(height) for x in range(width)]
+    png = b'\x89PNG\r\n\x1a\n' + b'\0' * 64
+    scene = {'layers': [{'id': 0, 'properties': {}, 'data': [{
+        'block': 0,
+        'grid': {'width': width, 'height': height, 'array': heights},
+        'materials': [{'mtlIndex': 0, 'image': {
+            'base64': 'data:image/png;base64,' + base64.b64encode(png).decode()}}],
+    }]}]}
+    index_dir = os.path.join(model_dir, 'data', 'index')
+    os.makedirs(index_dir)
+    with open(os.path.join(index_dir, 'scene.js'), 'w') as f:
+        f.write(f'app.loadJSONObject({json.dumps(scene)});\n')
+    return np.array(heights).reshape(height, width), png
+
+
+def _buffer(path, manifest, index):
+    with open(path, 'rb') as f:
+        data = f.read()
+    (n,) = struct.unpack('<I', data[len(MAGIC):len(MAGIC) + 4])
+    start = len(MAGIC) + 4 + n
+    entry = manifest['buffers'][index]
+    return np.frombuffer(data, dtype='<u2', count=entry['length'] // 2, offset=start + entry['offset'])
+
+
+def test_quantise_round_trips_within_half_a_step():
+    values = np.array([1.5, 2.25, np.nan, 7.0])
+    q, lo, step = quantise(values)
+    restored = lo + q * step
+    assert abs(restored[[0, 1, 3]] - values[[0, 1, 3]]).max() <= step / 2 + 1e-12
+    assert restored[2] == lo
+    assert quantise([3.0, 3.0])[2] == 0.0
+
+
+def test_lod_steps_divide_the_grid_and_skip_tiny_levels():
+    assert lod_steps(17, 17) == [2]
+    assert lod_steps(65, 65) == [8, 2]
+    assert lod_steps(66, 65) == []
+
+
+def test_pack_model_writes_coarse_levels_first(tmp_path):
+    model = tmp_path / 'Campbell Park'
+    heights, png = _scene_js(str(model))
+    assert is_stale(str(model))
+    path = pack_model(str(model))
+    assert path == packed_path(str(model)) and not is_stale(str(model))
+
+    manifest = read_manifest(path)
+    packed = manifest['scene']['layers'][0]['data'][0]['grid']['packed']
+    assert [(lvl['width'], lvl['height']) for lvl in packed['levels']] == [(9, 9), (17, 17)]
+    assert [lvl['buffer'] for lvl in packed['levels']] == [0, 1]
+    assert all(b['offset'] % ALIGN == 0 for b in manifest['buffers'])
+
+    full = _buffer(path, manifest, 1).reshape(17, 17) * packed['step'] + packed['min']
+    assert abs(full - heights).max() <= packed['step'] / 2 + 1e-9
+    coarse = _buffer(path, manifest, 0).reshape(9, 9) * packed['step'] + packed['min']
+    assert abs(coarse - heights[::2, ::2]).max() <= packed['step'] / 2 + 1e-9
+
+    texture = manifest['textures'][0]
+    assert texture['bytes'] == len(png)
+    assert (model / 'data' / 'index' / os.path.basename(texture['url'])).read_bytes() == png
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from spatial_index import STRTree, geometry_envelope, parse_bbox
+
+
+def _intersects(e, bbox):
+    return e[0] <= bbox[2] and e[2] >= bbox[0] and e[1] <= bbox[3] and e[3] >= bbox[1]
+
+
+def test_query_matches_a_brute_force_scan():
+    rng = random.Random(7)
+    envelopes = []
+    for _ in range(2000):
+        x, y = rng.uniform(-3.4, -3.1), rng.uniform(55.85, 55.98)
+        envelopes.append((x, y, x + rng.uniform(0, 0.01), y + rng.uniform(0, 0.01)))
+    envelopes[10] = None
+    tree = STRTree(envelopes, node_capacity=8)
+    assert tree.size == 1999 and tree.height > 1
+    for _ in range(200):
+        x, y = rng.uniform(-3.45, -3.1), rng.uniform(55.8, 56.0)
+        bbox = (x, y, x + rng.uniform(0, 0.1), y + rng.uniform(0, 0.05))
+        expected = [i for i, e in enumerate(envelopes) if e and _intersects(e, bbox)]
+        assert tree.query(bbox) == expected
+
+
+def test_empty_and_small_trees():
+    assert STRTree([]).query((0, 0, 1, 1)) == []
+    assert STRTree([]).bounds is None
+    tree = STRTree([(0, 0, 1, 1), (2, 2, 3, 3)])
+    assert tree.bounds == (0, 0, 3, 3)
+    # touching edges count as an intersection
+    assert tree.query((1, 1, 2, 2)) == [0, 1]
+
+
+def test_geometry_envelope():
+    assert geometry_envelope({'type': 'Point', 'coordinates': [1, 2]}) == (1, 2, 1, 2)
+    polygon = {'type': 'Polygon', 'coordinates': [[[0, 0], [4, 1], [2, 5], [0, 0]]]}
+    assert geometry_envelope(polygon) == (0, 0, 4, 5)
+    collection = {'type': 'GeometryCollection',
+                  'geometries': [polygon, {'type': 'Point', 'coordinates': [-1, 3]}]}
+    assert geometry_envelope(collection) == (-1, 0, 4, 5)
+    assert geometry_envelope(None) is None
+    assert geometry_envelope({'type': 'Polygon', 'coordinates': []}) is None
+
+
+@pytest.mark.parametrize('value', ['1,2,3', '1,2,a,4', '3,0,1,1', '0,0,nan,1'])
+def test_parse_bbox_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
@@ -0,0 +1,69 @@
+import os
+
+from static_manifest import StaticManifest
+
+
+def _site(root):
+    for model in ('a', 'b'):
+        folder = root / '3d_models' / model
+        (folder / 'threejs').mkdir(parents=True)
+        (folder / 'threejs' / 'three.min.js').write_text('var THREE = {};\n')
+        (folder / 'Qgis2threejs.css').write_text(f'/* {model} */ body {{}}\n')
+        (folder / 'index.html').write_text(
+            '<html><head>\n'
+            '<link rel="stylesheet" href="./Qgis2threejs.css">\n'
+            '<script src="./threejs/three.min.js"></script>\n'
+            '<!-- <script src="./threejs/three.min.js"></script> -->\n'
+            '<script>var path = "./threejs/three.min.js"; load(\'./Qgis2threejs.css\');</script>\n'
+            '</head><body>\n'
+            '<p title="./threejs/three.min.js">./threejs/three.min.js</p>\n'
+            '<a href="https://threejs.org/">three.js</a> <a href="../b/index.html">b</a>\n'
+            '</body></html>\n')
+
+
+def test_identical_files_share_one_hash(tmp_path):
+    _site(tmp_path)
+    manifest = StaticManifest(str(tmp_path))
+    a = manifest.files['3d_models/a/threejs/three.min.js'][0]
+    b = manifest.files['3d_models/b/threejs/three.min.js'][0]
+    assert a == b
+    assert manifest.files['3d_models/a/Qgis2threejs.css'][0] != manifest.files['3d_models/b/Qgis2threejs.css'][0]
+    stats = manifest.stats()
+    # three.js and the (identical) pages are stored once
+    page = (tmp_path / '3d_models' / 'a' / 'index.html').stat().st_size
+    assert stats['files'] == 6 and stats['unique'] == 4
+    assert stats['deduplicated_bytes'] == len('var THREE = {};\n') + page
+
+
+def test_only_src_and_href_attributes_are_rewritten(tmp_path):
+    _site(tmp_path)
+    manifest = StaticManifest(str(tmp_path))
+    three = manifest.files['3d_models/a/threejs/three.min.js'][0]
+    css = manifest.files['3d_models/a/Qgis2threejs.css'][0]
+    page = manifest.page('3d_models/a/index.html').decode()
+
+    assert f'<script src="../../assets/{three}/three.min.js"></script>' in page
+    assert f'href="../../assets/{css}/Qgis2threejs.css"' in page
+    # script bodies, comments, other attributes and text are left as they are
+    assert '<!-- <script src="./threejs/three.min.js"></script> -->' in page
+    assert '<script>var path = "./threejs/three.min.js"; load(\'./Qgis2threejs.css\');</script>' in page
+    assert '<p title="./threejs/three.min.js">./threejs/three.min.js</p>' in page
+    # external links and other pages are not assets
+    assert 'href="https://threejs.org/"' in page
+    assert 'href="../b/index.html"' in page
+
+
+def test_edited_files_rebuild_before_being_served(tmp_path):
+    _site(tmp_path)
+    manifest = StaticManifest(str(tmp_path))
+    css = tmp_path / '3d_models' / 'a' / 'Qgis2threejs.css'
+    old = manifest.files['3d_models/a/Qgis2threejs.css'][0]
+    assert manifest.resolve(old) == str(css)
+
+    css.write_text('body { color: teal; }\n')
+    stat = os.stat(css)
+    os.utime(css, (stat.st_atime, stat.st_mtime + 10))
+    assert manifest.resolve(old) is None
+    new = manifest.files['3d_models/a/Qgis2threejs.css'][0]
+    assert new != old and manifest.resolve(new) == str(css)
+    assert new in manifest.page('3d_models/a/index.html').decode()
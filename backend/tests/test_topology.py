@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from shapely.geometry import shape
+
+from topology import Topology, parse_precision, round_fragment
+
+
+def _polygon(*rings):
+    return json.dumps({'type': 'Polygon', 'coordinates': [list(r) for r in rings]})
+
+
+LEFT = [[-3.3, 55.9], [-3.29, 55.9], [-3.29, 55.905], [-3.29, 55.91], [-3.3, 55.91], [-3.3, 55.9]]
+RIGHT = [[-3.29, 55.9], [-3.28, 55.9], [-3.28, 55.91], [-3.29, 55.91], [-3.29, 55.905], [-3.29, 55.9]]
+ISLAND = [[-3.25, 55.95], [-3.249, 55.95], [-3.249, 55.951], [-3.25, 55.95]]
+
+
+def _same(geometry, fragment):
+    a, b = shape(geometry), shape(json.loads(fragment))
+    return a.symmetric_difference(b).area < 1e-12 and abs(a.area - b.area) < 1e-12
+
+
+def _arc_ids(rings):
+    return {a if a >= 0 else ~a for ring in rings for a in ring}
+
+
+def _decode(data):
+    """GeoJSON geometries back out of TopoJSON bytes."""
+    topo = json.loads(data)
+    sx, sy = topo['transform']['scale']
+    tx, ty = topo['transform']['translate']
+    arcs = []
+    for arc in topo['arcs']:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x, y = x + dx, y + dy
+            points.append([x * sx + tx, y * sy + ty])
+        arcs.append(points)
+
+    def ring(indexes):
+        points = []
+        for i in indexes:
+            part = arcs[i] if i >= 0 else arcs[~i][::-1]
+            points.extend(part[1:] if points else part)
+        return points
+
+    (collection,) = topo['objects'].values()
+    out = []
+    for g in collection['geometries']:
+        assert g['type'] == 'Polygon'
+        out.append(({'type': 'Polygon', 'coordinates': [ring(r) for r in g['arcs']]}, g['properties']))
+    return topo, out
+
+
+def test_round_trip_keeps_every_shape():
+    geometries = [_polygon(LEFT), _polygon(RIGHT), _polygon(ISLAND)]
+    topology = Topology(geometries, 6)
+    topo, decoded = _decode(topology.encode('zones', range(3), [{'id': i} for i in range(3)]))
+    assert [p for _, p in decoded] == [{'id': 0}, {'id': 1}, {'id': 2}]
+    for original, (geometry, _) in zip(geometries, decoded):
+        assert _same(geometry, original)
+
+
+def test_shared_boundaries_are_stored_once():
+    topology = Topology([_polygon(LEFT), _polygon(RIGHT)], 6)
+    left, right = topology.geometries
+    shared = _arc_ids(left['arcs']) & _arc_ids(right['arcs'])
+    assert len(shared) == 1
+    (arc,) = shared
+    # the middle vertex of the shared edge is kept in the one arc, used in opposite directions
+    assert len(topology.arcs[arc]) == 3
+    assert (arc in left['arcs'][0]) != (arc in right['arcs'][0])
+    assert topology.report()['arcs'] == 3
+    assert topology.point_count < len(LEFT) + len(RIGHT)
+
+
+def test_subsets_carry_only_their_arcs():
+    topology = Topology([_polygon(LEFT), _polygon(RIGHT), _polygon(ISLAND)], 6)
+    topo, decoded = _decode(topology.encode('zones', [2], [{'id': 2}], metadata={'count': 1}))
+    assert len(topo['arcs']) == 1
+    assert topo['metadata'] == {'count': 1}
+    assert _same(decoded[0][0], _polygon(ISLAND))
+
+
+def test_precision():
+    assert parse_precision('4') == 4
+    for bad in ('-1', '11', 'x', None):
+        with pytest.raises(ValueError):
+            parse_precision(bad)
+    rounded = json.loads(round_fragment(_polygon([[-3.123456, 55.987654], [0, 0], [1, 1], [-3.123456, 55.987654]]), 3))
+    assert rounded['coordinates'][0][0] == [-3.123, 55.988]
@@ -0,0 +1,33 @@
+import threading
+
+from conftest import insert, square
+
+
+def test_importing_the_app_does_not_start_warm_up(api):
+    assert not any(t.name == 'warm-up' for t in threading.enumerate())
+
+
+def test_warm_up_reads_each_layer_once_and_caches_its_response(api, db, client):
+    insert(db, 'SIMD_ZONE', [(1, 'S01008662', 'Balerno - 01', 9, 0.12, 6201, square(-3.3, 55.9))])
+    assert api.warm_layers(['simd_zones']) is True
+    assert api.WARM_STATUS['simd_zones']['state'] == 'warm'
+    assert api._ORACLE_POOL.acquired == 1
+    assert api.LAYER_CACHE.peek('/api/simd_zones')
+
+    resp = client.get('/api/simd_zones')
+    assert resp.headers['X-Cache'] == 'HIT'
+    assert resp.get_json()['features'][0]['properties']['simd_zone_id'] == 1
+    assert api._ORACLE_POOL.acquired == 1
+
+
+def test_warm_up_leaves_a_cached_response_alone(api, client):
+    first = client.get('/api/study_area').data
+    api.warm_layers(['study_area'])
+    assert api.LAYER_CACHE.get('/api/study_area').body == first
+
+
+def test_warm_up_errors_are_reported_per_layer(api, db):
+    db.execute('DROP TABLE FLOOD_ZONE')
+    api.warm_layers(['flood_zones', 'study_area'])
+    assert api.WARM_STATUS['flood_zones']['state'] == 'error'
+    assert api.WARM_STATUS['study_area']['state'] == 'warm'
@@ -0,0 +1,304 @@
+"""
+Water of Leith WebMap - TopoJSON
+Polygon layers that tile an area (SIMD data zones, postcodes, flood zones)
+repeat every shared boundary in GeoJSON, once per side, at full float
+precision. A Topology snaps a layer onto an integer grid, cuts its rings into
+arcs at the junctions where boundaries meet or part, stores each distinct arc
+once and writes them delta-encoded, as quantised TopoJSON.
+2025
+"""
+
+import json
+
+from geojson_stream import dumps
+
+
+DEFAULT_PRECISION = 6
+MAX_PRECISION = 10
+
+
+def parse_precision(value):
+    """Decimal places for precision=; raises ValueError outside 0..MAX_PRECISION."""
+    try:
+        digits = int(value)
+    except (TypeError, ValueError):
+        digits = -1
+    if not 0 <= digits <= MAX_PRECISION:
+        raise ValueError(f'precision must be between 0 and {MAX_PRECISION}')
+    return digits
+
+
+# ------------------------------------------------------------
+# rounded GeoJSON
+# ------------------------------------------------------------
+def _round_coords(c, digits):
+    if c and isinstance(c[0], (int, float)):
+        return [round(v, digits) for v in c]
+    return [_round_coords(p, digits) for p in c]
+
+
+def round_geometry(geometry, digits):
+    """GeoJSON geometry dict with every coordinate rounded to `digits` decimal places."""
+    if geometry.get('type') == 'GeometryCollection':
+        return {'type': 'GeometryCollection',
+                'geometries': [round_geometry(g, digits) for g in geometry.get('geometries') or []]}
+    out = dict(geometry)
+    out['coordinates'] = _round_coords(geometry.get('coordinates') or [], digits)
+    return out
+
+
+def round_fragment(fragment, digits):
+    """Rounded copy of a serialized geometry fragment (see geojson_stream.feature_bytes)."""
+    return dumps(round_geometry(json.loads(fragment), digits))
+
+
+# ------------------------------------------------------------
+# topology
+# ------------------------------------------------------------
+class Topology:
+    """Shared-arc topology of a list of serialized GeoJSON geometries, quantised to
+    `digits` decimal places. Build once per layer; `encode` writes any subset of rows."""
+
+    def __init__(self, geometries, digits=DEFAULT_PRECISION):
+        self.digits = digits
+        self.k = 10 ** digits
+        parsed = [json.loads(g) for g in geometries]
+        self.bbox = self._bbox(parsed)
+        self.x0 = self.bbox[0] if self.bbox else 0.0
+        self.y0 = self.bbox[1] if self.bbox else 0.0
+
+        # pass 1: quantise, and find the junctions where boundaries meet or part
+        self._lines = []
+        self._rings = []
+        shapes = [self._quantise(g) for g in parsed]
+        self._junctions = self._find_junctions()
+
+        # pass 2: cut at the junctions and keep one copy of each arc
+        self.arcs = []
+        self._arc_ids = {}
+        self.geometries = [self._cut(s) for s in shapes]
+        self.point_count = sum(len(a) for a in self.arcs)
+        del self._lines, self._rings, self._junctions, self._arc_ids
+
+    @staticmethod
+    def _bbox(parsed):
+        minx = miny = float('inf')
+        maxx = maxy = float('-inf')
+        stack = [g for g in parsed if g]
+        while stack:
+            g = stack.pop()
+            if isinstance(g, dict):
+                stack.extend(g.get('geometries') or [])
+                if g.get('coordinates') is not None:
+                    stack.append(g['coordinates'])
+            elif g and isinstance(g[0], (int, float)):
+                minx, maxx = min(minx, g[0]), max(maxx, g[0])
+                miny, maxy = min(miny, g[1]), max(maxy, g[1])
+            elif g:
+                stack.extend(g)
+        return None if minx == float('inf') else [minx, miny, maxx, maxy]
+
+    def _point(self, c):
+        return (round((c[0] - self.x0) * self.k), round((c[1] - self.y0) * self.k))
+
+    def _sequence(self, coords, closed):
+        out = []
+        for c in coords:
+            p = self._point(c)
+            if not out or out[-1] != p:
+                out.append(p)
+        if closed:
+            if len(out) > 1 and out[0] == out[-1]:
+                out.pop()
+            self._rings.append(out)
+        else:
+            if len(out) == 1:
+                out.append(out[0])
+            self._lines.append(out)
+        return out
+
+    def _quantise(self, g):
+        """Geometry with its lines and rings as lists of grid points (registered for pass 1)."""
+        if not g:
+            return None
+        kind = g.get('type')
+        c = g.get('coordinates')
+        if kind == 'GeometryCollection':
+            return (kind, [self._quantise(child) for child in g.get('geometries') or []])
+        if kind == 'Point':
+            return (kind, self._point(c))
+        if kind == 'MultiPoint':
+            return (kind, [self._point(p) for p in c])
+        if kind == 'LineString':
+            return (kind, self._sequence(c, False))
+        if kind == 'MultiLineString':
+            return (kind, [self._sequence(line, False) for line in c])
+        if kind == 'Polygon':
+            return (kind, [self._sequence(ring, True) for ring in c])
+        if kind == 'MultiPolygon':
+            return (kind, [[self._sequence(ring, True) for ring in poly] for poly in c])
+        return None
+
+    def _find_junctions(self):
+        # a point is a junction when it is seen with two different pairs of neighbours
+        # (two boundaries meet there) or it ends a line
+        neighbours = {}
+        junctions = set()
+
+        def visit(p, a, b):
+            pair = (a, b) if a <= b else (b, a)
+            seen = neighbours.setdefault(p, pair)
+            if seen != pair:
+                junctions.add(p)
+
+        for line in self._lines:
+            junctions.add(line[0])
+            junctions.add(line[-1])
+            for i in range(1, len(line) - 1):
+                visit(line[i], line[i - 1], line[i + 1])
+        for ring in self._rings:
+            n = len(ring)
+            for i in range(n):
+                visit(ring[i], ring[i - 1], ring[(i + 1) % n])
+        return junctions
+
+    def _arc(self, points):
+        """Index of an arc (~index when it is stored the other way round)."""
+        key = tuple(points)
+        index = self._arc_ids.get(key)
+        if index is not None:
+            return index
+        index = self._arc_ids.get(key[::-1])
+        if index is not None:
+            return ~index
+        index = len(self.arcs)
+        self.arcs.append(key)
+        self._arc_ids[key] = index
+        return index
+
+    def _cut_line(self, points):
+        arcs = []
+        start = 0
+        for i in range(1, len(points)):
+            if i == len(points) - 1 or points[i] in self._junctions:
+                arcs.append(self._arc(points[start:i + 1]))
+                start = i
+        return arcs
+
+    def _cut_ring(self, ring):
+        if not ring:
+            return []
+        cuts = [i for i, p in enumerate(ring) if p in self._junctions]
+        if not cuts:
+            # an island: one closed arc, started at its lowest point so that copies match
+            start = min(range(len(ring)), key=ring.__getitem__)
+            forward = ring[start:] + ring[:start]
+            key = tuple(forward + [forward[0]])
+            if key in self._arc_ids:
+                return [self._arc_ids[key]]
+            backward = forward[::-1]
+            start = min(range(len(backward)), key=backward.__getitem__)
+            backward = backward[start:] + backward[:start]
+            reverse_key = tuple(backward + [backward[0]])
+            if reverse_key in self._arc_ids:
+                return [~self._arc_ids[reverse_key]]
+            return [self._arc(key)]
+        start = cuts[0]
+        rotated = ring[start:] + ring[:start]
+        return self._cut_line(rotated + [rotated[0]])
+
+    def _cut(self, shape):
+        if shape is None:
+            return None
+        kind, parts = shape
+        if kind == 'GeometryCollection':
+            return {'type': kind, 'geometries': [g for g in (self._cut(p) for p in parts) if g]}
+        if kind == 'Point':
+            return {'type': kind, 'coordinates': list(parts)}
+        if kind == 'MultiPoint':
+            return {'type': kind, 'coordinates': [list(p) for p in parts]}
+        if kind == 'LineString':
+            return {'type': kind, 'arcs': self._cut_line(parts)}
+        if kind == 'MultiLineString':
+            return {'type': kind, 'arcs': [self._cut_line(line) for line in parts]}
+        if kind == 'Polygon':
+            return {'type': kind, 'arcs': [self._cut_ring(r) for r in parts]}
+        return {'type': kind, 'arcs': [[self._cut_ring(r) for r in poly] for poly in parts]}
+
+    # --------------------------------------------------------
+    # output
+    # --------------------------------------------------------
+    @staticmethod
+    def _remap(arcs, mapping):
+        if isinstance(arcs, int):
+            return mapping[arcs] if arcs >= 0 else ~mapping[~arcs]
+        return [Topology._remap(a, mapping) for a in arcs]
+
+    @staticmethod
+    def _used(geometry, used):
+        if geometry.get('type') == 'GeometryCollection':
+            for g in geometry['geometries']:
+                Topology._used(g, used)
+            return
+        stack = [geometry.get('arcs') or []]
+        while stack:
+            a = stack.pop()
+            if isinstance(a, int):
+                used.add(a if a >= 0 else ~a)
+            else:
+                stack.extend(a)
+
+    def _subset(self, geometry, mapping):
+        if geometry.get('type') == 'GeometryCollection':
+            return {'type': 'GeometryCollection',
+                    'geometries': [self._subset(g, mapping) for g in geometry['geometries']]}
+        if 'arcs' not in geometry:
+            return dict(geometry)
+        return {'type': geometry['type'], 'arcs': self._remap(geometry['arcs'], mapping)}
+
+    @staticmethod
+    def _delta(arc):
+        out = [list(arc[0])]
+        px, py = arc[0]
+        for x, y in arc[1:]:
+            out.append([x - px, y - py])
+            px, py = x, y
+        return out
+
+    def encode(self, name, rows, properties, metadata=None):
+        """TopoJSON bytes for `rows` (row numbers into the geometries), each carrying
+        the matching `properties`, as one GeometryCollection object called `name`."""
+        if len(rows) == len(self.geometries) and list(rows) == list(range(len(rows))):
+            geometries = [dict(g) if g else None for g in self.geometries]
+            arcs = self.arcs
+        else:
+            used = set()
+            for i in rows:
+                if self.geometries[i]:
+                    self._used(self.geometries[i], used)
+            order = sorted(used)
+            mapping = {old: new for new, old in enumerate(order)}
+            geometries = [self._subset(self.geometries[i], mapping) if self.geometries[i] else None
+                          for i in rows]
+            arcs = [self.arcs[i] for i in order]
+
+        objects = []
+        for geometry, props in zip(geometries, properties):
+            geometry = geometry or {'type': None}
+            geometry['properties'] = props
+            objects.append(geometry)
+
+        topology = {
+            'type': 'Topology',
+            'bbox': self.bbox,
+            'transform': {'scale': [1 / self.k, 1 / self.k], 'translate': [self.x0, self.y0]},
+            'objects': {name: {'type': 'GeometryCollection', 'geometries': objects}},
+            'arcs': [self._delta(a) for a in arcs],
+        }
+        if metadata is not None:
+            topology['metadata'] = metadata
+        return dumps(topology)
+
+    def report(self):
+        return {'precision': self.digits, 'features': len(self.geometries),
+                'arcs': len(self.arcs), 'points': self.point_count}
@@ -491,8 +491,100 @@ function exportData(type, format) {
 // ============================================================
 // Data loading
 // ============================================================
+// first, unfiltered payloads from /api/bootstrap; each loader takes its section once,
+// as soon as that section has arrived (the server streams them one after another)
+const BOOTSTRAP_SECTIONS = ['study_area', 'simd_zones', 'greenspaces', 'flood_damage', 'summary', 'damage_by_category'];
+let bootstrapLayers = {};
+
+// Reads {"layers":{"name":<json>,...}} off the response stream and calls
+// onSection(name, data) for each section once its closing bracket is in.
+async function readBootstrapSections(response, onSection) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let text = '';
+    let started = false;
+    let pos = 0;            // next character to scan
+    let start = -1;         // where the current section's value starts
+    let name = null;
+    let depth = 0;
+    let inString = false;
+    let escaped = false;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        text += decoder.decode(value, { stream: true });
+        if (!started) {
+            const open = text.indexOf('"layers":{');
+            if (open < 0) continue;
+            pos = open + '"layers":{'.length;
+            started = true;
+        }
+        for (; pos < text.length; pos++) {
+            const c = text[pos];
+            if (start < 0) {
+                // between sections: a "name": key, or the end of "layers"
+                if (c === '}') return;
+                if (c !== '"') continue;
+                const end = text.indexOf('"', pos + 1);
+                const colon = end < 0 ? -1 : text.indexOf(':', end);
+                if (colon < 0) break;
+                name = text.slice(pos + 1, end);
+                start = colon + 1;
+                pos = colon;
+                continue;
+            }
+            if (inString) {
+                if (escaped) escaped = false;
+                else if (c === '\\') escaped = true;
+                else if (c === '"') inString = false;
+            } else if (c === '"') {
+                inString = true;
+            } else if (c === '{' || c === '[') {
+                depth++;
+            } else if ((c === '}' || c === ']') && --depth === 0) {
+                onSection(name, JSON.parse(text.slice(start, pos + 1)));
+                text = text.slice(pos + 1);
+                pos = -1;
+                start = -1;
+            }
+        }
+    }
+}
+
+function loadBootstrap() {
+    const waiting = {};
+    for (const section of BOOTSTRAP_SECTIONS) {
+        bootstrapLayers[section] = new Promise(resolve => { waiting[section] = resolve; });
+    }
+    const url = `${API_BASE_URL}/bootstrap?layers=${BOOTSTRAP_SECTIONS.join(',')}`;
+    return fetch(url)
+        .then(response => {
+            if (!response.ok) throw new Error(`bootstrap returned ${response.status}`);
+            return readBootstrapSections(response, (section, data) => {
+                if (waiting[section]) waiting[section](data);
+            });
+        })
+        .catch(error => console.error('Error loading bootstrap data:', error))
+        // sections that never came (errors, failed request) are fetched on their own
+        .finally(() => Object.values(waiting).forEach(resolve => resolve(null)));
+}
+
+async function fetchJSON(url, section) {
+    if (section && !url.includes('?') && bootstrapLayers[section]) {
+        const pending = bootstrapLayers[section];
+        delete bootstrapLayers[section];
+        const data = await pending;
+        if (data) return data;
+    }
+    const response = await fetch(url);
+    return response.json();
+}
+
 async function loadAllData() {
     try {
+        // the loaders start straight away; each waits only for its own section
+        loadBootstrap();
         await Promise.all([
             loadStudyArea(),
             loadPostcodes(),
@@ -511,8 +603,7 @@ async function loadAllData() {
 
 async function loadStudyArea() {
     try {
-        const response = await fetch(`${API_BASE_URL}/study_area`);
-        const data = await response.json();
+        const data = await fetchJSON(`${API_BASE_URL}/study_area`, 'study_area');
         
         if (layers.studyArea) map.removeLayer(layers.studyArea);
         
@@ -611,8 +702,7 @@ async function loadSIMDZones(riskLevel = null, min = null, max = null) {
         if (max) params.append('max', max);
         if (params.toString()) url += '?' + params.toString();
         
-        const response = await fetch(url);
-        const data = await response.json();
+        const data = await fetchJSON(url, 'simd_zones');
         
         if (layers.simd) map.removeLayer(layers.simd);
         
@@ -688,8 +778,7 @@ async function loadGreenspaces(type = null, minStorage = null, maxStorage = null
         if (maxStorage) params.append('max_storage', maxStorage);
         if (params.toString()) url += '?' + params.toString();
         
-        const response = await fetch(url);
-        const data = await response.json();
+        const data = await fetchJSON(url, 'greenspaces');
         
         if (type === 'selected') {
             data.features = data.features.filter(f => {
@@ -801,8 +890,7 @@ async function loadFloodDamage(type = null, minValue = null, maxValue = null) {
         if (maxValue) params.append('max_value', maxValue);
         if (params.toString()) url += '?' + params.toString();
         
-        const response = await fetch(url);
-        const data = await response.json();
+        const data = await fetchJSON(url, 'flood_damage');
         
         floodDamageData = data;
         const maxProtection = data.metadata?.max_protection_value || 500000;
@@ -864,8 +952,7 @@ function getProtectionColor(value, max) {
 // ============================================================
 async function loadSummary() {
     try {
-        const response = await fetch(`${API_BASE_URL}/summary`);
-        const data = await response.json();
+        const data = await fetchJSON(`${API_BASE_URL}/summary`, 'summary');
         
         document.getElementById('statTotalProtection').textContent = '£' + formatNumber(data.total_protection_value);
         document.getElementById('statProtectionRate').textContent = data.protection_percentage + '%';
@@ -878,8 +965,7 @@ async function loadSummary() {
 
 async function loadDamageByCategory() {
     try {
-        const response = await fetch(`${API_BASE_URL}/damage_by_category`);
-        const data = await response.json();
+        const data = await fetchJSON(`${API_BASE_URL}/damage_by_category`, 'damage_by_category');
         
         const ctx = document.getElementById('categoryChart').getContext('2d');
         if (categoryChart) categoryChart.destroy();
@@ -0,0 +1,142 @@
+/**
+ * Water of Leith WebMap - packed 3D scene loader
+ * Reads the scene.bin written by backend/scene_packer.py into a Qgis2threejs
+ * viewer as it streams in: the scene is built from the coarsest DEM grids, then
+ * every finer level replaces them. Falls back to the exported scene.js.
+ */
+(function () {
+    const MAGIC = 'WOLSCN01';
+    const PREFIX = MAGIC.length + 4;
+
+    // every DEM grid in the scene, with the block it belongs to
+    function packedGrids(scene) {
+        const grids = [];
+        (scene.layers || []).forEach(layer => {
+            (layer.data || []).forEach(block => {
+                if (block.grid && block.grid.packed) grids.push({ layer: layer.id, block: block });
+            });
+        });
+        return grids;
+    }
+
+    function heights(data, base, manifest, packed, level) {
+        const b = manifest.buffers[level.buffer];
+        const start = base + b.offset;
+        const q = new Uint16Array(data.slice(start, start + b.length).buffer);
+        const z = new Float32Array(q.length);
+        for (let i = 0; i < q.length; i++) z[i] = packed.min + q[i] * packed.step;
+        return z;
+    }
+
+    // replace a block's mesh with one built from a finer grid
+    function refineBlock(app, layerId, block, grid) {
+        const layer = app.scene.mapLayers[layerId];
+        const old = layer && layer.blocks[block.block] && layer.blocks[block.block].obj;
+        const refined = Object.assign({}, block, { grid: grid });
+        delete refined.materials;
+        app.loadJSONObject(refined);
+        if (old) {
+            layer.objectGroup.remove(old);
+            old.geometry.dispose();
+            layer.objects = layer.objects.filter(o => o !== old);
+        }
+    }
+
+    async function streamPacked(url, onLevel) {
+        const resp = await fetch(url);
+        if (!resp.ok) throw new Error(`${url}: HTTP ${resp.status}`);
+
+        let data = new Uint8Array(1 << 16), received = 0;
+        let manifest = null, base = 0, level = 0, levelEnds = [];
+        const append = chunk => {
+            if (received + chunk.length > data.length) {
+                const grown = new Uint8Array(Math.max(data.length * 2, received + chunk.length));
+                grown.set(data.subarray(0, received));
+                data = grown;
+            }
+            data.set(chunk, received);
+            received += chunk.length;
+        };
+        const advance = () => {
+            if (!manifest && received >= PREFIX) {
+                if (new TextDecoder().decode(data.subarray(0, MAGIC.length)) !== MAGIC) {
+                    throw new Error(`${url}: not a packed scene`);
+                }
+                const n = new DataView(data.buffer).getUint32(MAGIC.length, true);
+                if (received < PREFIX + n) return;
+                manifest = JSON.parse(new TextDecoder().decode(data.subarray(PREFIX, PREFIX + n)));
+                base = PREFIX + n;
+                // bytes needed before each level can be shown
+                for (let i = 0; i < manifest.levels; i++) levelEnds.push(0);
+                packedGrids(manifest.scene).forEach(g => {
+                    g.block.grid.packed.levels.forEach((lv, i) => {
+                        const b = manifest.buffers[lv.buffer];
+                        levelEnds[i] = Math.max(levelEnds[i], base + b.offset + b.length);
+                    });
+                });
+            }
+            while (manifest && level < manifest.levels && received >= levelEnds[level]) {
+                onLevel(manifest, level, data, base);
+                level++;
+            }
+        };
+
+        if (resp.body && resp.body.getReader) {
+            const reader = resp.body.getReader();
+            for (;;) {
+                const { done, value } = await reader.read();
+                if (value) append(value);
+                advance();
+                if (done) break;
+            }
+        } else {
+            append(new Uint8Array(await resp.arrayBuffer()));
+            advance();
+        }
+        if (!manifest || level < manifest.levels) throw new Error(`${url}: truncated`);
+    }
+
+    Q3D.application.loadPackedScene = function (url, fallbackUrl, sceneFileLoadedCallback, sceneLoadedCallback) {
+        const app = Q3D.application;
+        let shown = false;
+
+        const onLevel = (manifest, level, data, base) => {
+            const grids = packedGrids(manifest.scene);
+            if (level === 0) {
+                grids.forEach(g => {
+                    const grid = g.block.grid, lv = grid.packed.levels[0];
+                    grid.width = lv.width;
+                    grid.height = lv.height;
+                    grid.array = heights(data, base, manifest, grid.packed, lv);
+                });
+                app.loadJSONObject(manifest.scene);
+                shown = true;
+                if (sceneFileLoadedCallback) sceneFileLoadedCallback(app.scene);
+                return;
+            }
+            grids.forEach(g => {
+                const packed = g.block.grid.packed, lv = packed.levels[level];
+                if (!lv) return;
+                refineBlock(app, g.layer, g.block, {
+                    width: lv.width,
+                    height: lv.height,
+                    array: heights(data, base, manifest, packed, lv)
+                });
+            });
+        };
+
+        streamPacked(url, onLevel).then(() => {
+            if (sceneLoadedCallback) sceneLoadedCallback(app.scene);
+            app.dispatchEvent({ type: 'sceneLoaded' });
+        }).catch(err => {
+            if (shown) {
+                // keep the coarser terrain already on screen
+                console.warn('Packed scene incomplete:', err);
+                if (sceneLoadedCallback) sceneLoadedCallback(app.scene);
+                return;
+            }
+            console.warn('Packed scene unavailable, loading', fallbackUrl, err);
+            app.loadSceneFile(fallbackUrl, sceneFileLoadedCallback, sceneLoadedCallback);
+        });
+    };
+})();